@@ -0,0 +1,188 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Requests sent through the Batch API are billed at half price, do not count
+# against the synchronous rate limits and complete within COMPLETION_WINDOW.
+# A job is written as one or more JSONL files of requests, each line
+#   {"custom_id": "article-123", "method": "POST", "url": "/v1/chat/completions", "body": {...}}
+# and results are matched back to rows by custom_id, since the output file is
+# not in input order.
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+
+# Per-batch limits of the Batch API (50,000 requests, 200 MB input file)
+MAX_REQUESTS_PER_BATCH = 50_000
+MAX_BATCH_FILE_BYTES = 190 * 1024 * 1024
+
+# Seconds between status checks while waiting for a job
+POLL_SECONDS = 60
+
+# Batch statuses after which nothing more will happen
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# Concurrent requests when a job is run locally instead of through the Batch API
+LOCAL_WORKERS = 8
+
+def stable_custom_ids(prefix: str, ids) -> list:
+    """
+    Build a custom_id per row from a stable row identifier (not the row position,
+    which changes if the CSV is filtered or reordered). Identifiers must be unique.
+    """
+    custom_ids = [f"{prefix}-{row_id}" for row_id in ids]
+    if len(set(custom_ids)) != len(custom_ids):
+        raise ValueError(f"Row identifiers for {prefix!r} are not unique; custom_ids must be")
+    return custom_ids
+
+def write_batch_files(requests, path_prefix: str) -> list:
+    """
+    Write (custom_id, request body) pairs as Batch API input files, starting a new
+    file whenever one would exceed the per-batch request or size limit.
+    Returns the paths written (path_prefix_000.jsonl, path_prefix_001.jsonl, ...).
+    """
+    paths = []
+    f = None
+    count = size = 0
+    try:
+        for custom_id, body in requests:
+            line = json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+                              ensure_ascii=False) + "\n"
+            encoded = len(line.encode("utf-8"))
+            if f is None or count >= MAX_REQUESTS_PER_BATCH or size + encoded > MAX_BATCH_FILE_BYTES:
+                if f is not None:
+                    f.close()
+                paths.append(f"{path_prefix}_{len(paths):03d}.jsonl")
+                f = open(paths[-1], "w", encoding="utf-8")
+                count = size = 0
+            f.write(line)
+            count += 1
+            size += encoded
+    finally:
+        if f is not None:
+            f.close()
+    return paths
+
+def save_job(job: dict, job_file: str):
+    tmp_path = job_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(job, f, indent=2)
+    os.replace(tmp_path, job_file)
+
+def load_job(job_file: str) -> dict:
+    with open(job_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def submit_job(client, paths, job_file: str, metadata=None) -> dict:
+    """
+    Upload the input files and create one batch per file. The batch ids are saved
+    to job_file as soon as each batch exists, so the caller can exit and collect
+    the results later. `metadata` is stored in the job file for the collect step.
+    """
+    job = {"created": time.time(), "metadata": metadata or {}, "batches": []}
+    for path in paths:
+        with open(path, "rb") as f:
+            input_file = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW
+        )
+        job["batches"].append({"id": batch.id, "input_path": path, "status": batch.status})
+        save_job(job, job_file)
+        print(f"Submitted {path} as batch {batch.id}")
+    return job
+
+def poll_job(client, job: dict, wait: bool = False, interval: float = POLL_SECONDS) -> bool:
+    """
+    Refresh the status of every batch in a job, waiting until all of them have
+    finished if `wait` is set. Returns True when all batches have finished.
+    """
+    while True:
+        for entry in job["batches"]:
+            if entry["status"] in FINAL_STATUSES:
+                continue
+            batch = client.batches.retrieve(entry["id"])
+            entry["status"] = batch.status
+            entry["output_file_id"] = batch.output_file_id
+            entry["error_file_id"] = batch.error_file_id
+            counts = batch.request_counts
+            if counts is not None:
+                print(f"Batch {entry['id']}: {batch.status}, {counts.completed}/{counts.total} done, "
+                      f"{counts.failed} failed")
+            else:
+                print(f"Batch {entry['id']}: {batch.status}")
+        finished = all(entry["status"] in FINAL_STATUSES for entry in job["batches"])
+        if finished or not wait:
+            return finished
+        time.sleep(interval)
+
+def parse_output_lines(lines) -> dict:
+    """
+    Map custom_id to the response body of each successful request in Batch API
+    output (or error) JSONL, and to None for failed ones.
+    """
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") == 200:
+            results[record["custom_id"]] = response["body"]
+        else:
+            error = record.get("error") or response.get("body", {}).get("error")
+            print(f"Request {record['custom_id']} failed: {error}")
+            results.setdefault(record["custom_id"], None)
+    return results
+
+def collect_job(client, job: dict) -> dict:
+    """
+    Download the output and error files of a job's finished batches.
+    Returns {custom_id: response body or None}.
+    """
+    results = {}
+    for entry in job["batches"]:
+        for key in ("output_file_id", "error_file_id"):
+            if entry.get(key):
+                results.update(parse_output_lines(client.files.content(entry[key]).text.splitlines()))
+    return results
+
+def run_job_locally(client, paths, workers: int = LOCAL_WORKERS) -> dict:
+    """
+    Local stand-in for the Batch API: send every request in the input files as an
+    ordinary concurrent request, for endpoints without batch support or to try a
+    job on a sample first. Returns {custom_id: response body or None}.
+    """
+    def run(request):
+        try:
+            completion = client.chat.completions.create(**request["body"])
+            return request["custom_id"], completion.model_dump()
+        except Exception as e:
+            print(f"Request {request['custom_id']} failed: {e}")
+            return request["custom_id"], None
+
+    results = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in as_completed([executor.submit(run, request) for request in requests]):
+                custom_id, body = future.result()
+                results[custom_id] = body
+    return results
+
+def message_content(body):
+    """
+    The assistant message text of a chat completion response body, or None.
+    """
+    return body["choices"][0]["message"]["content"] if body else None
+
+def tool_call_arguments(body):
+    """
+    The parsed arguments of the first tool call in a chat completion response body, or None.
+    """
+    if not body:
+        return None
+    tool_calls = body["choices"][0]["message"].get("tool_calls")
+    return json.loads(tool_calls[0]["function"]["arguments"]) if tool_calls else None
@@ -0,0 +1,113 @@
+import os
+import time
+import numpy as np
+import faiss
+from vector_index import INDEX_TYPES, build_index, default_search_params, set_search_params
+
+# Vectors to benchmark on. If this index file exists its vectors are used,
+# otherwise a synthetic clustered corpus of BENCHMARK_NUM_VECTORS is generated.
+FAISS_INDEX_FILE = "./faiss_index.bin"
+BENCHMARK_NUM_VECTORS = 30_000
+BENCHMARK_DIMENSION = 1536
+BENCHMARK_NUM_CLUSTERS = 200
+
+# Queries are noisy copies of corpus vectors, like a question close to a section.
+BENCHMARK_NUM_QUERIES = 500
+QUERY_NOISE = 0.05
+
+# Recall is measured on the top K results against the exact Flat index.
+TOP_K = 10
+
+def normalize(vectors):
+    """
+    Scale each row to unit length, like OpenAI embeddings.
+    """
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def load_vectors(index_file=FAISS_INDEX_FILE):
+    """
+    Return all vectors stored in an existing flat index, or None if there is no usable index.
+    """
+    if not os.path.exists(index_file):
+        return None
+    index = faiss.read_index(index_file)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if not isinstance(index, faiss.IndexFlat):
+        print(f"{index_file} is not a flat index; using synthetic vectors instead.")
+        return None
+    return index.reconstruct_n(0, index.ntotal)
+
+def synthetic_vectors(num_vectors=BENCHMARK_NUM_VECTORS, dimension=BENCHMARK_DIMENSION,
+                      num_clusters=BENCHMARK_NUM_CLUSTERS, seed=0):
+    """
+    Generate unit vectors grouped around random cluster centres, which is closer
+    to real embeddings than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((num_clusters, dimension)).astype(np.float32)
+    assignments = rng.integers(0, num_clusters, num_vectors)
+    vectors = centres[assignments] + 0.5 * rng.standard_normal((num_vectors, dimension)).astype(np.float32)
+    return normalize(vectors)
+
+def make_queries(vectors, num_queries=BENCHMARK_NUM_QUERIES, noise=QUERY_NOISE, seed=1):
+    """
+    Build queries by perturbing randomly chosen corpus vectors.
+    """
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.choice(len(vectors), num_queries, replace=len(vectors) < num_queries)]
+    return normalize(picks + noise * rng.standard_normal(picks.shape).astype(np.float32))
+
+def benchmark(index, queries, exact_ids, top_k=TOP_K):
+    """
+    Search one query at a time (as the chat frontend does) and return
+    recall@k against the exact results plus p50/p99 latency in milliseconds.
+    """
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    recall = np.mean([
+        len(set(approx) & set(exact)) / top_k
+        for approx, exact in zip(found, exact_ids)
+    ])
+    return recall, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def main():
+    vectors = load_vectors()
+    if vectors is None:
+        vectors = synthetic_vectors()
+        print(f"Using {len(vectors)} synthetic vectors of dimension {vectors.shape[1]}")
+    else:
+        print(f"Using {len(vectors)} vectors of dimension {vectors.shape[1]} from {FAISS_INDEX_FILE}")
+    queries = make_queries(vectors)
+    top_k = min(TOP_K, len(vectors))
+
+    results = []
+    exact_ids = None
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_index(index_type, vectors)
+        build_seconds = time.perf_counter() - start
+        params = default_search_params(index)
+        set_search_params(index, params)
+
+        if exact_ids is None:
+            # Flat comes first and provides the ground truth.
+            _, exact_ids = index.search(queries, top_k)
+        recall, p50, p99 = benchmark(index, queries, exact_ids, top_k)
+        memory_mb = len(faiss.serialize_index(index)) / 1024 ** 2
+        settings = ", ".join(f"{k}={v}" for k, v in params.items() if k != "index_type") or "-"
+        results.append((index_type, settings, build_seconds, recall, p50, p99, memory_mb))
+
+    print(f"\n{'index':<10}{'settings':<14}{'build s':>9}{f'recall@{top_k}':>11}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'memory MB':>11}")
+    for index_type, settings, build_seconds, recall, p50, p99, memory_mb in results:
+        print(f"{index_type:<10}{settings:<14}{build_seconds:>9.2f}{recall:>11.3f}"
+              f"{p50:>9.3f}{p99:>9.3f}{memory_mb:>11.1f}")
+
+if __name__ == '__main__':
+    main()
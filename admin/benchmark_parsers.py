@@ -0,0 +1,140 @@
+import io
+import os
+import sys
+import time
+import random
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from html_parsers import available_backends, parse_chapter_page, parse_section_page
+
+# Saved pages to benchmark on: a mirror written by `legal_crawler.py --save-mirror DIR`,
+# passed as the first argument. Without one, synthetic pages shaped like
+# malegislature.gov's (site navigation, nested col-xs-12 containers) are generated.
+MIRROR_BASE_URL = "https://malegislature.gov"
+SYNTHETIC_CHAPTER_PAGES = 20
+SYNTHETIC_SECTIONS_PER_CHAPTER = 25
+
+# Each backend parses every page this many times.
+ROUNDS = 3
+
+# Process counts for the parse pool throughput check.
+POOL_SIZES = [1, 2, 4]
+
+def load_fixtures(mirror_dir: str):
+    """
+    Read a saved mirror. Returns (chapter pages, section pages) as lists of (url, html).
+    """
+    chapters, sections = [], []
+    for root, _, files in os.walk(mirror_dir):
+        if "index.html" not in files:
+            continue
+        url = MIRROR_BASE_URL + "/" + os.path.relpath(root, mirror_dir).replace(os.sep, "/")
+        with open(os.path.join(root, "index.html"), 'r', encoding='utf-8', errors='replace') as f:
+            page = (url, f.read())
+        (sections if "/Section" in url else chapters).append(page)
+    return chapters, sections
+
+def _page(body: str) -> str:
+    rng = random.Random(len(body))
+    navigation = "".join(
+        f'<li class="nav-item"><a href="/Laws/GeneralLaws/Part{rng.randint(1, 5)}/Title{n}">Title {n}</a></li>'
+        for n in range(120)
+    )
+    return (
+        '<!DOCTYPE html><html><head><title>General Laws</title>'
+        '<script>window.dataLayer = window.dataLayer || [];</script></head><body>'
+        f'<header><nav><ul class="nav">{navigation}</ul></nav></header>'
+        f'<main><div class="container"><div class="row">{body}</div></div></main>'
+        '<footer><p>Massachusetts Legislature</p></footer></body></html>'
+    )
+
+def synthetic_fixtures(num_chapters=SYNTHETIC_CHAPTER_PAGES, sections_per_chapter=SYNTHETIC_SECTIONS_PER_CHAPTER, seed=0):
+    """
+    Generate chapter and section pages with the structure the parsers look for.
+    """
+    rng = random.Random(seed)
+    words = "tenant landlord lease deposit premises notice rent mortgage estate section chapter court".split()
+    chapters, sections = [], []
+    for c in range(num_chapters):
+        chapter_url = f"{MIRROR_BASE_URL}/Laws/GeneralLaws/PartII/TitleI/Chapter{183 + c}"
+        links = "".join(
+            f'<li><a href="/Laws/GeneralLaws/PartII/TitleI/Chapter{183 + c}/Section{s}">Section {s}</a></li>'
+            for s in range(1, sections_per_chapter + 1)
+        )
+        button = (f'<button class="btn btn-sm btn-secondary nextButton" '
+                  f'onclick="location.href = \'/Laws/GeneralLaws/PartII/TitleI/Chapter{184 + c}\';">Next</button>')
+        chapters.append((chapter_url, _page(f'<div class="col-xs-12"><ul>{links}</ul>{button}</div>')))
+        for s in range(1, sections_per_chapter + 1):
+            paragraphs = "".join(
+                f"<p>{' '.join(rng.choice(words) for _ in range(rng.randint(20, 120)))}</p>"
+                for _ in range(rng.randint(2, 12))
+            )
+            body = (f'<div class="col-xs-12 col-md-8"><div class="col-xs-12">'
+                    f'<h2 id="skipTo">Section {s}: <small>Heading</small></h2>{paragraphs}</div></div>')
+            sections.append((f"{chapter_url}/Section{s}", _page(body)))
+    return chapters, sections
+
+def parse_all(backend, chapters, sections):
+    results = [parse_chapter_page(backend, html, url, MIRROR_BASE_URL) for url, html in chapters]
+    results += [parse_section_page(backend, html, url) for url, html in sections]
+    return results
+
+def _canonical(results, num_chapters):
+    return [(r[0], sorted(r[1])) if i < num_chapters else r for i, r in enumerate(results)]
+
+def benchmark_backend(backend, chapters, sections, rounds=ROUNDS):
+    """
+    Return (pages/sec, results) for parsing every page `rounds` times.
+    """
+    start = time.perf_counter()
+    # The bs4 reference prints as it parses; keep that out of the report.
+    with redirect_stdout(io.StringIO()):
+        for _ in range(rounds):
+            results = parse_all(backend, chapters, sections)
+    elapsed = time.perf_counter() - start
+    return rounds * (len(chapters) + len(sections)) / elapsed, _canonical(results, len(chapters))
+
+def _parse_sections(args):
+    backend, pages = args
+    return [parse_section_page(backend, html, url) for url, html in pages]
+
+def benchmark_pool(backend, sections, processes, rounds=ROUNDS):
+    """
+    Pages/sec when section pages are parsed by a pool of worker processes, as the crawler does.
+    """
+    batch_size = max(1, len(sections) // (processes * 4))
+    batches = [(backend, sections[i:i + batch_size]) for i in range(0, len(sections), batch_size)]
+    with ProcessPoolExecutor(processes) as pool:
+        list(pool.map(_parse_sections, batches[:processes]))  # start the workers
+        start = time.perf_counter()
+        for _ in range(rounds):
+            list(pool.map(_parse_sections, batches))
+        elapsed = time.perf_counter() - start
+    return rounds * len(sections) / elapsed
+
+def main():
+    if len(sys.argv) > 1:
+        chapters, sections = load_fixtures(sys.argv[1])
+        print(f"Loaded {len(chapters)} chapter and {len(sections)} section pages from {sys.argv[1]}")
+    else:
+        chapters, sections = synthetic_fixtures()
+        print(f"Generated {len(chapters)} chapter and {len(sections)} synthetic section pages")
+
+    backends = available_backends()
+    reference = None
+    baseline = None
+    for backend in reversed(backends):  # bs4 first: it is the reference
+        pages_per_sec, results = benchmark_backend(backend, chapters, sections)
+        if reference is None:
+            reference, baseline = results, pages_per_sec
+        mismatches = sum(a != b for a, b in zip(results, reference))
+        print(f"{backend:>10}: {pages_per_sec:8.1f} pages/sec ({pages_per_sec / baseline:.1f}x), "
+              f"{mismatches} pages differ from bs4")
+
+    best = backends[0]
+    for processes in POOL_SIZES:
+        print(f"{best} on {processes} process(es): {benchmark_pool(best, sections, processes):.1f} section pages/sec")
+    print(f"({os.cpu_count()} CPUs available)")
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,18 @@
 import os
 import glob
-import json
 import re
+import hashlib
 import openai
 import numpy as np
 import faiss
 from tqdm import tqdm
 from dotenv import load_dotenv
+from embedding_engine import embed_texts, count_tokens
+from embedding_cache import EmbeddingCache
+from corpus import iter_corpus, record_document, CorpusTruncatedError
+from metadata_store import MetadataStore, write_metadata_store
+from lexical_index import build_lexical_index, save_lexical_index
+from vector_index import build_index, load_index, save_index, remove_vectors, index_type_of
 load_dotenv()
 
 # Instantiate the client using the API key
@@ -15,34 +21,47 @@ client = OpenAI(
     api_key = os.environ.get("OPENAI_API_KEY")
 )
 
+# Packed corpus written by the web scraper (see corpus.py); when it does not
+# exist, the per-section text files in TEXT_FILES_DIR are read instead.
+CORPUS_FILE = "./admin/sections_corpus.jsonl.gz"
 # Directory containing the text files generated from the web scraper
 TEXT_FILES_DIR = "./admin/sections_output"
 # Output files for the FAISS index and metadata
 FAISS_INDEX_FILE = "./faiss_index.bin"
-METADATA_FILE = "./metadata.json"
+METADATA_FILE = "./metadata.bin"  # Memory-mapped metadata store (see metadata_store.py)
+# BM25 inverted index over the same chunks, used for hybrid retrieval (see lexical_index.py)
+LEXICAL_INDEX_FILE = "./lexical_index.json"
 
 # The embedding model to use (adjust as needed)
 EMBEDDING_MODEL = "text-embedding-3-small"
 
+# On-disk embedding cache shared with the chat frontends; unchanged text is never re-embedded.
+EMBEDDING_CACHE_FILE = "./embedding_cache.sqlite"
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_FILE)
+
 # Base URL components used to reconstruct section links.
 BASE_URL = "https://malegislature.gov"
 START_PATH = "/Laws/GeneralLaws/PartII/TitleI/"
 
+# Sections are split into overlapping chunks of at most this many tokens,
+# respecting paragraph boundaries, so long sections are indexed in full.
+CHUNK_MAX_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 60
+
+# FAISS index type: "flat" (exact), "ivf_flat", "ivf_pq" or "hnsw" (see vector_index.py).
+# The approximate types scale to much larger corpora; use benchmark_index.py to compare them.
+INDEX_TYPE = "flat"
+
+# Set to True to only embed new or changed files and update the existing index in place.
+# Falls back to a full build when no compatible index exists yet.
+INCREMENTAL_BUILD = True
+
 def get_embedding(text: str) -> np.ndarray:
     """
     Get embedding from OpenAI for a given text using the specified model.
-    Returns a numpy array of the embedding.
+    Returns a numpy array of the embedding, or None if it could not be obtained.
     """
-    try:
-        response  = client.embeddings.create(
-            input=text[:8150],
-            model=EMBEDDING_MODEL
-        )
-        embedding = response.data[0].embedding
-        return np.array(embedding, dtype=np.float32)
-    except Exception as e:
-        print(f"Error obtaining embedding for text: {e}")
-        return None
+    return embed_texts(client, [text], model=EMBEDDING_MODEL, cache=embedding_cache)[0]
 
 def parse_filename(filename: str):
     """
@@ -63,6 +82,12 @@ def parse_filename(filename: str):
         return chapter, section
     return None, None
 
+def content_hash(text: str) -> str:
+    """
+    Return the SHA-256 hex digest of a document's text, used to detect changed files.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
 def reconstruct_section_link(chapter: str, section: str) -> str:
     """
     Reconstruct the full URL for a section from its chapter and section metadata.
@@ -99,29 +124,149 @@ def load_text_files(directory: str):
             print(f"Error reading file {filepath}: {e}")
     return documents
 
+def load_corpus_documents(path: str):
+    """
+    Stream the sections of a packed corpus file into documents of the same shape
+    as load_text_files returns. Later copies of a section replace earlier ones.
+    """
+    documents = {}
+    try:
+        for record in iter_corpus(path):
+            documents[record['filename']] = record_document(record)
+    except CorpusTruncatedError as e:
+        print(f"Warning: {e}; using the {len(documents)} sections before it")
+    return list(documents.values())
+
+def split_paragraphs(text: str, max_tokens: int):
+    """
+    Split a text into (start, end) character spans, one per paragraph.
+    Paragraphs are separated by blank lines (the scraper joins them with "\n\n").
+    A paragraph longer than max_tokens is further cut at whitespace into pieces
+    that each fit within max_tokens.
+    """
+    spans = []
+    position = 0
+    for match in list(re.finditer(r'\n\s*\n', text)) + [None]:
+        end = match.start() if match else len(text)
+        if end > position:
+            spans.append((position, end))
+        if match:
+            position = match.end()
+
+    pieces = []
+    for start, end in spans:
+        while count_tokens(text[start:end]) > max_tokens:
+            # Estimate the cut point from the token density, then back up to a space.
+            cut = start + max(1, (end - start) * max_tokens // count_tokens(text[start:end]))
+            space = text.rfind(' ', start + 1, cut)
+            cut = space if space > start else cut
+            pieces.append((start, cut))
+            start = cut
+            while start < end and text[start].isspace():
+                start += 1
+        if start < end:
+            pieces.append((start, end))
+    return pieces
+
+def chunk_document(doc, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Split a document into overlapping, token-bounded chunks that respect paragraph boundaries.
+    Consecutive paragraphs are packed into a chunk until it would exceed max_tokens;
+    the next chunk then starts with the trailing paragraphs of the previous one, up to
+    overlap_tokens (or with the tail of its last paragraph if that alone is longer).
+    Paragraphs are pre-split to leave room for the overlap in every chunk.
+    Returns a list of metadata entries, one per chunk, recording the chunk's
+    character offsets into the document's full text.
+    """
+    text = doc['full_text']
+    pieces = [(start, end, count_tokens(text[start:end])) for start, end in split_paragraphs(text, max_tokens - overlap_tokens)]
+
+    spans = []
+    current = []
+    for piece in pieces:
+        if current and sum(tokens for _, _, tokens in current) + piece[2] > max_tokens:
+            spans.append((current[0][0], current[-1][1]))
+            overlap = []
+            overlap_total = 0
+            for previous in reversed(current):
+                if overlap_total + previous[2] > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_total += previous[2]
+            if not overlap and overlap_tokens > 0:
+                # The last paragraph alone is too long to repeat, so overlap with its tail instead.
+                start, end, tokens = current[-1]
+                tail = end - (end - start) * overlap_tokens // tokens
+                space = text.find(' ', tail, end)
+                if space != -1:
+                    overlap = [(space + 1, end, count_tokens(text[space + 1:end]))]
+            current = overlap
+            while current and sum(tokens for _, _, tokens in current) + piece[2] > max_tokens:
+                current.pop(0)
+        current.append(piece)
+    if current:
+        spans.append((current[0][0], current[-1][1]))
+
+    return [
+        {
+            'filename': doc['filename'],
+            'chapter': doc['chapter'],
+            'section': doc['section'],
+            'link': doc['link'],
+            'content_hash': content_hash(text),
+            'chunk_index': chunk_index,
+            'chunk_start': start,
+            'chunk_end': end,
+            'chunk_text': text[start:end]  # Store the chunk for citation/reference
+        }
+        for chunk_index, (start, end) in enumerate(spans)
+    ]
+
+def embed_documents(documents, verbose=True):
+    """
+    Chunks the given documents and embeds every chunk in packed, concurrent requests
+    (see embedding_engine.py). A document is skipped if any of its chunks could not
+    be embedded, so it is never half-indexed.
+    Returns a list of (chunks, embeddings) pairs, one per successfully embedded document.
+    """
+    document_chunks = [chunk_document(doc) for doc in documents]
+    chunk_texts = [chunk['chunk_text'] for chunks in document_chunks for chunk in chunks]
+    if verbose:
+        print(f"Split {len(documents)} document(s) into {len(chunk_texts)} chunks")
+
+    with tqdm(total=len(chunk_texts), desc="Embedding chunks", disable=not verbose) as progress:
+        chunk_embeddings = embed_texts(
+            client,
+            chunk_texts,
+            model=EMBEDDING_MODEL,
+            progress=progress,
+            cache=embedding_cache
+        )
+
+    embedded = []
+    position = 0
+    for doc, chunks in zip(documents, document_chunks):
+        embeddings = chunk_embeddings[position:position + len(chunks)]
+        position += len(chunks)
+        if chunks and all(emb is not None for emb in embeddings):
+            embedded.append((chunks, embeddings))
+        else:
+            print(f"Skipping {doc['filename']} due to embedding error.")
+    return embedded
+
 def build_vector_database(documents):
     """
-    Given a list of documents, obtains their embeddings and builds a FAISS index.
+    Given a list of documents, splits them into chunks, obtains their embeddings and builds a FAISS index.
     Each document entry is expected to have 'full_text'.
-    Returns the FAISS index and a metadata list mapping FAISS vector id to document details.
+    Returns the FAISS index and a metadata list mapping FAISS vector id to chunk details.
+    The index is wrapped in an ID map so that later incremental builds can remove and replace vectors.
     """
     embeddings = []
     metadata = []
 
-    for doc in tqdm(documents, desc="Embedding documents"):
-        print(f"Embedding document: {doc['filename']}")
-        emb = get_embedding(doc['full_text'])
-        if emb is not None:
-            embeddings.append(emb)
-            metadata.append({
-                'filename': doc['filename'],
-                'chapter': doc['chapter'],
-                'section': doc['section'],
-                'link': doc['link'],
-                'full_text': doc['full_text']  # Store entire text for citation/reference
-            })
-        else:
-            print(f"Skipping {doc['filename']} due to embedding error.")
+    for chunks, chunk_embeddings in embed_documents(documents):
+        embeddings.extend(chunk_embeddings)
+        metadata.extend(chunks)
     
     if not embeddings:
         raise ValueError("No embeddings were obtained from documents.")
@@ -130,34 +275,165 @@ def build_vector_database(documents):
     dimension = embeddings.shape[1]
     print(f"Building FAISS index with dimension {dimension} and {len(embeddings)} vectors")
     
-    # Using a simple index (IndexFlatL2). For larger collections consider more advanced indices.
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
+    # Approximate index types are trained on a sample of the embeddings before adding them.
+    index = build_index(INDEX_TYPE, embeddings)
     
     return index, metadata
 
+def load_vector_database(index_file, metadata_file):
+    """
+    Loads a previously saved FAISS index and metadata for an incremental build.
+    Returns (None, None) if either file is missing or the index was built before
+    incremental, chunked builds were supported (no ID map, content hashes or chunk offsets),
+    or if INDEX_TYPE has changed since it was built.
+    """
+    if not os.path.exists(index_file) or not os.path.exists(metadata_file):
+        return None, None
+    index = load_index(index_file)
+    store = MetadataStore(metadata_file)
+    metadata = list(store)
+    store.close()
+    if not isinstance(index, faiss.IndexIDMap) or any(
+        entry is not None and ('content_hash' not in entry or 'chunk_start' not in entry)
+        for entry in metadata
+    ):
+        print("Existing index does not support incremental builds; rebuilding from scratch.")
+        return None, None
+    if index_type_of(index) != INDEX_TYPE:
+        print(f"Existing index is {index_type_of(index)!r}, not {INDEX_TYPE!r}; rebuilding from scratch.")
+        return None, None
+    return index, metadata
+
+def plan_update(metadata, documents):
+    """
+    Compare the current documents with the metadata of an existing index.
+    Returns (documents that are new or changed by content hash, filenames whose
+    documents disappeared).
+    """
+    hash_by_filename = {}
+    for entry in metadata:
+        if entry is not None:
+            hash_by_filename[entry['filename']] = entry['content_hash']
+    current_filenames = {doc['filename'] for doc in documents}
+
+    to_embed = [
+        doc for doc in documents
+        if hash_by_filename.get(doc['filename']) != content_hash(doc['full_text'])
+    ]
+    removed_filenames = [filename for filename in hash_by_filename if filename not in current_filenames]
+    return to_embed, removed_filenames
+
+def update_vector_database(index, metadata, documents):
+    """
+    Updates an existing FAISS index and metadata in place from the current documents.
+    Only new or changed documents (by content hash) are chunked and embedded; see
+    apply_embedded_documents for how the index is changed.
+    Returns the index, the metadata and a dict with counts of added, changed, removed
+    and unchanged documents.
+    """
+    to_embed, removed_filenames = plan_update(metadata, documents)
+    print(f"{len(to_embed)} new or changed document(s), {len(removed_filenames)} removed, "
+          f"{len(documents) - len(to_embed)} unchanged")
+
+    embedded = embed_documents(to_embed)
+
+    index, metadata, stats = apply_embedded_documents(index, metadata, embedded, removed_filenames)
+    stats['unchanged'] = len(documents) - len(to_embed)
+    return index, metadata, stats
+
+def apply_embedded_documents(index, metadata, embedded, removed_filenames=()):
+    """
+    Applies embedded documents ((chunks, embeddings) pairs from embed_documents) to
+    an existing FAISS index and its metadata. The old chunk vectors of changed documents
+    and of removed documents are removed; their metadata slots are set to None and
+    reused by new chunks, so metadata stays indexed by vector id.
+    Returns the index, the metadata and a dict with counts of added, changed and removed documents.
+    """
+    ids_by_filename = {}
+    for vector_id, entry in enumerate(metadata):
+        if entry is not None:
+            ids_by_filename.setdefault(entry['filename'], []).append(vector_id)
+    removed_filenames = [filename for filename in removed_filenames if filename in ids_by_filename]
+
+    stats = {'added': 0, 'changed': 0, 'removed': len(removed_filenames)}
+    stale_ids = [vector_id for filename in removed_filenames for vector_id in ids_by_filename[filename]]
+    for chunks, _ in embedded:
+        filename = chunks[0]['filename']
+        if filename in ids_by_filename:
+            stale_ids.extend(ids_by_filename[filename])
+            stats['changed'] += 1
+        else:
+            stats['added'] += 1
+
+    # Free the stale slots first so that new chunks can reuse them.
+    for vector_id in stale_ids:
+        metadata[vector_id] = None
+    free_ids = [vector_id for vector_id, entry in enumerate(metadata) if entry is None]
+
+    new_ids = []
+    new_embeddings = []
+    for chunks, chunk_embeddings in embedded:
+        for chunk, emb in zip(chunks, chunk_embeddings):
+            vector_id = free_ids.pop(0) if free_ids else len(metadata)
+            if vector_id == len(metadata):
+                metadata.append(None)
+            metadata[vector_id] = chunk
+            new_ids.append(vector_id)
+            new_embeddings.append(emb)
+
+    if stale_ids:
+        index = remove_vectors(index, stale_ids)
+    if new_ids:
+        index.add_with_ids(np.stack(new_embeddings), np.array(new_ids, dtype=np.int64))
+
+    # Drop trailing empty slots so the metadata list does not grow without bound.
+    while metadata and metadata[-1] is None:
+        metadata.pop()
+
+    return index, metadata, stats
+
 def save_vector_database(index, metadata, index_file, metadata_file):
     """
-    Saves the FAISS index to disk and writes the metadata to a JSON file.
+    Saves the FAISS index (and its search parameters) to disk and writes the metadata
+    to a memory-mapped metadata store, so the chat frontends can look up rows by id without loading it all.
     """
-    faiss.write_index(index, index_file)
-    with open(metadata_file, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2)
+    save_index(index, index_file)
+    write_metadata_store(metadata, metadata_file)
     print(f"Saved FAISS index to {index_file} and metadata to {metadata_file}")
 
 def main():
-    # Load documents from the text files directory
-    documents = load_text_files(TEXT_FILES_DIR)
+    # Load documents from the packed corpus, or the text files directory
+    if os.path.exists(CORPUS_FILE):
+        documents = load_corpus_documents(CORPUS_FILE)
+    else:
+        documents = load_text_files(TEXT_FILES_DIR)
     if not documents:
         print("No text files found. Exiting.")
         return
 
-    # Build FAISS index and metadata from document embeddings
-    index, metadata = build_vector_database(documents)
+    index, metadata = None, None
+    if INCREMENTAL_BUILD:
+        index, metadata = load_vector_database(FAISS_INDEX_FILE, METADATA_FILE)
+
+    if index is not None:
+        # Embed only what changed and update the existing index in place
+        index, metadata, stats = update_vector_database(index, metadata, documents)
+        print(f"Incremental update: {stats['added']} added, {stats['changed']} changed, "
+              f"{stats['removed']} removed, {stats['unchanged']} unchanged")
+    else:
+        # Build FAISS index and metadata from document embeddings
+        index, metadata = build_vector_database(documents)
     
     # Save the vector database (FAISS index) and metadata
     save_vector_database(index, metadata, FAISS_INDEX_FILE, METADATA_FILE)
+
+    # The lexical index shares vector ids with the FAISS index and is cheap to rebuild in full
+    save_lexical_index(build_lexical_index(metadata), LEXICAL_INDEX_FILE)
+    print(f"Saved lexical index to {LEXICAL_INDEX_FILE}")
     
+    cache_stats = embedding_cache.stats()
+    print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+          f"({cache_stats['hit_rate']:.0%} hit rate)")
     print("Vector database construction complete.")
 
 if __name__ == '__main__':
@@ -1,9 +1,34 @@
+import sys
 import pandas as pd
 from openai import OpenAI
 from tqdm import tqdm
+from near_duplicates import CLUSTER_COLUMN, cluster_batches, compression_summary
+from record_batches import chunked, iter_batches, write_batches
+from request_packing import format_packing_stats, run_packed, sum_packing_stats
+from batch_jobs import (
+    collect_job, load_job, message_content, poll_job, run_job_locally,
+    save_job, stable_custom_ids, submit_job, write_batch_files
+)
 
 # Load articles from CSV (expected to have "id" and "article_text" columns)
-df = pd.read_csv("./articles.csv")
+input_csv = "./articles.csv"
+id_column = "id"                    # e.g. "comment_id" for data/fcc_comments_clean_24-211.csv
+text_column = "truncated_article"   # e.g. "comment_text"
+output_csv = "./articles_with_analysis_columns.csv"
+
+# The CSV (or a Parquet file) is read this many rows at a time, and only the id and
+# text columns until the results are written, so memory does not grow with its size.
+batch_rows = 1000
+
+model = "gpt-4o"
+
+# Cluster near-identical rows (e.g. form letters in public comments) and analyze only
+# the first row of each cluster; its result is copied to the rest (see near_duplicates.py).
+deduplicate = True
+
+# Batch mode files: the JSONL request files and the job file recording the submitted batch ids
+batch_prefix = "./articles_batch"
+job_file = "./articles_batch_job.json"
 
 # Initialize OpenAI client
 client = OpenAI(
@@ -14,27 +39,146 @@ client = OpenAI(
 system_prompt = """
 """
 
-# List to store analysis results for each article
-results = []
+# Pack mode asks for each article's analysis through this tool, so one request can
+# return the analyses of several short articles (see request_packing.py).
+analysis_tool = {
+    "type": "function",
+    "function": {
+        "name": "analyze_article",
+        "parameters": {
+            "type": "object",
+            "properties": {"analysis": {"type": "string"}},
+            "required": ["analysis"]
+        }
+    }
+}
 
-# Iterate over DataFrame rows with a progress bar
-for index, row in tqdm(df.iterrows(), total=df.shape[0], desc="Analyzing Articles"):
-    article_text = row["truncated_article"]  # Use the truncated article text
-    
-    completion = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
+def request_body(article_text: str) -> dict:
+    return {
+        "model": model,
+        "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": "Analyze the following news article as instructed" + article_text}
         ],
-    )
-    response_content = completion.choices[0].message.content
-    results.append(response_content)
+    }
+
+def load_clusters(path):
+    """
+    Cluster the rows of the input by near-duplicate text, reading only the id and
+    text columns. Returns a DataFrame of row ids and cluster ids, or None when
+    deduplicate is off.
+    """
+    if not deduplicate:
+        return None
+    clusters = cluster_batches(iter_batches(path, [id_column, text_column], batch_rows), text_column, id_column)
+    print(compression_summary(clusters))
+    return clusters
+
+def iter_articles(path, clusters):
+    """
+    Yield (id, text) for every row to analyze, one batch of rows read at a time:
+    with clusters, only the first row of each cluster.
+    """
+    representatives = None if clusters is None else set(clusters[CLUSTER_COLUMN])
+    for batch in iter_batches(path, [id_column, text_column], batch_rows):
+        for row_id, article_text in zip(batch[id_column], batch[text_column]):
+            if representatives is None or row_id in representatives:
+                yield row_id, article_text
+
+def count_articles(path, clusters) -> int:
+    if clusters is not None:
+        return clusters[CLUSTER_COLUMN].nunique()
+    return sum(len(batch) for batch in iter_batches(path, [id_column], batch_rows))
+
+def save_results(path, clusters, results):
+    """
+    Write every input row with its analysis_result (with clusters, its
+    representative's) to output_csv, one batch of rows at a time.
+    `results` maps analyzed row ids to their result.
+    """
+    cluster_of = None if clusters is None else dict(zip(clusters[id_column], clusters[CLUSTER_COLUMN]))
+
+    def with_results(batch):
+        if cluster_of is not None:
+            batch[CLUSTER_COLUMN] = batch[id_column].map(cluster_of)
+            batch["analysis_result"] = batch[CLUSTER_COLUMN].map(results)
+        else:
+            batch["analysis_result"] = batch[id_column].map(results)
+        return batch
+
+    rows = write_batches(output_csv, map(with_results, iter_batches(path, batch_rows=batch_rows)))
+    print(f"Article analysis complete. {rows} row(s) saved to {output_csv}")
+
+def run_sync(path, clusters):
+    # Analysis result for each analyzed article, by id
+    results = {}
+
+    # Iterate over the articles with a progress bar
+    for row_id, article_text in tqdm(iter_articles(path, clusters), total=count_articles(path, clusters),
+                                     desc="Analyzing Articles"):
+        completion = client.chat.completions.create(**request_body(article_text))
+        results[row_id] = completion.choices[0].message.content
+
+    save_results(path, clusters, results)
+
+def run_pack(path, clusters):
+    results = {}
+    stats = None
+    # Each batch of rows is packed and sent on its own, so only one batch of text is held at a time.
+    for documents in chunked(iter_articles(path, clusters), batch_rows):
+        batch_stats = run_packed(client, documents, analysis_tool, system_prompt, model,
+                                 on_result=lambda row_id, arguments: results.__setitem__(row_id, arguments["analysis"]))
+        stats = sum_packing_stats(stats, batch_stats)
+    if stats is not None:
+        print(format_packing_stats(stats))
+    save_results(path, clusters, results)
 
-# Convert the list of analysis dictionaries into a DataFrame
-df["analysis_result"] = results
+def merge_batch_results(path, clusters, batch_results):
+    # Results come back in any order; match them to rows by custom_id.
+    row_ids = [row_id for row_id, _ in iter_articles(path, clusters)]
+    custom_ids = stable_custom_ids("article", row_ids)
+    results = {row_id: message_content(batch_results.get(custom_id)) for row_id, custom_id in zip(row_ids, custom_ids)}
+    missing = sum(1 for result in results.values() if result is None)
+    if missing:
+        print(f"{missing} of {len(results)} article(s) have no result")
+    save_results(path, clusters, results)
 
-# Save the updated DataFrame to a new CSV file
-df.to_csv("./articles_with_analysis_columns.csv", index=False)
+if __name__ == '__main__':
+    # python bulk_filled.py [sync | pack | submit | status | collect | local]
+    #   sync     one request per article, as they are read (default)
+    #   pack     several short articles per request, sharing one cached prompt prefix
+    #   submit   write the requests as JSONL, submit them to the Batch API and exit
+    #   status   show the progress of the submitted job
+    #   collect  wait for the submitted job, then merge its results by custom_id
+    #   local    run the JSONL requests concurrently here instead of through the Batch API
+    mode = sys.argv[1] if len(sys.argv) > 1 else "sync"
+    if mode not in ("sync", "pack", "submit", "status", "collect", "local"):
+        print(f"Usage: {sys.argv[0]} [sync | pack | submit | status | collect | local]")
+        sys.exit(1)
 
-print("Article analysis complete. Results saved to articles_with_analysis_columns.csv")
+    if mode == "sync":
+        run_sync(input_csv, load_clusters(input_csv))
+    elif mode == "pack":
+        run_pack(input_csv, load_clusters(input_csv))
+    elif mode in ("submit", "local"):
+        clusters = load_clusters(input_csv)
+        row_ids = [row_id for row_id, _ in iter_articles(input_csv, clusters)]
+        custom_ids = stable_custom_ids("article", row_ids)
+        # Request bodies are built as the rows are read and written straight to the JSONL files.
+        requests = ((custom_id, request_body(article_text)) for custom_id, (_, article_text)
+                    in zip(custom_ids, iter_articles(input_csv, clusters)))
+        paths = write_batch_files(requests, batch_prefix)
+        print(f"Wrote {len(custom_ids)} request(s) to {len(paths)} batch file(s)")
+        if mode == "submit":
+            submit_job(client, paths, job_file, metadata={"input_csv": input_csv})
+            print(f"Run '{sys.argv[0]} collect' to merge the results once the batches finish")
+        else:
+            merge_batch_results(input_csv, clusters, run_job_locally(client, paths))
+    else:
+        job = load_job(job_file)
+        finished = poll_job(client, job, wait=(mode == "collect"))
+        save_job(job, job_file)
+        if mode == "collect" and finished:
+            # Merge into the CSV the job was built from
+            path = job["metadata"]["input_csv"]
+            merge_batch_results(path, load_clusters(path), collect_job(client, job))
@@ -0,0 +1,222 @@
+import io
+import os
+import re
+import sys
+import glob
+import gzip
+import json
+import hashlib
+import threading
+
+# zstandard compresses faster and smaller than gzip; .jsonl.zst corpora need it.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# A packed corpus is one JSON record per line, with the keys
+#   filename, chapter, section, link, title, text
+# e.g. {"filename": "Chapter184A_Section2.txt", "chapter": "Chapter 184A",
+#       "section": "Section 2", "link": "https://...", "title": "Section 2: ...", "text": "..."}.
+# The file is only ever appended to: a section that changes is written again and
+# the last record for a filename wins. Plain (.jsonl), gzip (.jsonl.gz) and
+# zstandard (.jsonl.zst) files are supported; appends to compressed files add a
+# new compressed frame/member, which readers decode as one stream.
+CORPUS_FILE = "./sections_corpus.jsonl.gz"
+
+# gzip's default level 9 is several times slower than 6 for a few percent smaller files.
+GZIP_LEVEL = 6
+
+# Raised by compressed streams cut short (for example by a crash mid-write)
+_TRUNCATION_ERRORS = (EOFError, gzip.BadGzipFile, json.JSONDecodeError) + ((zstandard.ZstdError,) if zstandard else ())
+
+class CorpusTruncatedError(Exception):
+    """
+    The corpus file ends with an incomplete record.
+    """
+
+# Base URL components used to build section links.
+BASE_URL = "https://malegislature.gov"
+START_PATH = "/Laws/GeneralLaws/PartII/TitleI/"
+
+def open_corpus(path: str, mode: str):
+    """
+    Open a corpus file for reading ('r') or appending ('a') as text, by extension.
+    """
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("zstandard is required for .zst corpora: pip install zstandard")
+        if mode == 'r':
+            reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+            return io.TextIOWrapper(reader, encoding='utf-8')
+        writer = zstandard.ZstdCompressor().stream_writer(open(path, 'ab'))
+        return io.TextIOWrapper(writer, encoding='utf-8')
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + 't', compresslevel=GZIP_LEVEL, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def section_record(chapter_part: str, section_part: str, title: str, text: str) -> dict:
+    """
+    Build a corpus record from URL parts such as ("Chapter184A", "Section2").
+    The filename is the one the scraper would have written the section to.
+    """
+    return {
+        'filename': f"{chapter_part}_{section_part}.txt",
+        'chapter': re.sub(r'^(Chapter)(\d)', r'\1 \2', chapter_part),
+        'section': re.sub(r'^(Section)(\d)', r'\1 \2', section_part),
+        'link': f"{BASE_URL}{START_PATH}{chapter_part}/{section_part}",
+        'title': title,
+        'text': text
+    }
+
+def record_document(record: dict) -> dict:
+    """
+    Convert a corpus record to the document shape build_vectordb indexes
+    (filename, full_text, chapter, section, link), with full_text exactly as
+    read from the section's .txt file.
+    """
+    return {
+        'filename': record['filename'],
+        'full_text': (record['title'] + "\n\n" + record['text']).strip(),
+        'chapter': record['chapter'],
+        'section': record['section'],
+        'link': record['link']
+    }
+
+def record_hash(record: dict) -> str:
+    return hashlib.sha256((record['title'] + "\n\n" + record['text']).encode('utf-8')).hexdigest()
+
+def iter_corpus(path: str):
+    """
+    Stream every record of a corpus file in the order it was written,
+    including records later superseded by a newer copy. Raises
+    CorpusTruncatedError after the last complete record of a damaged file.
+    """
+    try:
+        with open_corpus(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except _TRUNCATION_ERRORS as e:
+        raise CorpusTruncatedError(f"{path} ends with an incomplete record ({e})") from e
+
+def load_corpus(path: str):
+    """
+    Return the current records of a corpus (last copy per filename wins),
+    in the order each filename first appeared. A damaged tail is skipped with a warning.
+    """
+    records = {}
+    try:
+        for record in iter_corpus(path):
+            records[record['filename']] = record
+    except CorpusTruncatedError as e:
+        print(f"Warning: {e}; using the {len(records)} sections before it")
+    return list(records.values())
+
+class Corpus:
+    """
+    Append-only writer for a packed corpus. Keeps the content hash of every
+    section already in the file, so unchanged sections are not written again.
+    Each record is flushed to disk as it is written, so a crash loses at most
+    the record being written; a damaged tail is repaired when the corpus is
+    next opened. Safe to use from several threads.
+    """
+
+    def __init__(self, path=CORPUS_FILE):
+        self.path = path
+        self.hashes = {}
+        self.records = 0
+        if os.path.exists(path):
+            try:
+                for record in iter_corpus(path):
+                    self.hashes[record['filename']] = record_hash(record)
+                    self.records += 1
+            except CorpusTruncatedError as e:
+                # Appending after a damaged tail would hide the new records from readers.
+                print(f"Repairing {e}")
+                self.records = compact_corpus(path)
+        self.lock = threading.Lock()
+        self.file = None
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.hashes
+
+    @property
+    def superseded(self) -> int:
+        """
+        Number of records in the file that a newer copy replaced.
+        """
+        return self.records - len(self.hashes)
+
+    def put(self, record: dict) -> bool:
+        """
+        Append a record unless the corpus already holds the same text for its
+        filename. Returns True if it was written.
+        """
+        digest = record_hash(record)
+        with self.lock:
+            if self.hashes.get(record['filename']) == digest:
+                return False
+            if self.file is None:
+                self.file = open_corpus(self.path, 'a')
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # A sync flush for compressed files: the record is readable without ending the stream.
+            self.file.flush()
+            self.hashes[record['filename']] = digest
+            self.records += 1
+            return True
+
+    def close(self):
+        """
+        Finish the compressed frame or member; the next put starts a new one.
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+def write_corpus(records, path: str):
+    """
+    Write records to a new corpus file, atomically replacing any existing one.
+    """
+    tmp_path = path + ".tmp" + os.path.splitext(path)[1]
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    count = 0
+    with open_corpus(tmp_path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+def compact_corpus(path: str) -> int:
+    """
+    Rewrite a corpus without superseded records. Returns the number of records kept.
+    """
+    return write_corpus(load_corpus(path), path)
+
+def convert_directory(directory: str, path: str) -> int:
+    """
+    Pack a directory of ChapterX_SectionY.txt files (as written by the scraper)
+    into a corpus file. Returns the number of sections packed.
+    """
+    def records():
+        for filepath in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+            filename = os.path.basename(filepath)
+            parts = os.path.splitext(filename)[0].split('_')
+            if len(parts) != 2:
+                print(f"Skipping {filename}: not a ChapterX_SectionY.txt file")
+                continue
+            with open(filepath, 'r', encoding='utf-8') as f:
+                title, _, text = f.read().partition("\n\n")
+            yield section_record(parts[0], parts[1], title, text)
+    return write_corpus(records(), path)
+
+if __name__ == '__main__':
+    # python corpus.py SECTIONS_DIR CORPUS_FILE
+    if len(sys.argv) != 3:
+        print(f"Usage: {sys.argv[0]} SECTIONS_DIR CORPUS_FILE")
+        sys.exit(1)
+    count = convert_directory(sys.argv[1], sys.argv[2])
+    print(f"Packed {count} sections from {sys.argv[1]} into {sys.argv[2]}")
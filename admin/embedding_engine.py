@@ -0,0 +1,193 @@
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import openai
+import numpy as np
+from openai_support import FakeEmbeddingsHandler, backoff_delay, is_retryable, start_fake_server
+
+# tiktoken gives exact token counts; without it we fall back to a conservative
+# characters-per-token estimate.
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+# The embedding model to use (adjust as needed)
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Per-request limits of the OpenAI embeddings endpoint.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+MAX_TOKENS_PER_INPUT = 8191
+
+# Used to estimate token counts when tiktoken is not installed.
+CHARS_PER_TOKEN = 3
+
+# How many embedding requests may be in flight at once.
+MAX_IN_FLIGHT = 4
+
+# Retries for 429s, 5xx errors and dropped connections (see openai_support.py).
+MAX_RETRIES = 6
+
+# Exercise mode settings (python embedding_engine.py)
+EXERCISE_NUM_DOCS = 2000
+
+def count_tokens(text: str) -> int:
+    """
+    Count (or, without tiktoken, estimate) the number of tokens in a text.
+    """
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def truncate_to_tokens(text: str, max_tokens: int = MAX_TOKENS_PER_INPUT) -> str:
+    """
+    Truncate a text so that it fits within the model's per-input token limit.
+    """
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return _ENCODING.decode(tokens[:max_tokens])
+    return text[:(max_tokens - 1) * CHARS_PER_TOKEN]
+
+def pack_batches(texts, max_inputs=MAX_INPUTS_PER_REQUEST, max_tokens=MAX_TOKENS_PER_REQUEST):
+    """
+    Pack texts into request-sized batches.
+    Each batch is a list of (position, text) pairs that stays within both the
+    per-request input count and the per-request token budget. Empty texts are
+    left out, since the API rejects them.
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for position, text in enumerate(texts):
+        if not text or not text.strip():
+            continue
+        text = truncate_to_tokens(text)
+        tokens = count_tokens(text)
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append((position, text))
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+# Errors that no smaller batch or later retry can fix.
+_FATAL_ERRORS = (openai.AuthenticationError, openai.PermissionDeniedError, openai.NotFoundError)
+
+def _is_input_error(error) -> bool:
+    """
+    Errors caused by what was sent: a rejected input or a request that is too large.
+    """
+    return isinstance(error, openai.BadRequestError) or getattr(error, "status_code", None) == 413
+
+def embed_batch(client, batch, model=EMBEDDING_MODEL, max_retries=MAX_RETRIES):
+    """
+    Embed one packed batch of (position, text) pairs with a single request.
+    Retries 429s and 5xx errors with backoff. If the API rejects the batch's
+    input (400 or 413), it is split in half so that one bad input only loses
+    itself. Authentication, permission and not-found errors (a bad key or model
+    name) fail every request alike, so they are raised at once.
+    Returns a list of (position, embedding) pairs; failed inputs get None.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = client.embeddings.create(
+                input=[text for _, text in batch],
+                model=model
+            )
+            # The API reports an index per item, so re-order defensively.
+            ordered = sorted(response.data, key=lambda item: item.index)
+            return [
+                (position, np.array(item.embedding, dtype=np.float32))
+                for (position, _), item in zip(batch, ordered)
+            ]
+        except Exception as e:
+            if is_retryable(e) and attempt < max_retries:
+                delay = backoff_delay(e, attempt)
+                print(f"Embedding request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if isinstance(e, _FATAL_ERRORS):
+                raise
+            if _is_input_error(e) and len(batch) > 1:
+                middle = len(batch) // 2
+                return (embed_batch(client, batch[:middle], model, max_retries)
+                        + embed_batch(client, batch[middle:], model, max_retries))
+            print(f"Error obtaining embeddings for {len(batch)} text(s): {e}")
+            return [(position, None) for position, _ in batch]
+
+def embed_texts(client, texts, model=EMBEDDING_MODEL, max_in_flight=MAX_IN_FLIGHT, progress=None, cache=None):
+    """
+    Embed a list of texts using packed, concurrent requests.
+    At most `max_in_flight` requests run at once. Returns a list of numpy
+    arrays in the same order as `texts`; entries that could not be embedded
+    are None. `progress` may be a tqdm bar, which is advanced per text.
+    If an EmbeddingCache is given, cached texts skip the API entirely and new
+    embeddings are written back to it.
+    """
+    texts = list(texts)
+    embeddings = [None] * len(texts)
+    if cache is not None:
+        embeddings = cache.get_many(model, texts)
+        if progress is not None:
+            progress.update(sum(1 for emb in embeddings if emb is not None))
+    # Only texts without a cached embedding are sent to the API.
+    pending = [text if emb is None else "" for text, emb in zip(texts, embeddings)]
+    batches = pack_batches(pending)
+    if not batches:
+        return embeddings
+
+    # We handle retries ourselves, so switch off the client's built-in ones.
+    client = client.with_options(max_retries=0)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = [executor.submit(embed_batch, client, batch, model) for batch in batches]
+        for future in as_completed(futures):
+            results = future.result()
+            for position, embedding in results:
+                embeddings[position] = embedding
+            if cache is not None:
+                cache.put_many(model, [(texts[position], embedding) for position, embedding in results])
+            if progress is not None:
+                progress.update(len(results))
+    return embeddings
+
+def exercise(num_docs=EXERCISE_NUM_DOCS):
+    """
+    Measure docs/sec for one-request-per-document embedding versus the packed,
+    concurrent engine, both against the local fake endpoint.
+    """
+    rng = random.Random(0)
+    words = ["landlord", "tenant", "lease", "deposit", "premises", "notice", "rent",
+             "shall", "section", "chapter", "court", "property", "mortgage", "the", "of"]
+    texts = [" ".join(rng.choice(words) for _ in range(rng.randint(50, 800))) for _ in range(num_docs)]
+
+    server, base_url = start_fake_server()
+    client = openai.OpenAI(api_key="fake", base_url=base_url)
+    try:
+        sample = texts[:max(1, num_docs // 20)]
+        start = time.perf_counter()
+        sequential = [embed_texts(client, [text], max_in_flight=1)[0] for text in sample]
+        sequential_rate = len(sample) / (time.perf_counter() - start)
+
+        FakeEmbeddingsHandler.request_count = 0
+        start = time.perf_counter()
+        embeddings = embed_texts(client, texts)
+        engine_rate = len(texts) / (time.perf_counter() - start)
+    finally:
+        server.shutdown()
+
+    failed = sum(1 for emb in embeddings if emb is None)
+    mismatched = sum(1 for a, b in zip(sequential, embeddings) if not np.array_equal(a, b))
+    print(f"Sequential (1 doc/request): {sequential_rate:.1f} docs/sec over {len(sample)} docs")
+    print(f"Engine: {engine_rate:.1f} docs/sec over {len(texts)} docs "
+          f"in {FakeEmbeddingsHandler.request_count} requests (including retries)")
+    print(f"Speedup: {engine_rate / sequential_rate:.1f}x, failed: {failed}, out of order: {mismatched}")
+
+if __name__ == '__main__':
+    exercise()
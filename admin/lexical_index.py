@@ -0,0 +1,147 @@
+import re
+import json
+import math
+from collections import Counter
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Constant used by reciprocal rank fusion; 60 is the value from the original RRF paper.
+RRF_K = 60
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "if", "in", "is", "it", "my", "of", "on", "or", "that", "the", "this",
+    "to", "was", "what", "when", "which", "who", "will", "with"
+}
+
+# Matches citations such as "Chapter 186 Section 15B", "ch. 186 sec. 15b" or "c. 186, § 15B".
+CITATION_PATTERN = re.compile(
+    r'\b(?:chapter|ch|c)\.?\s*(\d+[a-z]?)\s*,?\s*(?:section|sec|s\.|§)\.?\s*(\d+[a-z]*)',
+    re.IGNORECASE
+)
+
+def tokenize(text: str):
+    """
+    Lowercase, split into alphanumeric terms, drop stopwords and strip plural "s"
+    so that "deposits" matches "deposit". Section numbers like "15b" stay intact.
+    """
+    terms = []
+    for term in re.findall(r'[a-z0-9]+', text.lower()):
+        if term in STOPWORDS:
+            continue
+        if len(term) > 3 and term.endswith('s') and not term.endswith('ss') and not term[-2].isdigit():
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+def citation_key(chapter: str, section: str) -> str:
+    """
+    Normalize a chapter/section pair, e.g. ("Chapter 186", "Section 15B") -> "186|15b".
+    """
+    chapter = re.sub(r'^chapter\s*', '', chapter.strip(), flags=re.IGNORECASE)
+    section = re.sub(r'^section\s*', '', section.strip(), flags=re.IGNORECASE)
+    return f"{chapter.lower()}|{section.lower()}"
+
+def parse_citation(query: str):
+    """
+    Return the citation key of the first chapter/section citation in a query, or None.
+    """
+    match = CITATION_PATTERN.search(query)
+    if match is None:
+        return None
+    return citation_key(match.group(1), match.group(2))
+
+def build_lexical_index(metadata) -> dict:
+    """
+    Build an inverted index over a metadata list (indexed by FAISS vector id), so lexical
+    results share ids with the vector index. Indexes each entry's chunk_text (or full_text
+    for older metadata) and records which ids belong to each chapter/section citation.
+    """
+    postings = {}
+    doc_lengths = []
+    citations = {}
+    for vector_id, entry in enumerate(metadata):
+        if entry is None:
+            doc_lengths.append(0)
+            continue
+        terms = tokenize(entry.get('chunk_text', entry.get('full_text', '')))
+        doc_lengths.append(len(terms))
+        for term, tf in Counter(terms).items():
+            ids, tfs = postings.setdefault(term, ([], []))
+            ids.append(vector_id)
+            tfs.append(tf)
+        if entry.get('chapter') and entry.get('section'):
+            citations.setdefault(citation_key(entry['chapter'], entry['section']), []).append(
+                (entry.get('chunk_index', 0), vector_id)
+            )
+    # Incremental rebuilds reuse free vector ids, so a section's ids are not
+    # necessarily in chunk order; sort them by chunk index.
+    citations = {key: [vector_id for _, vector_id in sorted(chunks)] for key, chunks in citations.items()}
+    return {'doc_lengths': doc_lengths, 'postings': postings, 'citations': citations}
+
+def save_lexical_index(data: dict, path: str):
+    """
+    Write a lexical index built by build_lexical_index to a JSON file.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+class LexicalIndex:
+    """
+    BM25 search over the inverted index written by build_lexical_index,
+    plus a direct lookup from chapter/section citations to vector ids.
+    """
+
+    def __init__(self, data: dict):
+        self.postings = data['postings']
+        self.doc_lengths = data['doc_lengths']
+        self.citations = data['citations']
+        lengths = [length for length in self.doc_lengths if length]
+        self.num_docs = len(lengths)
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def search(self, query: str, top_k: int, candidate_ids=None):
+        """
+        Return up to top_k (vector_id, score) pairs ranked by BM25.
+        If candidate_ids is given, only those ids are scored.
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            ids, tfs = self.postings[term]
+            idf = math.log(1 + (self.num_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            for vector_id, tf in zip(ids, tfs):
+                if candidate_ids is not None and vector_id not in candidate_ids:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[vector_id] / self.avg_length)
+                scores[vector_id] = scores.get(vector_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def lookup_citation(self, query: str):
+        """
+        If the query cites a chapter and section that is in the index, return that
+        section's vector ids in chunk order; otherwise return None.
+        """
+        key = parse_citation(query)
+        if key is None:
+            return None
+        return self.citations.get(key)
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Combine several ranked lists of ids into one, scoring each id by the sum of
+    1 / (k + rank) over the lists it appears in. Returns ids, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, vector_id in enumerate(ranking, start=1):
+            scores[vector_id] = scores.get(vector_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
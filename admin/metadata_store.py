@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import numpy as np
+
+# File layout (all integers little-endian uint64):
+#   magic (8 bytes) | row count | offset-table position | row data ... | offset table
+# Each row is one compact JSON object; row i spans offsets[i]:offsets[i + 1] of the
+# row data. Empty rows stand for removed vectors (None in the metadata list).
+MAGIC = b"DPIMETA1"
+HEADER = struct.Struct("<8sQQ")
+
+def write_metadata_store(metadata, path: str):
+    """
+    Write a metadata list (indexed by FAISS vector id, None for empty slots)
+    to an offset-indexed binary file. Writes to a temporary file first so
+    readers never see a half-written store.
+    """
+    tmp_path = path + ".tmp"
+    offsets = [0]
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+        for entry in metadata:
+            row = b"" if entry is None else json.dumps(entry, separators=(',', ':')).encode('utf-8')
+            f.write(row)
+            offsets.append(offsets[-1] + len(row))
+        table_position = f.tell()
+        f.write(np.array(offsets, dtype='<u8').tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(metadata), table_position))
+    os.replace(tmp_path, path)
+
+class MetadataStore:
+    """
+    Read-only, memory-mapped view of a metadata file written by write_metadata_store.
+    Opening it only maps the file; a lookup by FAISS id decodes just that row,
+    so startup time and memory do not grow with the corpus.
+    Supports len(), indexing and iteration like the metadata list it replaces.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, table_position = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a metadata store file")
+        self._offsets = np.frombuffer(self._mmap, dtype='<u8', count=self._count + 1, offset=table_position)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, vector_id: int):
+        if not 0 <= vector_id < self._count:
+            raise IndexError(f"metadata id {vector_id} out of range")
+        start = HEADER.size + int(self._offsets[vector_id])
+        end = HEADER.size + int(self._offsets[vector_id + 1])
+        if start == end:
+            return None
+        return json.loads(self._mmap[start:end])
+
+    def __iter__(self):
+        for vector_id in range(self._count):
+            yield self[vector_id]
+
+    def close(self):
+        # Drop the numpy view first; the mmap cannot close while it is exported.
+        self._offsets = None
+        self._mmap.close()
+        self._file.close()
+
+def convert_json_metadata(json_path: str, store_path: str):
+    """
+    Convert a metadata.json file written by older builds into a metadata store.
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    write_metadata_store(metadata, store_path)
+    print(f"Converted {len(metadata)} metadata entries from {json_path} to {store_path}")
+
+if __name__ == '__main__':
+    # Usage: python metadata_store.py metadata.json metadata.bin
+    if len(sys.argv) != 3:
+        print("Usage: python metadata_store.py <metadata.json> <metadata.bin>")
+        sys.exit(1)
+    convert_json_metadata(sys.argv[1], sys.argv[2])
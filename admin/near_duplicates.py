@@ -0,0 +1,240 @@
+import re
+import sys
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+from record_batches import iter_batches, peak_memory_mb
+
+# Public-comment dockets are dominated by form letters: the same text sent
+# thousands of times with a changed name or sentence. Comments are clustered by
+# MinHash signatures of their word shingles, bucketed with LSH, and only one
+# representative per cluster needs to go through the model; its labels are then
+# copied to the other members.
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+LSH_BANDS = 16                # 16 bands of 8 rows: pairs above ~0.7 Jaccard become candidates
+SIMILARITY_THRESHOLD = 0.8    # estimated Jaccard similarity for two comments to share a cluster
+SEED = 0
+
+# Column added to the DataFrame: the id of the row representing each row's cluster
+CLUSTER_COLUMN = "cluster_id"
+
+# Signatures are computed for blocks of about this many shingles at a time, to bound memory.
+_BLOCK_SHINGLES = 1 << 16
+_SHINGLE_BASE = np.uint64(1_000_003)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+# Stands in for missing words in texts shorter than a shingle; \w+ never matches it.
+_PADDING = "\0"
+
+def normalize_words(text) -> list:
+    """
+    Lowercased word tokens of a text, ignoring punctuation and spacing.
+    """
+    if not isinstance(text, str):
+        return []
+    return re.findall(r"\w+", text.lower())
+
+def shingle_hashes(word_lists, shingle_words: int = SHINGLE_WORDS):
+    """
+    Hash every run of `shingle_words` consecutive words in each list of words to
+    32 bits. Shorter lists give a single shingle of all their words.
+    Returns (hashes, starts): the hashes of list i are hashes[starts[i]:starts[i + 1]].
+    """
+    words = []
+    lengths = []
+    for word_list in word_lists:
+        padding = max(0, shingle_words - len(word_list))
+        words.extend(word_list)
+        words.extend([_PADDING] * padding)
+        lengths.append(len(word_list) + padding)
+    # Each distinct word gets a fixed 64-bit hash, so signatures computed in
+    # separate calls (one per batch, say) are comparable.
+    codes, uniques = pd.factorize(pd.Series(words, dtype=object))
+    word_hashes = np.array([int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+                            for word in uniques], dtype=np.uint64)
+    ids = word_hashes[codes]
+    lengths = np.array(lengths, dtype=np.int64)
+    ends = np.cumsum(lengths)
+
+    # Polynomial hash of each window, computed for every position at once.
+    positions = len(ids) - shingle_words + 1
+    hashes = np.zeros(positions, dtype=np.uint64)
+    for j in range(shingle_words):
+        hashes = hashes * _SHINGLE_BASE + ids[j:j + positions]
+    # Keep only windows that start and end inside one list.
+    valid = np.ones(positions, dtype=bool)
+    for offset in range(1, shingle_words):
+        valid[ends[:-1] - offset] = False
+    hashes = (hashes[valid] * _MIX) >> np.uint64(32)
+    return hashes, np.concatenate([[0], np.cumsum(lengths - shingle_words + 1)])
+
+def _signatures(word_lists, num_perm: int, seed: int) -> np.ndarray:
+    hashes, starts = shingle_hashes(word_lists)
+    # Multiply-shift hashing: (a * x + b) >> 32 over 64-bit words is a cheap
+    # universal family for 32-bit x, with no modulo in the inner loop.
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+    signatures = np.empty((len(starts) - 1, num_perm), dtype=np.uint32)
+    first = 0
+    while first < len(starts) - 1:
+        # Whole texts per block; a text longer than the block gets a block of its own.
+        last = max(first + 1, int(np.searchsorted(starts, starts[first] + _BLOCK_SHINGLES, side="right")) - 1)
+        last = min(last, len(starts) - 1)
+        block = hashes[starts[first]:starts[last]]
+        permuted = a[:, None] * block[None, :]
+        permuted += b[:, None]
+        permuted >>= np.uint64(32)
+        # Every text has at least one shingle, so each segment is non-empty.
+        signatures[first:last] = np.minimum.reduceat(permuted, starts[first:last] - starts[first], axis=1).T
+        first = last
+    return signatures
+
+def minhash_signatures(texts, num_perm: int = NUM_PERM, seed: int = SEED) -> np.ndarray:
+    """
+    Return an (n texts, num_perm) array of MinHash signatures of the texts' word shingles.
+    """
+    return _signatures([normalize_words(text) for text in texts], num_perm, seed)
+
+def _exact_key(words) -> bytes:
+    # A digest stands in for the normalized text, so grouping copies keeps no text in memory.
+    return hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=16).digest()
+
+def _merge_candidates(signatures: np.ndarray, threshold: float, bands: int) -> np.ndarray:
+    """
+    Union signatures that share an LSH band and agree on at least `threshold` of
+    their values. Returns each signature's root, the smallest position in its group.
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows]).view(f"V{4 * rows}").ravel()
+        _, buckets = np.unique(keys, return_inverse=True)
+        order = np.argsort(buckets, kind="stable")
+        boundaries = np.flatnonzero(np.diff(buckets[order])) + 1
+        for members in np.split(order, boundaries):
+            if len(members) < 2:
+                continue
+            # Candidates share a band; confirm them against the bucket's first text.
+            similarity = (signatures[members[1:]] == signatures[members[0]]).mean(axis=1)
+            root = find(members[0])
+            for member in members[1:][similarity >= threshold]:
+                other = find(member)
+                if other != root:
+                    parent[max(root, other)] = min(root, other)
+                    root = min(root, other)
+
+    return np.array([find(i) for i in range(n)], dtype=np.int64)
+
+def cluster_near_duplicates(texts, threshold: float = SIMILARITY_THRESHOLD, bands: int = LSH_BANDS) -> np.ndarray:
+    """
+    Group texts whose estimated Jaccard similarity is at least `threshold`.
+    Returns, for each text, the position of its cluster's representative (the
+    cluster's first text).
+    """
+    # Exact copies (after normalization) are grouped first, so each distinct text is hashed once.
+    first_copy = {}
+    copy_of = []
+    unique_words = []
+    first_positions = []
+    for position, text in enumerate(texts):
+        words = normalize_words(text)
+        key = _exact_key(words)
+        if key not in first_copy:
+            first_copy[key] = len(unique_words)
+            unique_words.append(words)
+            first_positions.append(position)
+        copy_of.append(first_copy[key])
+
+    roots = _merge_candidates(_signatures(unique_words, NUM_PERM, SEED), threshold, bands)
+    # Distinct texts are numbered in order of first appearance, so the smallest one
+    # in a cluster is its earliest text, which becomes the representative.
+    return np.array(first_positions)[roots[np.array(copy_of, dtype=np.int64)]]
+
+def cluster_batches(batches, text_column: str, id_column=None,
+                    threshold: float = SIMILARITY_THRESHOLD, bands: int = LSH_BANDS) -> pd.DataFrame:
+    """
+    Cluster rows arriving as DataFrame batches (see record_batches.py), keeping
+    only their MinHash signatures, so memory grows with the number of distinct
+    texts rather than with their length. Rows are identified by id_column, or by
+    their index label if it is None. Returns a DataFrame of each row's id and its
+    representative's id in CLUSTER_COLUMN, in input order.
+    """
+    first_copy = {}
+    copy_of = []
+    ids = []
+    first_ids = []
+    signatures = []
+    for batch in batches:
+        new_words = []
+        for row_id, text in zip(batch[id_column] if id_column else batch.index, batch[text_column]):
+            words = normalize_words(text)
+            key = _exact_key(words)
+            if key not in first_copy:
+                first_copy[key] = len(first_ids)
+                new_words.append(words)
+                first_ids.append(row_id)
+            copy_of.append(first_copy[key])
+            ids.append(row_id)
+        if new_words:
+            signatures.append(_signatures(new_words, NUM_PERM, SEED))
+
+    signatures = np.concatenate(signatures) if signatures else np.empty((0, NUM_PERM), dtype=np.uint32)
+    roots = _merge_candidates(signatures, threshold, bands)
+    representatives = pd.Series(first_ids).to_numpy()[roots[np.array(copy_of, dtype=np.int64)]]
+    return pd.DataFrame({id_column or "id": ids, CLUSTER_COLUMN: representatives})
+
+def add_clusters(df: pd.DataFrame, text_column: str, id_column=None):
+    """
+    Cluster the rows of a DataFrame by near-duplicate text. Returns (the DataFrame
+    with a CLUSTER_COLUMN holding each row's representative id, the representative
+    rows). Rows are identified by id_column, or by their index label if it is None.
+    """
+    representatives = cluster_near_duplicates(df[text_column].tolist())
+    ids = (df[id_column] if id_column else df.index).to_numpy()
+    df = df.copy()
+    df[CLUSTER_COLUMN] = ids[representatives]
+    return df, df[ids == df[CLUSTER_COLUMN].to_numpy()]
+
+def propagate_labels(df: pd.DataFrame, labeled: pd.DataFrame, id_column: str, label_columns) -> pd.DataFrame:
+    """
+    Copy the label columns of each representative row in `labeled` to every row of
+    `df` in its cluster.
+    """
+    labels = labeled.set_index(id_column)[list(label_columns)]
+    expanded = labels.reindex(df[CLUSTER_COLUMN])
+    df = df.drop(columns=[column for column in label_columns if column in df.columns])
+    for column in label_columns:
+        df[column] = expanded[column].to_numpy()
+    return df
+
+def compression_summary(df: pd.DataFrame) -> str:
+    rows = len(df)
+    clusters = df[CLUSTER_COLUMN].nunique()
+    largest = df[CLUSTER_COLUMN].value_counts().iloc[0] if rows else 0
+    ratio = rows / clusters if clusters else 1.0
+    return (f"{rows} rows -> {clusters} clusters ({ratio:.2f}x compression, "
+            f"{rows - clusters} near-duplicates skipped, largest cluster {largest})")
+
+if __name__ == '__main__':
+    # python near_duplicates.py CSV_FILE TEXT_COLUMN ID_COLUMN [OUTPUT_CSV]
+    if len(sys.argv) not in (4, 5):
+        print(f"Usage: {sys.argv[0]} CSV_FILE TEXT_COLUMN ID_COLUMN [OUTPUT_CSV]")
+        sys.exit(1)
+    csv_file, text_column, id_column = sys.argv[1:4]
+    start = time.perf_counter()
+    clusters = cluster_batches(iter_batches(csv_file, [id_column, text_column]), text_column, id_column)
+    print(f"{compression_summary(clusters)} in {time.perf_counter() - start:.2f}s, "
+          f"peak memory {peak_memory_mb():.0f} MB")
+    if len(sys.argv) == 5:
+        clusters.to_csv(sys.argv[4], index=False)
+        print(f"Saved cluster assignments to {sys.argv[4]}")
@@ -0,0 +1,39 @@
+import numpy as np
+from embedding_cache import EmbeddingCache, text_hash
+
+def test_text_hash_normalizes_whitespace():
+    assert text_hash("  a lease\n of  land ") == text_hash("a lease of land")
+    assert text_hash("a lease") != text_hash("a leash")
+
+def test_get_many_hits_and_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("model", [("landlord", np.ones(4)), ("tenant", None)])
+    hit, miss = cache.get_many("model", ["landlord", "tenant"])
+    assert np.array_equal(hit, np.ones(4, dtype=np.float32))
+    assert miss is None
+    assert cache.get("other-model", "landlord") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+    cache.close()
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path)
+    cache.put("model", "deposit", np.arange(3))
+    cache.close()
+    cache = EmbeddingCache(path)
+    assert np.array_equal(cache.get("model", "deposit"), np.arange(3, dtype=np.float32))
+    assert cache.stats()["bytes"] == 12
+    cache.close()
+
+def test_evicts_least_recently_used(tmp_path):
+    # Room for two 4-float vectors.
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_bytes=32)
+    cache.put("model", "first", np.zeros(4))
+    cache.put("model", "second", np.zeros(4))
+    cache.get("model", "first")
+    cache.put("model", "third", np.zeros(4))
+    assert cache.get("model", "second") is None
+    assert cache.get("model", "first") is not None
+    assert cache.get("model", "third") is not None
+    assert cache.stats()["bytes"] <= 32
+    cache.close()
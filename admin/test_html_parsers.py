@@ -0,0 +1,44 @@
+import pytest
+from html_parsers import available_backends, parse_chapter_page, parse_section_page
+
+BASE = "https://malegislature.gov"
+CHAPTER_URL = BASE + "/Laws/GeneralLaws/PartII/TitleI/Chapter186"
+
+CHAPTER_HTML = """
+<html><body>
+<a href="/Laws/GeneralLaws/PartII/TitleI/Chapter186/Section15B">Section 15B</a>
+<a href="/Laws/GeneralLaws/PartII/TitleI/Chapter186/Section1">Section 1</a>
+<a href="/Laws/GeneralLaws/PartII/TitleI/Chapter187/Section1">Elsewhere</a>
+<a href="/Laws/GeneralLaws/PartII/TitleI/Chapter186/Section1">Section 1 again</a>
+<button class="btn btn-sm nextButton" onclick="location.href = '/Laws/GeneralLaws/PartII/TitleI/Chapter187';">Next</button>
+</body></html>
+"""
+
+SECTION_HTML = """
+<html><body>
+<div class="col-xs-12"><h2 id="skipTo">Chapter 186</h2></div>
+<div class="col-xs-12 content">
+  <h2 id="skipTo">Section 15B: <small>Security deposits</small></h2>
+  <p>A lessor may require <b>a security deposit</b>.</p>
+  <p></p>
+  <p>A lessor may require <b>a security deposit</b>.</p>
+  <p>Interest is due yearly.</p>
+</div>
+</body></html>
+"""
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_chapter_page(backend):
+    next_url, sections = parse_chapter_page(backend, CHAPTER_HTML, CHAPTER_URL, BASE)
+    assert next_url == BASE + "/Laws/GeneralLaws/PartII/TitleI/Chapter187"
+    assert sorted(sections) == [CHAPTER_URL + "/Section1", CHAPTER_URL + "/Section15B"]
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_section_page(backend):
+    title, text = parse_section_page(backend, SECTION_HTML, CHAPTER_URL + "/Section15B")
+    assert title == "Section 15B: Security deposits"
+    assert text == "A lessor may requirea security deposit.\n\nInterest is due yearly."
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_page_without_section(backend):
+    assert parse_section_page(backend, "<html><body><p>Not found</p></body></html>", CHAPTER_URL) == (None, None)
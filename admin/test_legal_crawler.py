@@ -0,0 +1,58 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from crawl_state import CrawlState
+from legal_crawler import Crawler
+
+PAGE = b"<html><body><p>Section 1</p></body></html>"
+
+class ConditionalHandler(BaseHTTPRequestHandler):
+    """
+    Serves PAGE with an ETag and answers 304 when the client already has it.
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ConditionalHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def _fetch(crawler, url):
+    try:
+        return asyncio.run(crawler.fetch(url))
+    finally:
+        crawler.executor.shutdown()
+        crawler.session.close()
+
+def test_not_modified_pages_are_mirrored_from_the_cache(base_url, tmp_path):
+    state = CrawlState(str(tmp_path / "state.sqlite"))
+    url = base_url + "/Laws/GeneralLaws/Chapter186/Section1"
+
+    crawler = Crawler(base_url, state=state, parse_processes=0)
+    html, modified, response = _fetch(crawler, url)
+    assert modified and response is not None
+    crawler.remember(url, response)
+
+    mirror_dir = tmp_path / "mirror"
+    crawler = Crawler(base_url, state=state, mirror_dir=str(mirror_dir), parse_processes=0)
+    html, modified, response = _fetch(crawler, url)
+    assert not modified and response is None
+    assert crawler.stats["not_modified"] == 1
+    mirrored = mirror_dir / "Laws/GeneralLaws/Chapter186/Section1/index.html"
+    assert mirrored.read_bytes() == PAGE
+    state.close()
@@ -0,0 +1,38 @@
+from lexical_index import LexicalIndex, build_lexical_index, parse_citation, reciprocal_rank_fusion, tokenize
+
+METADATA = [
+    {"chapter": "Chapter 186", "section": "Section 15B", "chunk_text": "Security deposits held by the lessor earn interest."},
+    None,
+    {"chapter": "Chapter 186", "section": "Section 15B", "chunk_text": "The lessor shall pay interest on deposits yearly."},
+    {"chapter": "Chapter 183", "section": "Section 55", "chunk_text": "A mortgage discharge shall be recorded."},
+]
+
+def test_tokenize_strips_plurals_but_keeps_section_numbers():
+    assert tokenize("The deposits of Section 15B") == ["deposit", "section", "15b"]
+
+def test_parse_citation():
+    assert parse_citation("What does Chapter 186 Section 15B say?") == "186|15b"
+    assert parse_citation("see c. 183, s. 55") == "183|55"
+    assert parse_citation("What is a security deposit?") is None
+
+def test_lookup_citation_and_search():
+    index = LexicalIndex(build_lexical_index(METADATA))
+    assert index.lookup_citation("chapter 186 section 15b interest") == [0, 2]
+    assert index.lookup_citation("Chapter 999 Section 1") is None
+    results = index.search("mortgage discharge", top_k=2)
+    assert results[0][0] == 3
+    assert [vector_id for vector_id, _ in index.search("interest", top_k=5, candidate_ids={2})] == [2]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 3, 1], [2]])
+    assert fused[0] == 2
+
+def test_citation_ids_follow_chunk_order_not_vector_ids():
+    # As after an incremental rebuild that put the section's first chunk in a freed id.
+    metadata = [
+        {"chapter": "Chapter 186", "section": "Section 15B", "chunk_index": 1, "chunk_text": "second part"},
+        {"chapter": "Chapter 186", "section": "Section 15B", "chunk_index": 2, "chunk_text": "third part"},
+        {"chapter": "Chapter 183", "section": "Section 55", "chunk_index": 0, "chunk_text": "other"},
+        {"chapter": "Chapter 186", "section": "Section 15B", "chunk_index": 0, "chunk_text": "first part"},
+    ]
+    assert LexicalIndex(build_lexical_index(metadata)).lookup_citation("c. 186 s. 15B") == [3, 0, 1]
@@ -0,0 +1,36 @@
+import pandas as pd
+from near_duplicates import (
+    CLUSTER_COLUMN, add_clusters, cluster_batches, cluster_near_duplicates, propagate_labels
+)
+
+FORM_LETTER = ("I am writing to oppose the proposed rule because it will raise costs for "
+               "small businesses in my community and reduce access to affordable credit for families")
+
+def _comments():
+    return pd.DataFrame({
+        "id": ["a", "b", "c", "d", "e"],
+        "comment_text": [
+            FORM_LETTER + " Sincerely, Alice",
+            FORM_LETTER.upper() + "  Sincerely, Bob",
+            "The agency should extend the comment period by ninety days.",
+            FORM_LETTER + " Sincerely, Alice",
+            "",
+        ],
+    })
+
+def test_near_copies_share_a_cluster():
+    representatives = cluster_near_duplicates(_comments()["comment_text"].tolist())
+    assert list(representatives) == [0, 0, 2, 0, 4]
+
+def test_cluster_batches_matches_whole_frame():
+    df = _comments()
+    clustered, representatives = add_clusters(df, "comment_text", "id")
+    streamed = cluster_batches([df.iloc[:2], df.iloc[2:]], "comment_text", "id")
+    assert list(streamed[CLUSTER_COLUMN]) == list(clustered[CLUSTER_COLUMN]) == ["a", "a", "c", "a", "e"]
+    assert list(representatives["id"]) == ["a", "c", "e"]
+
+def test_propagate_labels():
+    clustered, representatives = add_clusters(_comments(), "comment_text", "id")
+    labeled = representatives[["id"]].assign(stance=["oppose", "neutral", None])
+    result = propagate_labels(clustered, labeled, "id", ["stance"])
+    assert list(result["stance"][:4]) == ["oppose", "oppose", "neutral", "oppose"]
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+import openai
+import numpy as np
+import pytest
+from openai_support import FakeEmbeddingsHandler, backoff_delay, is_retryable, start_fake_server
+from embedding_engine import embed_batch, embed_texts, pack_batches
+
+def _status_error(cls, status, headers=None):
+    # The exceptions only read these attributes of the HTTP response.
+    response = SimpleNamespace(status_code=status, headers=headers or {}, request=None)
+    return cls("error", response=response, body=None)
+
+def test_is_retryable():
+    assert is_retryable(_status_error(openai.RateLimitError, 429))
+    assert is_retryable(_status_error(openai.InternalServerError, 500))
+    assert is_retryable(openai.APIConnectionError(request=None))
+    assert not is_retryable(_status_error(openai.BadRequestError, 400))
+    assert not is_retryable(ValueError("not an API error"))
+
+def test_backoff_delay_honors_retry_after():
+    error = _status_error(openai.RateLimitError, 429, {"retry-after": "2.5"})
+    assert backoff_delay(error, 0) == 2.5
+    capped = _status_error(openai.RateLimitError, 429, {"retry-after": "600"})
+    assert backoff_delay(capped, 0, max_delay=10) == 10
+
+def test_backoff_delay_is_jittered_and_capped():
+    error = _status_error(openai.InternalServerError, 500)
+    for attempt in range(10):
+        assert 0 <= backoff_delay(error, attempt, base=1.0, max_delay=8.0) <= min(8.0, 2 ** attempt)
+
+def test_pack_batches_respects_limits():
+    texts = ["one two three", "", "four five", "six", "   "]
+    batches = pack_batches(texts, max_inputs=2)
+    assert [[position for position, _ in batch] for batch in batches] == [[0, 2], [3]]
+
+def test_embed_texts_against_fake_server():
+    class NoFailures(FakeEmbeddingsHandler):
+        failure_rate = 0.0
+        latency = 0.0
+
+    server, base_url = start_fake_server(NoFailures)
+    try:
+        client = openai.OpenAI(api_key="fake", base_url=base_url)
+        texts = ["landlord", "", "tenant", "landlord"]
+        embeddings = embed_texts(client, texts, max_in_flight=2)
+    finally:
+        server.shutdown()
+    assert embeddings[1] is None
+    assert embeddings[0].shape == (FakeEmbeddingsHandler.dimension,)
+    assert np.array_equal(embeddings[0], embeddings[3])
+    assert not np.array_equal(embeddings[0], embeddings[2])
+
+class FailingClient:
+    """
+    An embeddings client whose requests fail with `error` when they contain `bad_text`
+    (or always, if it is None).
+    """
+    def __init__(self, error, bad_text=None):
+        self.error = error
+        self.bad_text = bad_text
+        self.requests = 0
+        self.embeddings = SimpleNamespace(create=self.create)
+
+    def create(self, input, model):
+        self.requests += 1
+        if self.bad_text is None or self.bad_text in input:
+            raise self.error
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[1.0, 0.0]) for i in range(len(input))])
+
+def test_embed_batch_splits_on_a_bad_input():
+    client = FailingClient(_status_error(openai.BadRequestError, 400), bad_text="bad")
+    batch = list(enumerate(["good", "good", "bad", "good"]))
+    results = embed_batch(client, batch)
+    assert [position for position, embedding in results if embedding is None] == [2]
+    assert client.requests < 2 * len(batch)
+
+@pytest.mark.parametrize("error_class, status", [
+    (openai.AuthenticationError, 401),
+    (openai.PermissionDeniedError, 403),
+    (openai.NotFoundError, 404),
+])
+def test_embed_batch_raises_auth_and_model_errors_at_once(error_class, status):
+    client = FailingClient(_status_error(error_class, status))
+    with pytest.raises(error_class):
+        embed_batch(client, list(enumerate(["text"] * 2048)))
+    assert client.requests == 1
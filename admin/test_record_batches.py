@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+from record_batches import chunked, iter_batches, iter_rows, write_batches
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "comments.csv"
+    pd.DataFrame({
+        "id": [f"c{i}" for i in range(10)],
+        "comment_text": [f"comment {i}" for i in range(10)],
+        "extra": range(10),
+    }).to_csv(path, index=False)
+    return str(path)
+
+def test_iter_batches_matches_whole_file_read(csv_path):
+    batches = list(iter_batches(csv_path, ["comment_text", "id"], batch_rows=4))
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert list(batches[0].columns) == ["comment_text", "id"]
+    pd.testing.assert_frame_equal(pd.concat(batches), pd.read_csv(csv_path)[["comment_text", "id"]])
+
+def test_iter_batches_max_rows(csv_path):
+    batches = list(iter_batches(csv_path, batch_rows=4, max_rows=6))
+    assert [len(batch) for batch in batches] == [4, 2]
+    assert list(iter_batches(csv_path, max_rows=0)) == []
+
+def test_iter_rows_yields_row_labels_for_none(csv_path):
+    rows = list(iter_rows(csv_path, [None, "id"], batch_rows=3))
+    assert rows[0] == (0, "c0")
+    assert rows[-1] == (9, "c9")
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
+def test_write_batches_round_trip(tmp_path, csv_path):
+    output = str(tmp_path / "out.csv")
+    assert write_batches(output, iter_batches(csv_path, batch_rows=3)) == 10
+    pd.testing.assert_frame_equal(pd.read_csv(output), pd.read_csv(csv_path))
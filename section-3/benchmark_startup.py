@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+import statistics
+import subprocess
+
+# Measures time-to-prompt for legal_chat.py: from launching the process until
+# "Enter your query:" is printed. Run from the section-3 directory.
+CHAT_SCRIPT = "./legal_chat.py"
+PROMPT = b"Enter your query:"
+RUNS = 5
+
+def time_to_prompt(fast_start: bool) -> float:
+    """
+    Launch legal_chat.py once, wait for its prompt, then exit it.
+    Returns the elapsed seconds until the prompt appeared.
+    """
+    env = dict(os.environ, LEGAL_CHAT_FAST_START="1" if fast_start else "0")
+    # The client needs some key to be constructed; no request is ever made.
+    env.setdefault("OPENAI_API_KEY", "startup-benchmark")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-u", CHAT_SCRIPT],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env
+    )
+    output = b""
+    while PROMPT not in output:
+        byte = process.stdout.read(1)
+        if not byte:
+            raise RuntimeError(f"{CHAT_SCRIPT} exited before showing its prompt:\n{output.decode()}")
+        output += byte
+    elapsed = time.perf_counter() - start
+    process.communicate(b"exit\n")
+    return elapsed
+
+def main():
+    # One untimed run so both modes see a warm OS file cache.
+    time_to_prompt(fast_start=False)
+    for label, fast_start in [("Eager loading (before)", False), ("Fast start (after)", True)]:
+        timings = [time_to_prompt(fast_start) for _ in range(RUNS)]
+        print(f"{label}: median {statistics.median(timings) * 1000:.0f} ms, "
+              f"min {min(timings) * 1000:.0f} ms over {RUNS} runs")
+
+if __name__ == '__main__':
+    main()
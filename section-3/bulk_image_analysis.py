@@ -1,51 +1,313 @@
+import os
+import re
+import sys
+import csv
+import json
+import time
+import random
+import asyncio
+import tempfile
 import pandas as pd
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI
+from record_batches import iter_batches, iter_rows
+from openai_support import FakeEmbeddingsHandler, backoff_delay, is_retryable, start_fake_server
 
 # CSV file containing image details (must have 'image_id' and 'url' columns)
 csv_file = "./images.csv"  # Update with your CSV file path if needed
 
-# Read the CSV into a DataFrame
-df = pd.read_csv(csv_file)
-
-# Initialize the OpenAI client with your API key
-client = OpenAI(api_key="YOUR API KEY")
-
-# List to store the results for each image
-results = []
-
-# Iterate over the DataFrame rows with a progress bar
-for index, row in df.iterrows():
-    image_id = row["image_id"]
-    image_url = row["url"]
-    
-    # Make the API query that includes both text and image input
-    response = client.responses.create(
-        model="gpt-4o-mini",
-        input=[{
-            "role": "user",
-            "content": [
-                {"type": "input_text", "text": "Return one word capturing the sentiment of the image."},
-                {"type": "input_image", "image_url": image_url},
-            ],
-        }],
-    )
-    
-    # Extract the output text from the response
-    
-    output_text = response.output_text
-    print("Image ID:", image_id)
-    print("Model Response: ", output_text)
-    # Append the result for this image
-    results.append({
-        "image_id": image_id,
-        "url": image_url,
-        "output_text": output_text,
-    })
-
-# Convert the list of dictionaries into a DataFrame
-results_df = pd.DataFrame(results)
-
-# Save the results to a CSV file
-results_df.to_csv("./images_analysis_results.csv", index=False)
-
-print("Image analysis complete. Results saved to images_analysis_results.csv")
+# Results are appended here one row at a time as each image finishes, so an
+# interrupted run keeps its finished work; images already in the file are skipped
+# when the script is run again.
+results_file = "./images_analysis_results.csv"
+
+MODEL = "gpt-4o-mini"
+PROMPT = "Return one word capturing the sentiment of the image."
+
+# Most vision requests in flight at once. The limiter halves this after a 429 and
+# grows it back by one after each full window of successful requests.
+MAX_CONCURRENCY = 16
+
+# Pause new requests when the x-ratelimit-remaining-* headers drop to this
+# headroom, until the matching x-ratelimit-reset-* time has passed.
+MIN_REMAINING_REQUESTS = 2
+MIN_REMAINING_TOKENS = 20_000
+
+# Per-image retries for 429s, 5xx errors and dropped connections (see openai_support.py).
+MAX_RETRIES = 6
+
+# Print throughput after every this many finished images
+REPORT_EVERY = 100
+
+# Rows are read from the CSV this many at a time, and taken from it only as
+# earlier images finish (at most ROWS_AHEAD_PER_SLOT per request slot ahead), so a
+# large CSV is never held in memory.
+BATCH_ROWS = 1000
+ROWS_AHEAD_PER_SLOT = 4
+
+# Exercise mode settings (python bulk_image_analysis.py --exercise)
+EXERCISE_NUM_IMAGES = 500
+EXERCISE_LATENCY_SECONDS = 0.2
+EXERCISE_REQUESTS_PER_SECOND = 40
+
+def parse_reset(value):
+    """
+    Parse an x-ratelimit-reset-* header such as "1s", "6m0s" or "120ms" into seconds.
+    """
+    if not value:
+        return None
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h)', value)
+    return sum(float(number) * units[unit] for number, unit in parts) if parts else None
+
+class AdaptiveLimiter:
+    """
+    Limits the number of requests in flight and adapts it to the API's rate limits:
+    a 429 halves the limit (once per burst: only for requests started since the
+    last decrease) and pauses new requests for the retry delay, each run of
+    `limit` successes raises it by one again (up to max_concurrency), and low
+    x-ratelimit-remaining-* headers pause new requests until the window resets.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.successes = 0
+        self.paused_until = 0.0
+        # Bumped on every decrease; a 429 only halves the limit if its request was
+        # started after the last decrease, so one burst of 429s halves it once.
+        self.epoch = 0
+        self.condition = asyncio.Condition()
+        self.stats = {'rate_limited': 0, 'header_pauses': 0, 'lowest_limit': max_concurrency}
+
+    async def acquire(self) -> int:
+        """
+        Wait for a request slot. Returns the epoch to pass to rate_limited.
+        """
+        while True:
+            async with self.condition:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0:
+                    if self.in_flight < self.limit:
+                        self.in_flight += 1
+                        return self.epoch
+                    await self.condition.wait()
+                    continue
+            await asyncio.sleep(wait)
+
+    async def release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def _pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def rate_limited(self, delay: float, epoch: int):
+        async with self.condition:
+            if epoch == self.epoch:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+                self.epoch += 1
+            self._pause(delay)
+            self.stats['rate_limited'] += 1
+            self.stats['lowest_limit'] = min(self.stats['lowest_limit'], self.limit)
+
+    async def succeeded(self, headers):
+        async with self.condition:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_concurrency:
+                self.limit += 1
+                self.successes = 0
+            for kind, headroom in (('requests', MIN_REMAINING_REQUESTS), ('tokens', MIN_REMAINING_TOKENS)):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+                if remaining is not None and reset and int(remaining) <= headroom:
+                    self._pause(reset)
+                    self.stats['header_pauses'] += 1
+            self.condition.notify_all()
+
+async def analyze_image(client, limiter, image_url: str, max_retries=MAX_RETRIES) -> str:
+    """
+    Ask the model for the sentiment of one image, within the limiter's budget.
+    Retries 429s and 5xx errors with backoff; other errors are raised.
+    """
+    for attempt in range(max_retries + 1):
+        epoch = await limiter.acquire()
+        try:
+            # The raw response carries the rate-limit headers.
+            raw = await client.responses.with_raw_response.create(
+                model=MODEL,
+                input=[{
+                    "role": "user",
+                    "content": [
+                        {"type": "input_text", "text": PROMPT},
+                        {"type": "input_image", "image_url": image_url},
+                    ],
+                }],
+            )
+        except Exception as e:
+            error = e
+        else:
+            await limiter.succeeded(raw.headers)
+            return raw.parse().output_text
+        finally:
+            await limiter.release()
+
+        if not is_retryable(error) or attempt == max_retries:
+            raise error
+        delay = backoff_delay(error, attempt)
+        if isinstance(error, openai.RateLimitError):
+            await limiter.rate_limited(delay, epoch)
+        await asyncio.sleep(delay)
+
+def load_done_ids(path: str) -> set:
+    """
+    Return the image ids already in the results file.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    return {image_id for batch in iter_batches(path, ["image_id"], BATCH_ROWS, dtype={"image_id": str})
+            for image_id in batch["image_id"]}
+
+async def run_analysis(client, rows, path=results_file, max_concurrency=MAX_CONCURRENCY):
+    """
+    Analyze (image_id, url) rows concurrently, appending each result to the results
+    CSV as it finishes. `rows` may be any iterable, such as a generator reading the
+    CSV in batches; it is consumed as images finish. Rows already in the file are
+    skipped. Returns a dict of counts.
+    """
+    done_ids = load_done_ids(path)
+    limiter = AdaptiveLimiter(max_concurrency)
+    # We handle retries ourselves, so switch off the client's built-in ones.
+    client = client.with_options(max_retries=0)
+    stats = {'skipped': 0, 'analyzed': 0, 'failed': 0}
+    start = time.perf_counter()
+
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(["image_id", "url", "output_text"])
+            f.flush()
+
+        async def worker(image_id, image_url):
+            try:
+                output_text = await analyze_image(client, limiter, image_url)
+            except Exception as e:
+                print(f"Image ID {image_id} failed: {e}")
+                stats['failed'] += 1
+                return
+            writer.writerow([image_id, image_url, output_text])
+            f.flush()
+            stats['analyzed'] += 1
+            if stats['analyzed'] % REPORT_EVERY == 0:
+                rate = stats['analyzed'] / (time.perf_counter() - start) * 60
+                print(f"{stats['analyzed']} images, {rate:.0f} images/min, "
+                      f"concurrency limit {limiter.limit}")
+
+        # Workers wait on the limiter, so only `limit` requests are ever in flight.
+        workers = set()
+        for image_id, url in rows:
+            if str(image_id) in done_ids:
+                stats['skipped'] += 1
+                continue
+            workers.add(asyncio.ensure_future(worker(image_id, url)))
+            if len(workers) >= max_concurrency * ROWS_AHEAD_PER_SLOT:
+                _, workers = await asyncio.wait(workers, return_when=asyncio.FIRST_COMPLETED)
+        await asyncio.gather(*workers)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['images_per_minute'] = stats['analyzed'] / stats['seconds'] * 60 if stats['seconds'] else 0.0
+    stats.update(limiter.stats)
+    return stats
+
+def print_stats(stats):
+    print(f"Analyzed {stats['analyzed']} image(s) in {stats['seconds']:.1f}s "
+          f"({stats['images_per_minute']:.0f} images/min); {stats['failed']} failed, "
+          f"{stats['skipped']} already done")
+    print(f"Rate limited {stats['rate_limited']} time(s), paused on rate-limit headers "
+          f"{stats['header_pauses']} time(s), lowest concurrency limit {stats['lowest_limit']}")
+
+# -------------------------------
+# Exercise mode: a local fake Responses endpoint with a rate limit
+# -------------------------------
+def start_mock_openai(requests_per_second=EXERCISE_REQUESTS_PER_SECOND, latency=EXERCISE_LATENCY_SECONDS):
+    """
+    Start a local stand-in for POST /v1/responses that answers after `latency`
+    seconds, sends x-ratelimit-* headers and answers 429 beyond
+    `requests_per_second`. Returns the server and its base URL.
+    """
+    window = {'start': time.monotonic(), 'count': 0}
+
+    class MockResponsesHandler(FakeEmbeddingsHandler):
+        def do_POST(self):
+            if not self.path.endswith("/responses"):
+                return super().do_POST()
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            with MockResponsesHandler.lock:
+                MockResponsesHandler.request_count += 1
+                now = time.monotonic()
+                if now - window['start'] >= 1.0:
+                    window['start'], window['count'] = now, 0
+                window['count'] += 1
+                remaining = requests_per_second - window['count']
+                reset = f"{max(0, int((1.0 - (now - window['start'])) * 1000))}ms"
+            headers = {"x-ratelimit-remaining-requests": str(max(0, remaining)),
+                       "x-ratelimit-reset-requests": reset}
+            if remaining < 0:
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                headers={"retry-after": "0.5", **headers})
+                return
+            time.sleep(latency)
+            image_url = request["input"][0]["content"][1]["image_url"]
+            word = random.Random(image_url).choice(["Joyful", "Somber", "Tense", "Hopeful"])
+            self._send_json(200, {
+                "id": "resp_mock", "object": "response", "created_at": 0, "status": "completed",
+                "model": request["model"], "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+                "output": [{
+                    "type": "message", "id": "msg_mock", "role": "assistant", "status": "completed",
+                    "content": [{"type": "output_text", "text": word, "annotations": []}]
+                }]
+            }, headers=headers)
+
+    return start_fake_server(MockResponsesHandler)
+
+def exercise(num_images=EXERCISE_NUM_IMAGES):
+    """
+    Measure images/min for the concurrent runner against the rate-limited fake
+    endpoint, then check that a re-run skips everything already written.
+    """
+    server, base_url = start_mock_openai()
+    client = AsyncOpenAI(api_key="fake", base_url=base_url)
+    rows = [(f"{i:05d}", f"https://example.com/image{i}.jpg") for i in range(num_images)]
+    path = os.path.join(tempfile.mkdtemp(), "results.csv")
+    try:
+        print_stats(asyncio.run(run_analysis(client, rows, path)))
+        rerun = asyncio.run(run_analysis(client, rows, path))
+    finally:
+        server.shutdown()
+    written = len(pd.read_csv(path))
+    print(f"Re-run: {rerun['skipped']} skipped, {rerun['analyzed']} analyzed; "
+          f"{written} row(s) in the results file")
+    sequential_rate = 60 / EXERCISE_LATENCY_SECONDS
+    print(f"One request at a time would manage at most {sequential_rate:.0f} images/min")
+
+def main():
+    # Read only the id and url columns of the CSV, one batch of rows at a time
+    rows = iter_rows(csv_file, ["image_id", "url"], BATCH_ROWS)
+
+    # Initialize the async OpenAI client; its connection pool is shared by every request.
+    client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+    stats = asyncio.run(run_analysis(client, rows))
+    print_stats(stats)
+    print(f"Image analysis complete. Results saved to {results_file}")
+
+if __name__ == '__main__':
+    if "--exercise" in sys.argv:
+        exercise()
+    else:
+        main()
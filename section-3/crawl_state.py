@@ -0,0 +1,172 @@
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+# Default location of the crawl cache and frontier
+CRAWL_STATE_FILE = "./crawl_state.sqlite"
+
+def body_hash(body: bytes) -> str:
+    """
+    Return the SHA-256 hex digest of a response body.
+    """
+    return hashlib.sha256(body).hexdigest()
+
+class CrawlState:
+    """
+    Persistent crawler state backed by a local SQLite file.
+
+    pages: an HTTP cache of every fetched URL with its ETag, Last-Modified,
+    body hash and (compressed) body, used to send conditional requests and to
+    re-read a page the server reports as unchanged.
+
+    frontier: the URLs of the current crawl, each pending or done, plus the
+    file each section was saved to and whether that file changed. An
+    interrupted crawl leaves pending URLs behind and the next run resumes from
+    them; a crawl that finishes clears the frontier.
+
+    The state may be shared between threads; access is serialized by a lock.
+    """
+
+    def __init__(self, path=CRAWL_STATE_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " body_hash TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " fetched_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            " url TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " chapter_number INTEGER NOT NULL,"
+            " chapter_url TEXT,"
+            " done INTEGER NOT NULL DEFAULT 0,"
+            " filepath TEXT,"
+            " changed INTEGER NOT NULL DEFAULT 0"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def get_page(self, url: str):
+        """
+        Return the cached page for a URL as a dict (etag, last_modified,
+        body_hash, body), or None if it was never fetched.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, body_hash, body FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, digest, body = row
+        return {'etag': etag, 'last_modified': last_modified, 'body_hash': digest, 'body': zlib.decompress(body)}
+
+    def put_page(self, url: str, body: bytes, etag=None, last_modified=None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body_hash, body, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body_hash(body), zlib.compress(body), time.time())
+            )
+            self.conn.commit()
+
+    def start_crawl(self, chapter_urls) -> bool:
+        """
+        Add the base chapter URLs (chapter_number -> url) to the frontier.
+        Returns True if an interrupted crawl is being resumed.
+        """
+        with self.lock:
+            resumed = self.conn.execute("SELECT COUNT(*) FROM frontier").fetchone()[0] > 0
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO frontier (url, kind, chapter_number) VALUES (?, 'chapter', ?)",
+                [(url, chapter_number) for chapter_number, url in chapter_urls.items()]
+            )
+            self.conn.commit()
+        return resumed
+
+    def known_urls(self):
+        with self.lock:
+            return {url for (url,) in self.conn.execute("SELECT url FROM frontier")}
+
+    def pending(self):
+        """
+        Return the frontier's pending URLs as (url, kind, chapter_number, chapter_url) tuples.
+        """
+        with self.lock:
+            return self.conn.execute(
+                "SELECT url, kind, chapter_number, chapter_url FROM frontier WHERE done = 0"
+            ).fetchall()
+
+    def finish_chapter(self, chapter_url: str, chapter_number: int, next_url, section_urls):
+        """
+        Record what a chapter page led to and mark it done, in one transaction,
+        so a resumed crawl never loses the sections of a finished chapter page.
+        """
+        rows = [(url, 'section', chapter_number, chapter_url) for url in section_urls]
+        if next_url:
+            rows.append((next_url, 'chapter', chapter_number, None))
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO frontier (url, kind, chapter_number, chapter_url) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self.conn.execute("UPDATE frontier SET done = 1 WHERE url = ?", (chapter_url,))
+            self.conn.commit()
+
+    def finish_section(self, url: str, filepath=None, changed=False):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE frontier SET done = 1, filepath = ?, changed = ? WHERE url = ?",
+                (filepath, int(changed), url)
+            )
+            self.conn.commit()
+
+    def changes(self) -> dict:
+        """
+        Summarize the sections of the current crawl: the files that were
+        written with new content, how many were unchanged, and the URLs still
+        pending (failed or not reached).
+        """
+        with self.lock:
+            changed = [path for (path,) in self.conn.execute(
+                "SELECT filepath FROM frontier WHERE kind = 'section' AND done = 1 AND changed = 1 ORDER BY filepath"
+            )]
+            unchanged = self.conn.execute(
+                "SELECT COUNT(*) FROM frontier WHERE kind = 'section' AND done = 1 AND changed = 0"
+            ).fetchone()[0]
+            pending = [url for (url,) in self.conn.execute("SELECT url FROM frontier WHERE done = 0 ORDER BY url")]
+        return {'changed': changed, 'unchanged': unchanged, 'pending': pending}
+
+    def finish_crawl(self):
+        """
+        Clear the frontier once nothing is pending, so the next run starts a fresh crawl.
+        Returns True if it was cleared.
+        """
+        with self.lock:
+            if self.conn.execute("SELECT COUNT(*) FROM frontier WHERE done = 0").fetchone()[0]:
+                return False
+            self.conn.execute("DELETE FROM frontier")
+            self.conn.commit()
+        return True
+
+    def close(self):
+        self.conn.close()
+
+def write_changes_report(changes: dict, path: str):
+    """
+    Write the summary from CrawlState.changes() to a JSON file.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(changes, f, indent=2)
@@ -0,0 +1,175 @@
+import re
+import time
+import sqlite3
+import threading
+import hashlib
+import unicodedata
+import numpy as np
+
+# Default location and size bound of the on-disk embedding cache
+EMBEDDING_CACHE_FILE = "./embedding_cache.sqlite"
+EMBEDDING_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# SQLite limits the number of bound parameters per statement.
+_LOOKUP_CHUNK_SIZE = 500
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text before hashing so trivially different copies share a cache entry:
+    Unicode NFC, collapsed whitespace, no leading/trailing whitespace.
+    """
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+def text_hash(text: str) -> str:
+    """
+    Return the SHA-256 hex digest of the normalized text.
+    """
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache backed by a local SQLite file.
+    Entries are keyed by (model, normalized-text hash) and hold float32 blobs.
+    When the stored vectors exceed `max_bytes`, the least recently used entries
+    are evicted. Hit and miss counts are kept for the lifetime of the object.
+    The cache may be shared between threads; access is serialized by a lock.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_FILE, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def get(self, model: str, text: str):
+        """
+        Return the cached embedding for a text, or None on a miss.
+        """
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts):
+        """
+        Look up several texts at once. Returns a list aligned with `texts`
+        holding numpy arrays for hits and None for misses.
+        """
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        with self.lock:
+            for start in range(0, len(unique_hashes), _LOOKUP_CHUNK_SIZE):
+                chunk = unique_hashes[start:start + _LOOKUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT text_hash, embedding FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model] + chunk
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self.conn.commit()
+
+            results = []
+            for h in hashes:
+                if h in found:
+                    self.hits += 1
+                    results.append(np.frombuffer(found[h], dtype=np.float32).copy())
+                else:
+                    self.misses += 1
+                    results.append(None)
+        return results
+
+    def put(self, model: str, text: str, embedding):
+        """
+        Store the embedding for a text.
+        """
+        self.put_many(model, [(text, embedding)])
+
+    def put_many(self, model: str, items):
+        """
+        Store several (text, embedding) pairs in one transaction, then evict
+        least recently used entries if the cache is over its size bound.
+        """
+        now = time.time()
+        rows = {}
+        for text, embedding in items:
+            if embedding is None:
+                continue
+            rows[text_hash(text)] = np.asarray(embedding, dtype=np.float32).tobytes()
+        if not rows:
+            return
+
+        with self.lock:
+            # Account for entries being overwritten so total_bytes stays accurate.
+            for h, blob in rows.items():
+                existing = self.conn.execute(
+                    "SELECT LENGTH(embedding) FROM embeddings WHERE model = ? AND text_hash = ?",
+                    (model, h)
+                ).fetchone()
+                self.total_bytes += len(blob) - (existing[0] if existing else 0)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, embedding, last_used) VALUES (?, ?, ?, ?)",
+                [(model, h, blob, now) for h, blob in rows.items()]
+            )
+            self.conn.commit()
+            self._evict()
+
+    def _evict(self):
+        """
+        Delete least recently used entries until the cache fits within max_bytes.
+        """
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT model, text_hash, LENGTH(embedding) FROM embeddings ORDER BY last_used LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            evict = []
+            for model, h, size in rows:
+                evict.append((model, h))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+            self.conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", evict)
+        self.conn.commit()
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters, hit rate, entry count and stored bytes.
+        """
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': self.total_bytes
+        }
+
+    def close(self):
+        self.conn.close()
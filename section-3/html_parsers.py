@@ -0,0 +1,140 @@
+import re
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from legal_scraper import base_url, get_next_page_url, extract_section_links, parse_section_content
+
+# Optional faster HTML parsers. selectolax (a Lexbor binding) is the fastest;
+# lxml is a close second; BeautifulSoup with html.parser is always available.
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+NEXT_LINK_PATTERN = re.compile(r"location\.href\s*=\s*'([^']+)'")
+
+def available_backends():
+    """
+    Return the names of the parser backends that can be used here, fastest first.
+    """
+    backends = []
+    if LexborHTMLParser is not None:
+        backends.append("selectolax")
+    if lxml is not None:
+        backends.append("lxml")
+    backends.append("bs4")
+    return backends
+
+# Backend the crawler uses by default: the fastest one installed.
+PARSER_BACKEND = available_backends()[0]
+
+def _unique_paragraphs(texts):
+    """
+    Join paragraph texts with blank lines, dropping empty and repeated ones.
+    """
+    seen = set()
+    unique_paragraphs = []
+    for txt in texts:
+        if txt and txt not in seen:
+            unique_paragraphs.append(txt)
+            seen.add(txt)
+    return "\n\n".join(unique_paragraphs)
+
+def _filter_section_links(hrefs, chapter_url, base):
+    section_links = set()
+    for href in hrefs:
+        full_url = urljoin(base, href)
+        if full_url.startswith(chapter_url) and '/Section' in full_url:
+            section_links.add(full_url)
+    return list(section_links)
+
+def _next_url(onclick, base):
+    m = NEXT_LINK_PATTERN.search(onclick or "")
+    return urljoin(base, m.group(1)) if m else None
+
+# -------------------------------
+# BeautifulSoup (html.parser): the reference implementation in legal_scraper.py
+# -------------------------------
+def _bs4_chapter(html, chapter_url, base):
+    soup = BeautifulSoup(html, 'html.parser')
+    return get_next_page_url(soup, base), extract_section_links(soup, chapter_url, base)
+
+def _bs4_section(html, section_url):
+    return parse_section_content(BeautifulSoup(html, 'html.parser'), section_url)
+
+# -------------------------------
+# lxml: XPath queries that go straight to the elements we need
+# -------------------------------
+_HAS_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+
+def _lxml_chapter(html, chapter_url, base):
+    tree = lxml.html.fromstring(html)
+    onclick = tree.xpath(f"//button[{_HAS_CLASS.format('nextButton')}]/@onclick")
+    hrefs = tree.xpath("//a[contains(@href, 'Section')]/@href")
+    return _next_url(onclick[0] if onclick else None, base), _filter_section_links(hrefs, chapter_url, base)
+
+def _lxml_section(html, section_url):
+    tree = lxml.html.fromstring(html)
+    for header in tree.xpath("//h2[@id='skipTo']"):
+        title = ' '.join(s.strip() for s in header.xpath(".//text()") if s.strip())
+        if not title.startswith("Section "):
+            continue
+        # The outermost col-xs-12 container, as legal_scraper.parse_section_content picks it
+        containers = header.xpath(f"ancestor::div[{_HAS_CLASS.format('col-xs-12')}]")
+        if not containers:
+            continue
+        paragraphs = containers[0].xpath(".//p")
+        return title, _unique_paragraphs(''.join(s.strip() for s in p.xpath(".//text()")) for p in paragraphs)
+    print(f"Section container with valid header not found in {section_url}")
+    return None, None
+
+# -------------------------------
+# selectolax (Lexbor): CSS selectors on a C DOM
+# -------------------------------
+def _stripped_text(node):
+    return [s.strip() for s in node.text(deep=True, separator='\x00').split('\x00') if s.strip()]
+
+def _selectolax_chapter(html, chapter_url, base):
+    tree = LexborHTMLParser(html)
+    button = tree.css_first("button.nextButton[onclick]")
+    hrefs = [a.attributes.get('href') for a in tree.css("a[href*='Section']")]
+    return _next_url(button.attributes.get('onclick') if button else None, base), _filter_section_links(hrefs, chapter_url, base)
+
+def _selectolax_section(html, section_url):
+    tree = LexborHTMLParser(html)
+    for header in tree.css("h2#skipTo"):
+        title = ' '.join(_stripped_text(header))
+        if not title.startswith("Section "):
+            continue
+        container = None
+        node = header.parent
+        while node is not None:
+            if node.tag == 'div' and 'col-xs-12' in (node.attributes.get('class') or '').split():
+                container = node
+            node = node.parent
+        if container is None:
+            continue
+        return title, _unique_paragraphs(''.join(_stripped_text(p)) for p in container.css("p"))
+    print(f"Section container with valid header not found in {section_url}")
+    return None, None
+
+_CHAPTER_PARSERS = {"bs4": _bs4_chapter, "lxml": _lxml_chapter, "selectolax": _selectolax_chapter}
+_SECTION_PARSERS = {"bs4": _bs4_section, "lxml": _lxml_section, "selectolax": _selectolax_section}
+
+def parse_chapter_page(backend: str, html: str, chapter_url: str, base=base_url):
+    """
+    Parse a chapter page with the given backend.
+    Returns (next chapter page URL or None, list of section URLs).
+    """
+    return _CHAPTER_PARSERS[backend](html, chapter_url, base)
+
+def parse_section_page(backend: str, html: str, section_url: str):
+    """
+    Parse a section page with the given backend. Returns (title, text), or
+    (None, None) if the page has no section; same rules as parse_section_content.
+    """
+    return _SECTION_PARSERS[backend](html, section_url)
@@ -0,0 +1,240 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import build_vectordb
+from build_vectordb import (
+    FAISS_INDEX_FILE, METADATA_FILE, LEXICAL_INDEX_FILE, INDEX_TYPE,
+    embed_documents, plan_update, apply_embedded_documents, load_vector_database,
+    load_corpus_documents, save_vector_database
+)
+from corpus import Corpus, compact_corpus, record_document
+from crawl_state import CrawlState
+from lexical_index import build_lexical_index, save_lexical_index
+from legal_crawler import Crawler
+from legal_scraper import base_url, chapter_numbers, corpus_file, crawl_state_file
+from vector_index import build_index, make_index
+
+# One command for the whole legal RAG build: sections are embedded as they are
+# crawled and added to the index in batches, instead of running legal_scraper.py
+# and build_vectordb.py one after the other.
+#
+#   crawler --(DOCUMENT_QUEUE_SIZE)--> EMBED_WORKERS --(INDEX_QUEUE_SIZE)--> indexer
+#
+# The queues are bounded, so a slow stage holds back the ones before it.
+DOCUMENT_QUEUE_SIZE = 256
+INDEX_QUEUE_SIZE = 64
+
+# Each embed worker takes whatever sections are waiting, up to this many, as one batch.
+EMBED_WORKERS = 4
+EMBED_BATCH_DOCUMENTS = 32
+
+# The index and metadata are saved after this many documents or seconds, whichever
+# comes first. On restart, sections in the corpus that the saved index does not
+# match are embedded again (mostly from the embedding cache).
+CHECKPOINT_DOCUMENTS = 500
+CHECKPOINT_SECONDS = 60
+
+# Index types that can be filled before any vectors are seen; the others are
+# trained on all embeddings once the crawl is done.
+NO_TRAINING_INDEX_TYPES = ("flat", "hnsw")
+
+class Indexer:
+    """
+    Applies embedded documents to the FAISS index and metadata in batches and
+    checkpoints them to disk. Only the newest version of a section is applied,
+    even when embed workers finish out of order.
+    """
+
+    def __init__(self, index, metadata):
+        self.index = index
+        self.metadata = metadata if metadata is not None else []
+        self.applied = {}  # filename -> sequence number of the version in the index
+        self.pending = {}  # filename -> (chunks, embeddings) of its newest version, waiting for an index that can be trained
+        self.unsaved = 0
+        self.last_checkpoint = time.monotonic()
+        self.stats = {'added': 0, 'changed': 0, 'removed': 0, 'checkpoints': 0, 'busy_seconds': 0.0}
+
+    def apply(self, batch, removed_filenames=()):
+        """
+        Apply a batch of (sequence, chunks, embeddings) and drop removed filenames.
+        Runs on a worker thread.
+        """
+        start = time.perf_counter()
+        latest = {}
+        for sequence, chunks, embeddings in batch:
+            filename = chunks[0]['filename']
+            if sequence > self.applied.get(filename, -1) and sequence > latest.get(filename, (-1,))[0]:
+                latest[filename] = (sequence, chunks, embeddings)
+        for filename, (sequence, _, _) in latest.items():
+            self.applied[filename] = sequence
+        embedded = [(chunks, embeddings) for _, chunks, embeddings in latest.values()]
+
+        if self.index is None and INDEX_TYPE in NO_TRAINING_INDEX_TYPES and embedded:
+            self.index = make_index(INDEX_TYPE, len(embedded[0][1][0]), 0)
+        if self.index is None:
+            # A newer version of a section replaces the one already waiting.
+            for filename, (_, chunks, embeddings) in latest.items():
+                self.pending[filename] = (chunks, embeddings)
+            for filename in removed_filenames:
+                self.pending.pop(filename, None)
+        else:
+            self.index, self.metadata, stats = apply_embedded_documents(
+                self.index, self.metadata, embedded, removed_filenames
+            )
+            for key in ('added', 'changed', 'removed'):
+                self.stats[key] += stats[key]
+            self.unsaved += len(embedded) + len(removed_filenames)
+        self.stats['busy_seconds'] += time.perf_counter() - start
+
+    def checkpoint(self, force=False):
+        """
+        Save the index and metadata if enough has changed since the last save (or if forced).
+        Runs on a worker thread.
+        """
+        due = self.unsaved >= CHECKPOINT_DOCUMENTS or time.monotonic() - self.last_checkpoint >= CHECKPOINT_SECONDS
+        if self.index is None or not self.unsaved or not (force or due):
+            return
+        start = time.perf_counter()
+        save_vector_database(self.index, self.metadata, FAISS_INDEX_FILE, METADATA_FILE)
+        self.unsaved = 0
+        self.last_checkpoint = time.monotonic()
+        self.stats['checkpoints'] += 1
+        self.stats['busy_seconds'] += time.perf_counter() - start
+
+    def finish(self):
+        """
+        Build the index from the pending embeddings if it needed training,
+        then save it, the metadata and the lexical index.
+        """
+        if self.index is None and self.pending:
+            pending = list(self.pending.values())
+            print(f"Training {INDEX_TYPE!r} index on {sum(len(chunks) for chunks, _ in pending)} vectors")
+            self.metadata = [chunk for chunks, _ in pending for chunk in chunks]
+            self.index = build_index(INDEX_TYPE, np.stack([emb for _, embeddings in pending for emb in embeddings]))
+            self.stats['added'] += len(pending)
+            self.unsaved += len(pending)
+            self.pending = {}
+        self.checkpoint(force=True)
+        if self.index is not None:
+            save_lexical_index(build_lexical_index(self.metadata), LEXICAL_INDEX_FILE)
+
+async def run_pipeline(chapters=chapter_numbers, base=base_url, **crawler_options):
+    """
+    Crawl, chunk, embed and index in one streaming pass. Sections already in the
+    corpus that the index is missing or has an older version of are fed in first.
+    Returns a dict of per-stage statistics.
+    """
+    start = time.perf_counter()
+    # Threads for the embed workers and the indexer, whatever the CPU count
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(EMBED_WORKERS + 2))
+    index, metadata = await asyncio.to_thread(load_vector_database, FAISS_INDEX_FILE, METADATA_FILE)
+    indexer = Indexer(index, metadata)
+    documents = asyncio.Queue(DOCUMENT_QUEUE_SIZE)
+    embedded = asyncio.Queue(INDEX_QUEUE_SIZE)
+    sequence = 0
+    stats = {'queued': 0, 'embedded': 0, 'failed': 0, 'embed_seconds': 0.0, 'crawl_seconds': 0.0}
+
+    async def enqueue(document):
+        nonlocal sequence
+        sequence += 1
+        stats['queued'] += 1
+        await documents.put((sequence, document))
+
+    async def produce():
+        # Catch up on sections the crawl will not report as changed, e.g. after an
+        # interrupted run or when the corpus was crawled without the pipeline.
+        if os.path.exists(corpus_file):
+            backlog, removed = plan_update(indexer.metadata, await asyncio.to_thread(load_corpus_documents, corpus_file))
+            if removed:
+                await asyncio.to_thread(indexer.apply, [], removed)
+            print(f"{len(backlog)} corpus section(s) to index before crawling, {len(removed)} removed")
+            for document in backlog:
+                await enqueue(document)
+
+        crawl_start = time.perf_counter()
+        state = CrawlState(crawl_state_file)
+        corpus = Corpus(corpus_file)
+        try:
+            crawler = Crawler(base, state=state, corpus=corpus,
+                              on_section=lambda record: enqueue(record_document(record)), **crawler_options)
+            crawl_stats = await crawler.crawl(chapters)
+            state.finish_crawl()
+        finally:
+            state.close()
+            corpus.close()
+        if corpus.superseded > len(corpus.hashes) // 4:
+            await asyncio.to_thread(compact_corpus, corpus_file)
+        stats['crawl_seconds'] = time.perf_counter() - crawl_start
+        stats['crawl'] = crawl_stats
+        for _ in range(EMBED_WORKERS):
+            await documents.put(None)
+
+    async def embed_worker():
+        while True:
+            item = await documents.get()
+            if item is None:
+                return
+            batch = [item]
+            done = False
+            while len(batch) < EMBED_BATCH_DOCUMENTS and not documents.empty():
+                item = documents.get_nowait()
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+            # A batch can hold a backlog version and a re-crawled version of the same
+            # section; only the newest is embedded, tagged with its own sequence number.
+            newest = {}
+            for number, document in batch:
+                if number > newest.get(document['filename'], (-1, None))[0]:
+                    newest[document['filename']] = (number, document)
+            sequence_by_filename = {filename: number for filename, (number, _) in newest.items()}
+            embed_start = time.perf_counter()
+            results = await asyncio.to_thread(embed_documents, [document for _, document in newest.values()], False)
+            stats['embed_seconds'] += time.perf_counter() - embed_start
+            stats['embedded'] += len(results)
+            stats['failed'] += len(newest) - len(results)
+            for chunks, chunk_embeddings in results:
+                await embedded.put((sequence_by_filename[chunks[0]['filename']], chunks, chunk_embeddings))
+            if done:
+                return
+
+    async def index_worker():
+        finished = False
+        while not finished:
+            batch = [await embedded.get()]
+            while not embedded.empty():
+                batch.append(embedded.get_nowait())
+            if None in batch:
+                finished = True
+                batch = [item for item in batch if item is not None]
+            await asyncio.to_thread(indexer.apply, batch)
+            await asyncio.to_thread(indexer.checkpoint)
+
+    async def embed_stage():
+        await asyncio.gather(*(embed_worker() for _ in range(EMBED_WORKERS)))
+        await embedded.put(None)
+
+    await asyncio.gather(produce(), embed_stage(), index_worker())
+    await asyncio.to_thread(indexer.finish)
+    stats['index'] = indexer.stats
+    stats['total_seconds'] = time.perf_counter() - start
+    return stats
+
+def main():
+    stats = asyncio.run(run_pipeline())
+    index_stats = stats['index']
+    print(f"\nQueued {stats['queued']} section(s): {stats['embedded']} embedded, {stats['failed']} failed; "
+          f"{index_stats['added']} added, {index_stats['changed']} changed, {index_stats['removed']} removed "
+          f"in the index ({index_stats['checkpoints']} checkpoint(s))")
+    print(f"Wall-clock {stats['total_seconds']:.1f}s; crawl {stats['crawl_seconds']:.1f}s, "
+          f"embedding {stats['embed_seconds'] / EMBED_WORKERS:.1f}s per worker, "
+          f"indexing {index_stats['busy_seconds']:.1f}s")
+    cache_stats = build_vectordb.embedding_cache.stats()
+    print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+          f"({cache_stats['hit_rate']:.0%} hit rate)")
+
+if __name__ == '__main__':
+    main()
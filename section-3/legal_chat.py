@@ -1,17 +1,10 @@
 import os
-import glob
-import json
-from openai import OpenAI
-import numpy as np
-import faiss
-from tqdm import tqdm
+import threading
 from dotenv import load_dotenv
-import openai
 
+# openai, numpy and faiss are imported lazily (see the loaders below) so the
+# prompt appears before the heavy imports have finished.
 load_dotenv()
-client = OpenAI(
-    api_key = os.environ.get("OPENAI_API_KEY")
-)
 
 # Global system prompt without context (we'll prepend retrieved documents)
 BASE_SYSTEM_PROMPT = (
@@ -27,28 +20,158 @@ BASE_SYSTEM_PROMPT = (
 # -------------------------------
 # Files for the FAISS index and metadata (from the vector database building script)
 FAISS_INDEX_FILE = "./faiss_index.bin"
-METADATA_FILE = "./metadata.json"
+METADATA_FILE = "./metadata.bin"
+# Older builds wrote metadata as JSON; it is converted to METADATA_FILE on first run.
+LEGACY_METADATA_FILE = "./metadata.json"
 
 # How many retrieved documents to include as context
 TOP_K = 3
 
+# Boolean flag: set to True to combine BM25 keyword search with vector search
+# (reciprocal rank fusion). Queries citing a chapter and section skip the embedding call.
+HYBRID_SEARCH = True
+LEXICAL_INDEX_FILE = "./lexical_index.json"
+# How many candidates each search contributes before fusion
+HYBRID_CANDIDATES = 20
+
 EMBEDDING_MODEL = "text-embedding-3-small"
 
+# On-disk embedding cache shared with build_vectordb.py; repeated queries skip the API.
+EMBEDDING_CACHE_FILE = "./embedding_cache.sqlite"
+
 # The model to be used for chat (e.g., "gpt-4o")
 MODEL = "gpt-4o"
 
 # Boolean flag: set to True to stream the chain-of-thought response.
 STREAM_CHAIN_OF_THOUGHT = True
 
+# Boolean flag: set to True to reuse stored answers for near-identical questions
+# (cosine similarity of the query embeddings at or above SEMANTIC_CACHE_THRESHOLD,
+# with the same retrieved sections). Only used for the first question of a session,
+# since follow-up questions depend on the conversation so far, and not for questions
+# citing a chapter and section, which are answered without an embedding call.
+SEMANTIC_CACHE = True
+RESPONSE_CACHE_FILE = "./response_cache.sqlite"
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_TTL_SECONDS = 7 * 24 * 3600
+SEMANTIC_CACHE_MAX_ENTRIES = 10_000
+
+# Boolean flag: set to True to show the prompt immediately and load the client, index
+# and metadata in the background (the index is memory-mapped rather than read into RAM).
+# Set LEGAL_CHAT_FAST_START=0 to load everything before the prompt, as older versions did.
+FAST_START = os.environ.get("LEGAL_CHAT_FAST_START", "1") != "0"
+
 # -------------------------------
-# Load FAISS Index and Metadata
+# Lazily loaded client, FAISS Index and Metadata
 # -------------------------------
-if not os.path.exists(FAISS_INDEX_FILE) or not os.path.exists(METADATA_FILE):
+if not os.path.exists(FAISS_INDEX_FILE) or not (
+    os.path.exists(METADATA_FILE) or os.path.exists(LEGACY_METADATA_FILE)
+):
     raise FileNotFoundError("FAISS index or metadata file not found. Build the vector database first.")
 
-faiss_index = faiss.read_index(FAISS_INDEX_FILE)
-with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-    metadata = json.load(f)
+_client = None
+_faiss_index = None
+_metadata = None
+_embedding_cache = None
+_lexical_index = None
+_response_cache = None
+_load_lock = threading.RLock()
+
+def get_client():
+    """
+    Return the shared OpenAI client, creating it (and importing openai) on first use.
+    """
+    global _client
+    with _load_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(
+                api_key = os.environ.get("OPENAI_API_KEY")
+            )
+    return _client
+
+def get_faiss_index():
+    """
+    Return the FAISS index, opening it on first use.
+    In fast-start mode the index is memory-mapped, so only the pages a search touches are read.
+    """
+    global _faiss_index
+    with _load_lock:
+        if _faiss_index is None:
+            from vector_index import load_index
+            # Applies the nprobe/efSearch settings saved next to approximate indexes
+            _faiss_index = load_index(FAISS_INDEX_FILE, mmap=FAST_START)
+    return _faiss_index
+
+def get_metadata():
+    """
+    Return the metadata store, opening it on first use.
+    """
+    global _metadata
+    with _load_lock:
+        if _metadata is None:
+            from metadata_store import MetadataStore, convert_json_metadata
+            if not os.path.exists(METADATA_FILE):
+                convert_json_metadata(LEGACY_METADATA_FILE, METADATA_FILE)
+            # Memory-mapped: rows are only read when a search returns their id
+            _metadata = MetadataStore(METADATA_FILE)
+    return _metadata
+
+def get_embedding_cache():
+    """
+    Return the on-disk embedding cache, opening it on first use.
+    """
+    global _embedding_cache
+    with _load_lock:
+        if _embedding_cache is None:
+            from embedding_cache import EmbeddingCache
+            _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_FILE)
+    return _embedding_cache
+
+def get_lexical_index():
+    """
+    Return the BM25 lexical index, loading it on first use.
+    Indexes built before hybrid search existed get one built from the metadata and saved.
+    """
+    global _lexical_index
+    with _load_lock:
+        if _lexical_index is None:
+            from lexical_index import LexicalIndex, build_lexical_index, save_lexical_index
+            if not os.path.exists(LEXICAL_INDEX_FILE):
+                print("Building lexical index from metadata...")
+                save_lexical_index(build_lexical_index(get_metadata()), LEXICAL_INDEX_FILE)
+            _lexical_index = LexicalIndex.load(LEXICAL_INDEX_FILE)
+    return _lexical_index
+
+def get_response_cache():
+    """
+    Return the semantic response cache, opening it on first use.
+    """
+    global _response_cache
+    with _load_lock:
+        if _response_cache is None:
+            from response_cache import ResponseCache
+            _response_cache = ResponseCache(
+                RESPONSE_CACHE_FILE,
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+                max_entries=SEMANTIC_CACHE_MAX_ENTRIES
+            )
+    return _response_cache
+
+def warm_up():
+    """
+    Import the heavy libraries and open the index, metadata and cache.
+    Runs in a background thread in fast-start mode, while the user types their first query.
+    """
+    get_client()
+    get_faiss_index()
+    get_metadata()
+    get_embedding_cache()
+    if HYBRID_SEARCH:
+        get_lexical_index()
+    if SEMANTIC_CACHE:
+        get_response_cache()
 
 # -------------------------------
 # Global conversation history for chat
@@ -58,43 +181,107 @@ conversation_history = []
 # -------------------------------
 # Functions for Embedding and Retrieval
 # -------------------------------
-def get_embedding(text: str) -> np.ndarray:
+def get_embedding(text: str) -> "np.ndarray":
     """
     Get embedding from OpenAI for a given text using the specified model.
+    Checks the on-disk embedding cache first.
     Returns a numpy array of the embedding.
     """
+    import numpy as np
+    text = text[:8150]
+    embedding_cache = get_embedding_cache()
+    cached = embedding_cache.get(EMBEDDING_MODEL, text)
+    if cached is not None:
+        return cached
     try:
-        response  = client.embeddings.create(
-            input=text[:8150],
-            model="text-embedding-3-small"
+        response  = get_client().embeddings.create(
+            input=text,
+            model=EMBEDDING_MODEL
         )
-        embedding = response.data[0].embedding
-        return np.array(embedding, dtype=np.float32)
+        embedding = np.array(response.data[0].embedding, dtype=np.float32)
+        embedding_cache.put(EMBEDDING_MODEL, text, embedding)
+        return embedding
     except Exception as e:
         print(f"Error obtaining embedding for text: {e}")
         return None
 
-def retrieve_context(query: str, top_k: int = TOP_K) -> str:
+def dense_search(query: str, top_k: int, query_emb=None):
     """
-    Given a query, compute its embedding, search the FAISS index for similar documents,
-    and return a formatted context string that summarizes the retrieved documents.
-    The citation now includes the link to the section.
+    Embed the query (unless its embedding is given) and return the ids of the top_k
+    nearest chunks in the FAISS index. Returns None if the query could not be embedded.
     """
-    query_emb = get_embedding(query)
     if query_emb is None:
-        return ""
+        query_emb = get_embedding(query)
+    if query_emb is None:
+        return None
     
     # Reshape to 2D
-    query_emb = np.expand_dims(query_emb, axis=0)
-    distances, indices = faiss_index.search(query_emb, top_k)
-    
+    query_emb = query_emb.reshape(1, -1)
+    distances, indices = get_faiss_index().search(query_emb, top_k)
+    # FAISS pads missing results with -1
+    return [int(idx) for idx in indices[0] if idx >= 0]
+
+def retrieve_ids(query: str, top_k: int = TOP_K, query_emb=None):
+    """
+    Return the vector ids of the chunks to use as context for a query.
+    A precomputed query embedding may be passed in to skip the embedding call.
+    With HYBRID_SEARCH, a query citing a chapter and section that exists is answered
+    straight from the lexical index (best-matching chunks of that section first);
+    otherwise BM25 and vector results are combined with reciprocal rank fusion.
+    """
+    if not HYBRID_SEARCH:
+        return dense_search(query, top_k, query_emb) or []
+
+    from lexical_index import reciprocal_rank_fusion
+    lexical_index = get_lexical_index()
+    cited_ids = lexical_index.lookup_citation(query)
+    if cited_ids:
+        ranked = [vector_id for vector_id, _ in lexical_index.search(query, top_k, candidate_ids=set(cited_ids))]
+        return (ranked + [vector_id for vector_id in cited_ids if vector_id not in ranked])[:top_k]
+
+    lexical_ids = [vector_id for vector_id, _ in lexical_index.search(query, HYBRID_CANDIDATES)]
+    dense_ids = dense_search(query, HYBRID_CANDIDATES, query_emb)
+    if dense_ids is None:
+        # Fall back to keyword results alone if the embedding call failed
+        return lexical_ids[:top_k]
+    return reciprocal_rank_fusion([dense_ids, lexical_ids])[:top_k]
+
+def retrieve_context(query: str, top_k: int = TOP_K) -> str:
+    """
+    Given a query, retrieve the most relevant section chunks (see retrieve_ids)
+    and return a formatted context string containing the matching chunks.
+    The citation now includes the link to the section.
+    """
+    return format_context(retrieve_ids(query, top_k))
+
+def retrieved_documents(ids) -> list:
+    """
+    Return the metadata entries of the given chunk ids, skipping removed ones.
+    """
+    metadata = get_metadata()
+    # Removed documents leave None slots.
+    return [metadata[idx] for idx in ids if 0 <= idx < len(metadata) and metadata[idx] is not None]
+
+def cache_scope(ids, model=MODEL, system_prompt=BASE_SYSTEM_PROMPT) -> str:
+    """
+    Return the semantic cache scope of an answer built from the given chunk ids.
+    """
+    from response_cache import make_scope
+    return make_scope(model, system_prompt, retrieved_documents(ids))
+
+def format_context(ids) -> str:
+    """
+    Return a formatted context string for the given chunk ids, citing each chunk's section and link.
+    """
     retrieved = []
-    for idx in indices[0]:
-        if idx < len(metadata):
-            doc = metadata[idx]
-            citation = f"({doc.get('chapter', 'Unknown Chapter')} {doc.get('section', 'Unknown Section')}, {doc.get('link', 'No link')})"
+    for doc in retrieved_documents(ids):
+        citation = f"({doc.get('chapter', 'Unknown Chapter')} {doc.get('section', 'Unknown Section')}, {doc.get('link', 'No link')})"
+        # Chunked indexes store the matching chunk; older ones only the full section text.
+        if 'chunk_text' in doc:
+            snippet = doc['chunk_text'].replace("\n", " ")
+        else:
             snippet = doc.get('full_text', '').replace("\n", " ")[:200]
-            retrieved.append(f"{citation}: {snippet}")
+        retrieved.append(f"{citation}: {snippet}")
     
     if retrieved:
         context = "Retrieved context:\n" + "\n".join(retrieved) + "\n"
@@ -104,28 +291,59 @@ def retrieve_context(query: str, top_k: int = TOP_K) -> str:
 # -------------------------------
 # ChatGPT Query Functions (RAG Integrated)
 # -------------------------------
+def build_messages(user_input, history, retrieved_context, system_prompt=BASE_SYSTEM_PROMPT):
+    """
+    Build the messages list: the system prompt augmented with the retrieved context,
+    the last 10 messages of the conversation history and the user's query.
+    """
+    full_system_prompt = system_prompt + "\n" + retrieved_context
+    context_msgs = history[-10:]
+    messages = [{"role": "system", "content": full_system_prompt}] + context_msgs
+    
+    # If the latest user query isn't appended to the history yet, add it.
+    if not context_msgs or context_msgs[-1].get("role") != "user" or context_msgs[-1].get("content") != user_input:
+        messages.append({"role": "user", "content": user_input})
+    return messages
+
+def is_first_turn(history) -> bool:
+    """
+    True if the assistant has not answered yet in this conversation, so the
+    answer cannot depend on earlier turns (a requirement for the semantic cache).
+    """
+    return not any(msg.get("role") == "assistant" for msg in history[-10:])
+
 def make_query(user_input, system_prompt=BASE_SYSTEM_PROMPT, model=MODEL, stream=STREAM_CHAIN_OF_THOUGHT):
     """
     Sends a query to the OpenAI Chat model.
     The system prompt is augmented with the context retrieved via FAISS.
+    Answers to the first question of a session are served from and stored in the
+    semantic response cache when SEMANTIC_CACHE is enabled.
     Returns the full response from the AI.
     """
     global conversation_history
+    import openai
     
+    # Citations are answered from the lexical index with no embedding call, so they
+    # also skip the semantic cache; everything else is embedded once, here.
+    cited = HYBRID_SEARCH and get_lexical_index().lookup_citation(user_input)
+    query_emb = None if cited else get_embedding(user_input)
+
     # Retrieve relevant context from the vector database
-    retrieved_context = retrieve_context(user_input)
-    full_system_prompt = system_prompt + "\n" + retrieved_context
-    
-    # Build the messages list: include the augmented system message and last 10 conversation messages.
-    context_msgs = conversation_history[-10:]
-    messages = [{"role": "system", "content": full_system_prompt}] + context_msgs
-    
-    # If the latest user query isn't appended to conversation_history yet, add it.
-    if not context_msgs or context_msgs[-1].get("role") != "user" or context_msgs[-1].get("content") != user_input:
-        messages.append({"role": "user", "content": user_input})
+    retrieved_ids = retrieve_ids(user_input, TOP_K, query_emb)
+    retrieved_context = format_context(retrieved_ids)
+    messages = build_messages(user_input, conversation_history, retrieved_context, system_prompt)
+
+    # Check the semantic cache, unless earlier turns could change the answer.
+    scope = None
+    if SEMANTIC_CACHE and query_emb is not None and is_first_turn(conversation_history):
+        scope = cache_scope(retrieved_ids, model, system_prompt)
+        cached_answer = get_response_cache().lookup(query_emb, scope)
+        if cached_answer is not None:
+            print("\nOpenAI API (cached): " + cached_answer)
+            return cached_answer
     
     try:
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model=model,
             messages=messages,
             stream=stream
@@ -164,6 +382,8 @@ def make_query(user_input, system_prompt=BASE_SYSTEM_PROMPT, model=MODEL, stream
         except Exception as e:
             print(f"Error processing response: {e}")
     
+    if scope is not None and full_response:
+        get_response_cache().store(query_emb, scope, full_response)
     return full_response
 
 def main():
@@ -176,10 +396,19 @@ def main():
     print("You can ask questions about Massachusetts real-estate law.")
     print("Note: This chatbot is NOT a lawyer and cannot provide legal advice.")
     print("Type 'exit' or 'quit' to end the session.\n")
+
+    if FAST_START:
+        threading.Thread(target=warm_up, daemon=True).start()
+    else:
+        warm_up()
     
     while True:
         user_input = input("Enter your query: ").strip()
         if user_input.lower() in ["exit", "quit"]:
+            if SEMANTIC_CACHE and _response_cache is not None:
+                stats = _response_cache.stats()
+                print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+                      f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} stored answers")
             print("Goodbye!")
             break
         
@@ -0,0 +1,235 @@
+import os
+import json
+import asyncio
+from collections import OrderedDict
+import numpy as np
+import openai
+from openai import AsyncOpenAI
+import legal_chat
+from legal_chat import (
+    BASE_SYSTEM_PROMPT, EMBEDDING_MODEL, MODEL, TOP_K,
+    build_messages, cache_scope, format_context, is_first_turn, retrieve_ids,
+    get_embedding_cache, get_lexical_index, get_response_cache, warm_up
+)
+
+# -------------------------------
+# Server Configuration
+# -------------------------------
+HOST = "127.0.0.1"
+PORT = 8000
+
+# Sessions are kept in memory; the least recently active ones are dropped beyond this many.
+MAX_SESSIONS = 10_000
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 64 * 1024
+
+# One pooled async client shared by every session
+_async_client = None
+
+# session_id -> {"history": [...], "lock": asyncio.Lock()}
+sessions = OrderedDict()
+
+def get_async_client():
+    """
+    Return the shared AsyncOpenAI client, creating it on first use.
+    Its underlying HTTP connection pool is reused across all sessions.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            api_key = os.environ.get("OPENAI_API_KEY")
+        )
+    return _async_client
+
+def get_session(session_id: str) -> dict:
+    """
+    Return the state of a session, creating it if needed and evicting the least
+    recently used session when there are more than MAX_SESSIONS.
+    """
+    if session_id in sessions:
+        sessions.move_to_end(session_id)
+    else:
+        sessions[session_id] = {"history": [], "lock": asyncio.Lock()}
+        while len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+    return sessions[session_id]
+
+async def get_embedding_async(text: str):
+    """
+    Async counterpart of legal_chat.get_embedding: checks the on-disk embedding
+    cache, then calls the embeddings endpoint through the shared async client.
+    SQLite calls run in a thread so they do not hold up other sessions' streams.
+    """
+    text = text[:8150]
+    embedding_cache = await asyncio.to_thread(get_embedding_cache)
+    cached = await asyncio.to_thread(embedding_cache.get, EMBEDDING_MODEL, text)
+    if cached is not None:
+        return cached
+    try:
+        response = await get_async_client().embeddings.create(
+            input=text,
+            model=EMBEDDING_MODEL
+        )
+    except Exception as e:
+        print(f"Error obtaining embedding for text: {e}")
+        return None
+    embedding = np.array(response.data[0].embedding, dtype=np.float32)
+    await asyncio.to_thread(embedding_cache.put, EMBEDDING_MODEL, text, embedding)
+    return embedding
+
+async def answer_stream(session: dict, user_input: str):
+    """
+    Run retrieval and the chat completion for one message of a session,
+    yielding response text as it streams in. Mirrors legal_chat.make_query,
+    including the semantic response cache for a session's first question.
+    The question and its answer are added to the session history together, only
+    once there is an answer, so a failed request leaves the history as it was.
+    """
+    history = session["history"]
+
+    # Citations are answered from the lexical index with no embedding call, so they
+    # also skip the semantic cache; everything else needs the embedding.
+    cited = legal_chat.HYBRID_SEARCH and await asyncio.to_thread(
+        lambda: get_lexical_index().lookup_citation(user_input)
+    )
+    query_emb = None
+    if not cited:
+        query_emb = await get_embedding_async(user_input)
+    use_cache = legal_chat.SEMANTIC_CACHE and query_emb is not None and is_first_turn(history)
+
+    # FAISS and BM25 are CPU-bound, so run them off the event loop.
+    retrieved_ids = await asyncio.to_thread(retrieve_ids, user_input, TOP_K, query_emb)
+
+    scope = None
+    if use_cache:
+        scope = await asyncio.to_thread(cache_scope, retrieved_ids, MODEL, BASE_SYSTEM_PROMPT)
+        cached_answer = await asyncio.to_thread(lambda: get_response_cache().lookup(query_emb, scope))
+        if cached_answer is not None:
+            history.extend([{"role": "user", "content": user_input}, {"role": "assistant", "content": cached_answer}])
+            yield cached_answer
+            return
+
+    retrieved_context = await asyncio.to_thread(format_context, retrieved_ids)
+    messages = build_messages(user_input, history, retrieved_context)
+    response = await get_async_client().chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        stream=True
+    )
+    full_response = ""
+    async for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            content = chunk.choices[0].delta.content
+            full_response += content
+            yield content
+
+    if full_response:
+        history.extend([{"role": "user", "content": user_input}, {"role": "assistant", "content": full_response}])
+        if scope is not None:
+            await asyncio.to_thread(lambda: get_response_cache().store(query_emb, scope, full_response))
+
+def sse_event(data: dict, event: str = None) -> bytes:
+    """
+    Encode one server-sent event.
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n".encode("utf-8")
+
+async def send_response(writer, status: str, payload: dict):
+    """
+    Send a complete JSON response.
+    """
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("utf-8") + body
+    )
+    await writer.drain()
+
+async def handle_chat(writer, request: dict):
+    """
+    POST /chat with {"session_id": ..., "message": ...}: stream the answer as
+    server-sent events ("data: {"delta": ...}"), then an "event: done" event.
+    Messages within a session are answered one at a time; sessions run concurrently.
+    """
+    session_id = str(request.get("session_id", ""))
+    user_input = str(request.get("message", "")).strip()
+    if not session_id or not user_input:
+        await send_response(writer, "400 Bad Request", {"error": "session_id and message are required"})
+        return
+
+    writer.write(
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+        b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+    )
+    session = get_session(session_id)
+    async with session["lock"]:
+        try:
+            async for text in answer_stream(session, user_input):
+                writer.write(sse_event({"delta": text}))
+                await writer.drain()
+            writer.write(sse_event({"session_id": session_id}, event="done"))
+        except openai.RateLimitError:
+            writer.write(sse_event({"error": "Rate limit exceeded. Please wait and try again later."}, event="error"))
+        except Exception as e:
+            writer.write(sse_event({"error": str(e)}, event="error"))
+        await writer.drain()
+
+async def handle_connection(reader, writer):
+    """
+    Minimal HTTP/1.1 handling: one request per connection.
+    """
+    try:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        if not request_line:
+            return
+        method, path, _ = request_line.split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            await send_response(writer, "413 Payload Too Large", {"error": "request body too large"})
+            return
+        body = await reader.readexactly(length) if length else b""
+
+        if method == "GET" and path == "/health":
+            await send_response(writer, "200 OK", {"status": "ok", "sessions": len(sessions)})
+        elif method == "POST" and path == "/chat":
+            try:
+                request = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                await send_response(writer, "400 Bad Request", {"error": "invalid JSON"})
+                return
+            await handle_chat(writer, request)
+        else:
+            await send_response(writer, "404 Not Found", {"error": f"no route for {method} {path}"})
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def start_server(host=HOST, port=PORT):
+    """
+    Load the index, metadata and caches, then start listening.
+    Returns the asyncio server (port 0 picks a free port).
+    """
+    await asyncio.to_thread(warm_up)
+    return await asyncio.start_server(handle_connection, host, port)
+
+async def serve(host=HOST, port=PORT):
+    server = await start_server(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Legal RAG chat server listening on http://{address[0]}:{address[1]}")
+    print("POST /chat with {\"session_id\": \"...\", \"message\": \"...\"} to stream an answer.")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -0,0 +1,412 @@
+import os
+import re
+import sys
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from corpus import Corpus, section_record, compact_corpus
+from crawl_state import CrawlState, body_hash, write_changes_report
+from html_parsers import PARSER_BACKEND, parse_chapter_page, parse_section_page
+from legal_scraper import (
+    base_url, start_path, chapter_numbers, headers, crawl_state_file, changes_file,
+    PACKED_CORPUS, corpus_file, save_section, section_filepath
+)
+
+# How many requests may be open to one host at once (also the connection pool size).
+MAX_CONNECTIONS_PER_HOST = 8
+
+# Polite crawling: requests started per second, per host.
+REQUESTS_PER_SECOND = 10.0
+
+# Retry settings for 429s, 5xx errors and dropped connections.
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+REQUEST_TIMEOUT_SECONDS = 30
+
+# Pages are parsed in this many worker processes, so parsing neither blocks
+# fetching nor competes with it for the GIL. 0 parses on the crawler's threads.
+PARSE_PROCESSES = max(1, (os.cpu_count() or 1) - 1)
+
+# Local port for serving a saved mirror. Kept fixed so the crawl cache,
+# which is keyed by URL, carries over between mirror runs.
+MIRROR_PORT = 8123
+
+class HostLimiter:
+    """
+    Per-host politeness: at most `max_connections` requests open at once,
+    and request starts spaced at least 1 / requests_per_second apart.
+    """
+
+    def __init__(self, max_connections: int, requests_per_second: float):
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_start = 0.0
+
+    async def wait_turn(self):
+        now = time.monotonic()
+        start = max(now, self.next_start)
+        self.next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+class Crawler:
+    """
+    Concurrent crawler for the chapter and section pages of the General Laws.
+    HTTP requests go through one pooled requests.Session on a worker thread pool,
+    so connections are reused. Pages are parsed with the chosen html_parsers
+    backend in a process pool (or on the thread pool), off the event loop.
+    Every page is fetched and parsed once.
+
+    With a CrawlState, requests are conditional (If-None-Match / If-Modified-Since),
+    unchanged sections are not parsed or rewritten, and the crawl frontier is
+    persisted so an interrupted crawl resumes where it stopped.
+
+    Sections are appended to a packed Corpus when one is given, otherwise
+    written as .txt files to output_dir. An on_section coroutine function, if
+    given, receives each new or changed section; while it waits, so does the
+    crawl of that section, which lets a slower consumer apply backpressure.
+    """
+
+    def __init__(self, base=base_url, max_connections=MAX_CONNECTIONS_PER_HOST,
+                 requests_per_second=REQUESTS_PER_SECOND, max_retries=MAX_RETRIES,
+                 mirror_dir=None, state=None, corpus=None, parser=PARSER_BACKEND,
+                 parse_processes=PARSE_PROCESSES, on_section=None):
+        self.base = base
+        self.corpus = corpus
+        # Awaited with the corpus record of every new or changed section
+        self.on_section = on_section
+        self.parser = parser
+        self.max_connections = max_connections
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.mirror_dir = mirror_dir
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Room for every open request plus parsing on each core.
+        self.executor = ThreadPoolExecutor(max_workers=max_connections + (os.cpu_count() or 1))
+        self.parse_executor = ProcessPoolExecutor(parse_processes) if parse_processes else self.executor
+        self.state = state
+        self.limiters = {}
+        self.seen = set()
+        self.stats = {
+            'requests': 0, 'not_modified': 0, 'retries': 0, 'failed': 0, 'bytes': 0,
+            'changed': 0, 'unchanged': 0, 'skipped': 0
+        }
+
+    async def run_in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def parse(self, func, *args):
+        """
+        Run an html_parsers function with the crawler's backend on the parse pool.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.parse_executor, func, self.parser, *args)
+
+    def _backoff_delay(self, response, attempt: int) -> float:
+        """
+        Seconds to wait before the next attempt: the server's Retry-After when
+        present, otherwise exponential backoff with full jitter.
+        """
+        if response is not None:
+            try:
+                return min(float(response.headers.get("Retry-After")), BACKOFF_MAX_SECONDS)
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    def _get(self, url, cached):
+        request_headers = {}
+        if cached is not None:
+            if cached['etag']:
+                request_headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                request_headers['If-Modified-Since'] = cached['last_modified']
+        return self.session.get(url, headers=request_headers, timeout=REQUEST_TIMEOUT_SECONDS)
+
+    async def fetch(self, url: str):
+        """
+        Fetch a page within its host's limits, retrying rate limits, server
+        errors and connection failures. Returns (html, modified, response):
+        modified is False when the page is the same as the cached copy, and
+        response is the new response for remember(), or None when the server
+        answered 304. Returns (None, False, None) if the page could not be fetched.
+        """
+        cached = await self.run_in_thread(self.state.get_page, url) if self.state else None
+        host = urlparse(url).netloc
+        if host not in self.limiters:
+            self.limiters[host] = HostLimiter(self.max_connections, self.requests_per_second)
+        limiter = self.limiters[host]
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            error = None
+            async with limiter.semaphore:
+                await limiter.wait_turn()
+                self.stats['requests'] += 1
+                try:
+                    response = await self.run_in_thread(self._get, url, cached)
+                except requests.RequestException as e:
+                    error = e
+            if response is not None and response.status_code == 304 and cached is not None:
+                self.stats['not_modified'] += 1
+                # An unchanged page is mirrored from the cached copy, so a mirror saved
+                # on an incremental crawl still has the whole site.
+                if self.mirror_dir:
+                    await self.run_in_thread(self.save_to_mirror, url, cached['body'])
+                return cached['body'].decode('utf-8', errors='replace'), False, None
+            if response is not None and response.ok:
+                self.stats['bytes'] += len(response.content)
+                if self.mirror_dir:
+                    await self.run_in_thread(self.save_to_mirror, url, response.content)
+                modified = cached is None or cached['body_hash'] != body_hash(response.content)
+                return response.text, modified, response
+
+            retryable = response is None or response.status_code in RETRY_STATUSES
+            if retryable and attempt < self.max_retries:
+                delay = self._backoff_delay(response, attempt)
+                self.stats['retries'] += 1
+                await asyncio.sleep(delay)
+                continue
+            self.stats['failed'] += 1
+            print(f"Error accessing {url}: {error or f'HTTP {response.status_code}'}")
+            return None, False, None
+
+    def remember(self, url: str, response):
+        """
+        Store a fetched page in the crawl cache. Called only once the page has
+        been processed, so an interrupted crawl never caches a page whose
+        section file was not written.
+        """
+        if self.state and response is not None:
+            self.state.put_page(
+                url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified')
+            )
+
+    def save_to_mirror(self, url: str, content: bytes):
+        """
+        Store a fetched page under mirror_dir as <url path>/index.html, the layout serve_mirror reads.
+        """
+        page_dir = os.path.join(self.mirror_dir, urlparse(url).path.strip('/'))
+        os.makedirs(page_dir, exist_ok=True)
+        with open(os.path.join(page_dir, "index.html"), 'wb') as f:
+            f.write(content)
+
+    def section_saved(self, chapter_url: str, section_url: str) -> bool:
+        filepath = section_filepath(chapter_url, section_url)
+        if self.corpus is not None:
+            return os.path.basename(filepath) in self.corpus
+        return os.path.exists(filepath)
+
+    def save(self, chapter_url: str, section_url: str, title: str, text_content: str):
+        """
+        Save a section to the corpus or to its .txt file.
+        Returns (file path, or corpus filename; whether it changed).
+        """
+        if self.corpus is None:
+            return save_section(chapter_url, section_url, title, text_content)
+        record = self.section_record(chapter_url, section_url, title, text_content)
+        return record['filename'], self.corpus.put(record)
+
+    @staticmethod
+    def section_record(chapter_url: str, section_url: str, title: str, text_content: str) -> dict:
+        chapter_part = chapter_url.rstrip('/').split('/')[-1]
+        section_part = section_url.rstrip('/').split('/')[-1]
+        return section_record(chapter_part, section_part, title, text_content)
+
+    def record_section(self, section, response, chapter_url: str, section_url: str):
+        """
+        Save a parsed section (None if the page was unchanged and already saved),
+        then record it as done. Runs as one step on the thread pool, so it
+        completes even if the crawl is interrupted meanwhile.
+        Returns (file path, changed), or (None, False) if the page has no section.
+        """
+        filepath, changed = section_filepath(chapter_url, section_url), False
+        if self.corpus is not None:
+            filepath = os.path.basename(filepath)
+        if section is not None:
+            title, text_content = section
+            if title is None or text_content is None:
+                filepath = None
+            else:
+                filepath, changed = self.save(chapter_url, section_url, title, text_content)
+        self.remember(section_url, response)
+        if self.state:
+            self.state.finish_section(section_url, filepath, changed)
+        return filepath, changed
+
+    async def crawl_section(self, chapter_url: str, section_url: str):
+        html, modified, response = await self.fetch(section_url)
+        if html is None:
+            self.stats['skipped'] += 1
+            return
+        section = None
+        if modified or not self.section_saved(chapter_url, section_url):
+            section = await self.parse(parse_section_page, html, section_url)
+        filepath, changed = await self.run_in_thread(
+            self.record_section, section, response, chapter_url, section_url
+        )
+        if filepath is None:
+            print(f"Skipping {section_url} due to missing content")
+            self.stats['skipped'] += 1
+        else:
+            self.stats['changed' if changed else 'unchanged'] += 1
+            if changed and self.on_section is not None:
+                await self.on_section(self.section_record(chapter_url, section_url, *section))
+
+    async def crawl_chapter(self, chapter_number: int, chapter_url: str):
+        """
+        Walk a base chapter and its lettered variants (Chapter183, Chapter183A, ...)
+        via the Next button from chapter_url, starting each page's section
+        downloads as soon as that page is parsed.
+        """
+        variant_pattern = re.compile(rf'Chapter{chapter_number}[A-Z]*$', re.IGNORECASE)
+        section_tasks = []
+        try:
+            while chapter_url:
+                html, _, response = await self.fetch(chapter_url)
+                if html is None:
+                    break
+                next_url, section_links = await self.parse(parse_chapter_page, html, chapter_url, self.base)
+                await self.run_in_thread(self.remember, chapter_url, response)
+                print(f"Found {len(section_links)} section links in {chapter_url}")
+                new_sections = [url for url in section_links if url not in self.seen]
+                self.seen.update(new_sections)
+                # The Next button eventually leads on to the following chapter, which has its own task.
+                if next_url and (next_url in self.seen or not variant_pattern.search(next_url.rstrip('/'))):
+                    next_url = None
+                if next_url:
+                    self.seen.add(next_url)
+                if self.state:
+                    await self.run_in_thread(self.state.finish_chapter, chapter_url, chapter_number, next_url, new_sections)
+                for section_url in new_sections:
+                    section_tasks.append(asyncio.create_task(self.crawl_section(chapter_url, section_url)))
+                chapter_url = next_url
+            await asyncio.gather(*section_tasks)
+        except BaseException:
+            # Interrupted: stop this chapter's section downloads too; the frontier keeps them pending.
+            for task in section_tasks:
+                task.cancel()
+            await asyncio.gather(*section_tasks, return_exceptions=True)
+            raise
+
+    async def crawl(self, chapters=chapter_numbers):
+        """
+        Crawl the given base chapters, or resume the interrupted crawl recorded
+        in the state. Returns crawl statistics.
+        """
+        base_chapters = {
+            chapter_number: urljoin(self.base, start_path + f'Chapter{chapter_number}')
+            for chapter_number in chapters
+        }
+        try:
+            tasks = []
+            if self.state:
+                if await self.run_in_thread(self.state.start_crawl, base_chapters):
+                    print("Resuming the interrupted crawl")
+                self.seen = await self.run_in_thread(self.state.known_urls)
+                for url, kind, chapter_number, chapter_url in await self.run_in_thread(self.state.pending):
+                    if kind == 'chapter':
+                        tasks.append(self.crawl_chapter(chapter_number, url))
+                    else:
+                        tasks.append(self.crawl_section(chapter_url, url))
+            else:
+                self.seen = set(base_chapters.values())
+                tasks = [self.crawl_chapter(number, url) for number, url in base_chapters.items()]
+            await asyncio.gather(*tasks)
+        finally:
+            self.parse_executor.shutdown()
+            self.executor.shutdown()
+            self.session.close()
+        return self.stats
+
+async def crawl(chapters=chapter_numbers, base=base_url, state_file=crawl_state_file,
+                packed_corpus=PACKED_CORPUS, **options):
+    """
+    Crawl the given base chapters and save every section to corpus_file (or,
+    without packed_corpus, to output_dir). With a state_file, the crawl is
+    incremental and resumable, and the sections it changed are written to
+    changes_file once it completes.
+    Other options are passed to Crawler. Prints and returns crawl statistics.
+    """
+    state = CrawlState(state_file) if state_file else None
+    corpus = Corpus(corpus_file) if packed_corpus else None
+    start = time.perf_counter()
+    try:
+        stats = await Crawler(base, state=state, corpus=corpus, **options).crawl(chapters)
+        elapsed = time.perf_counter() - start
+        print(f"\n{stats['changed']} sections changed, {stats['unchanged']} unchanged, {stats['skipped']} skipped; "
+              f"{stats['requests']} requests ({stats['not_modified']} not modified) in {elapsed:.1f}s "
+              f"({stats['requests'] / elapsed:.1f} pages/sec, {stats['retries']} retries, {stats['failed']} failed)")
+        if state:
+            changes = state.changes()
+            if state.finish_crawl():
+                write_changes_report(changes, changes_file)
+                print(f"{len(changes['changed'])} changed section files listed in {changes_file}")
+            else:
+                print(f"{len(changes['pending'])} pages could not be fetched; run again to resume")
+    finally:
+        if state:
+            state.close()
+        if corpus:
+            corpus.close()
+    # Rewrite the corpus once replaced copies of changed sections make up a good share of it.
+    if corpus and corpus.superseded > len(corpus.hashes) // 4:
+        print(f"Compacted {corpus_file} to {compact_corpus(corpus_file)} sections")
+    return stats
+
+class MirrorHandler(SimpleHTTPRequestHandler):
+    """
+    Serves a mirror saved by Crawler(mirror_dir=...): /a/b is answered with a/b/index.html.
+    """
+
+    def translate_path(self, path):
+        path = super().translate_path(path)
+        index = os.path.join(path, "index.html")
+        return index if os.path.isfile(index) else path
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_mirror(mirror_dir: str, port: int = MIRROR_PORT):
+    """
+    Serve a saved mirror on a local port in a background thread (port 0 picks a free one).
+    Returns (server, base_url); crawl(base=base_url) then runs entirely offline.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), partial(MirrorHandler, directory=mirror_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    # python legal_crawler.py                    crawl malegislature.gov
+    # python legal_crawler.py --save-mirror DIR  crawl it and keep a copy of every page in DIR
+    #                                            (resuming an interrupted crawl only adds the pages it had left)
+    # python legal_crawler.py --mirror DIR       crawl a saved copy instead of the live site
+    if len(sys.argv) == 1:
+        asyncio.run(crawl())
+    elif len(sys.argv) == 3 and sys.argv[1] == "--save-mirror":
+        asyncio.run(crawl(mirror_dir=sys.argv[2]))
+    elif len(sys.argv) == 3 and sys.argv[1] == "--mirror":
+        server, mirror_url = serve_mirror(sys.argv[2])
+        try:
+            asyncio.run(crawl(base=mirror_url))
+        finally:
+            server.shutdown()
+    else:
+        print(f"Usage: {sys.argv[0]} [--save-mirror DIR | --mirror DIR]")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
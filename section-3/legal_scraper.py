@@ -8,10 +8,19 @@ from urllib.parse import urljoin
 base_url = 'https://malegislature.gov'
 start_path = '/Laws/GeneralLaws/PartII/TitleI/'
 
-# Directory to save the section files
+# Directory to save the section files (created on the first save, not on import,
+# since the crawler and its worker processes import this module for its helpers)
 output_dir = '../admin/sections_output'
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
+
+# The concurrent crawler writes sections to this packed corpus (see corpus.py)
+# instead of one .txt file each in output_dir
+PACKED_CORPUS = True
+corpus_file = '../admin/sections_corpus.jsonl.gz'
+
+# Crawl cache and frontier (see crawl_state.py), and the list of section files
+# the last crawl changed, for the concurrent crawler
+crawl_state_file = '../admin/crawl_state.sqlite'
+changes_file = '../admin/crawl_changes.json'
 
 # Range of base chapter numbers we want to crawl: 183 to 189 (inclusive)
 chapter_numbers = range(183, 190)
@@ -21,13 +30,20 @@ headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
 }
 
+# Crawl with the concurrent crawler in legal_crawler.py instead of page by page.
+ASYNC_CRAWL = True
+
+# One session so that consecutive requests reuse the same connection
+session = requests.Session()
+session.headers.update(headers)
+
 def get_soup(url):
     """Fetch content from the URL and return a BeautifulSoup object."""
-    response = requests.get(url, headers=headers)
+    response = session.get(url)
     response.raise_for_status()  # Raise error if the request failed
     return BeautifulSoup(response.text, 'html.parser')
 
-def get_next_page_url(soup):
+def get_next_page_url(soup, base=base_url):
     """
     Given a BeautifulSoup object of a chapter page, look for the Next button and extract 
     its target URL from the onclick attribute. Before following the link, the button's
@@ -47,7 +63,7 @@ def get_next_page_url(soup):
         m = re.search(r"location\.href\s*=\s*'([^']+)'", onclick_text)
         if m:
             next_path = m.group(1)
-            return urljoin(base_url, next_path)
+            return urljoin(base, next_path)
     return None
 
 def get_chapter_variant_links(chapter_number):
@@ -76,7 +92,7 @@ def get_chapter_variant_links(chapter_number):
 
     return sorted(list(variant_links))
 
-def extract_section_links(chapter_soup, chapter_url):
+def extract_section_links(chapter_soup, chapter_url, base=base_url):
     """
     Extracts all section links from a chapter page.
     Only links that start with the chapter URL and contain '/Section'
@@ -85,7 +101,7 @@ def extract_section_links(chapter_soup, chapter_url):
     section_links = set()
     for link in chapter_soup.find_all('a', href=True):
         href = link['href']
-        full_url = urljoin(base_url, href)
+        full_url = urljoin(base, href)
         if full_url.startswith(chapter_url) and '/Section' in full_url:
             section_links.add(full_url)
     return list(section_links)
@@ -93,12 +109,17 @@ def extract_section_links(chapter_soup, chapter_url):
 def extract_section_content(section_url):
     """
     Extracts the section title and text content from a given section URL.
+    """
+    return parse_section_content(get_soup(section_url), section_url)
+
+def parse_section_content(soup, section_url):
+    """
+    Extracts the section title and text content from a parsed section page.
     Searches through all <div class="col-xs-12"> elements until it finds one 
     that contains an <h2 id="skipTo"> element starting with "Section ".
     
     Duplicate paragraphs (based on stripped text) are removed.
     """
-    soup = get_soup(section_url)
     candidate_divs = soup.find_all('div', class_='col-xs-12')
     target_div = None
 
@@ -134,7 +155,38 @@ def sanitize_filename(name):
     """
     return re.sub(r'[^\w\-. ]', '', name).strip().replace(' ', '_')
 
+def section_filepath(chapter_url, section_link):
+    """
+    Path of a section's file in output_dir, named after the chapter and
+    section parts of its URL.
+    """
+    chapter_part = chapter_url.rstrip('/').split('/')[-1]
+    section_part = section_link.rstrip('/').split('/')[-1]
+    return os.path.join(output_dir, sanitize_filename(f"{chapter_part}_{section_part}.txt"))
+
+def save_section(chapter_url, section_link, title, text_content):
+    """
+    Write a section's title and text to its file in output_dir, unless the
+    file already holds exactly that. Returns (file path, whether it changed).
+    """
+    filepath = section_filepath(chapter_url, section_link)
+    content = title + "\n\n" + text_content
+    os.makedirs(output_dir, exist_ok=True)
+    if os.path.exists(filepath):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return filepath, False
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return filepath, True
+
 def main():
+    if ASYNC_CRAWL:
+        import asyncio
+        from legal_crawler import crawl
+        asyncio.run(crawl())
+        return
+
     # For each base chapter number, iterate through its variant pages via the Next button.
     for chapter_number in chapter_numbers:
         chapter_variants = get_chapter_variant_links(chapter_number)
@@ -163,16 +215,7 @@ def main():
                         print(f"Skipping {section_link} due to missing content")
                         continue
 
-                    # Build a filename from the chapter and section parts.
-                    chapter_part = chapter_url.rstrip('/').split('/')[-1]
-                    section_part = section_link.rstrip('/').split('/')[-1]
-                    filename = f"{chapter_part}_{section_part}.txt"
-                    filename = sanitize_filename(filename)
-                    filepath = os.path.join(output_dir, filename)
-
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(title + "\n\n")
-                        f.write(text_content)
+                    filepath, _ = save_section(chapter_url, section_link, title, text_content)
                     print(f"Saved content to {filepath}")
                 except Exception as e:
                     print(f"Error processing {section_link}: {e}")
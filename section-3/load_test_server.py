@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import random
+import asyncio
+import tempfile
+import statistics
+
+# Drives legal_chat_server.py against a local mock OpenAI server (embeddings plus
+# streaming chat completions) and reports requests/sec and time-to-first-token.
+# Run from the section-3 directory, which holds the FAISS index and metadata.
+NUM_SESSIONS = 200
+CONCURRENCY = 50
+MESSAGES_PER_SESSION = 2
+
+# Simulated model behaviour
+MOCK_FIRST_TOKEN_SECONDS = 0.3
+MOCK_TOKEN_INTERVAL_SECONDS = 0.01
+MOCK_TOKENS_PER_ANSWER = 40
+
+QUESTIONS = [
+    "Can my landlord keep my security deposit?",
+    "How much notice does a landlord need to give before ending a tenancy at will?",
+    "Who is responsible for removing snow from a rental property?",
+    "Can a landlord charge a fee for a lease application?",
+    "What does Chapter 186 Section 15B say about interest on deposits?",
+    "Is a mortgage discharge required to be recorded?",
+]
+
+def start_mock_openai():
+    """
+    Start a local stand-in for the OpenAI API: /v1/embeddings from
+    openai_support's fake endpoint plus a streaming /v1/chat/completions.
+    Returns the server and its base URL.
+    """
+    from openai_support import FakeEmbeddingsHandler, start_fake_server
+
+    class MockOpenAIHandler(FakeEmbeddingsHandler):
+        failure_rate = 0.0
+        latency = 0.02
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                return super().do_POST()
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            time.sleep(MOCK_FIRST_TOKEN_SECONDS)
+            for i in range(MOCK_TOKENS_PER_ANSWER):
+                chunk = {
+                    "id": "mock", "object": "chat.completion.chunk", "created": 0,
+                    "model": request["model"],
+                    "choices": [{"index": 0, "delta": {"content": f"token{i} "}, "finish_reason": None}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(MOCK_TOKEN_INTERVAL_SECONDS)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return start_fake_server(MockOpenAIHandler)
+
+async def chat(port: int, session_id: str, message: str):
+    """
+    Send one message and read the SSE stream. Returns (time to first token, total time).
+    """
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps({"session_id": session_id, "message": message}).encode("utf-8")
+    writer.write(
+        f"POST /chat HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("utf-8") + body
+    )
+    await writer.drain()
+    first_token = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.startswith(b"event: error"):
+            raise RuntimeError((await reader.readline()).decode())
+        if first_token is None and line.startswith(b"data: {\"delta\""):
+            first_token = time.perf_counter() - start
+    writer.close()
+    return first_token, time.perf_counter() - start
+
+async def run_load_test(port: int):
+    """
+    Run NUM_SESSIONS sessions of MESSAGES_PER_SESSION messages each, with at most
+    CONCURRENCY requests open at once. Messages within a session are sequential.
+    """
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    ttfts = []
+    errors = 0
+
+    async def session(n):
+        nonlocal errors
+        for turn in range(MESSAGES_PER_SESSION):
+            # A unique suffix keeps the embedding cache from answering every query.
+            message = f"{random.choice(QUESTIONS)} (case {n}.{turn})"
+            async with semaphore:
+                try:
+                    ttft, _ = await chat(port, f"session-{n}", message)
+                    ttfts.append(ttft)
+                except Exception as e:
+                    errors += 1
+                    print(f"Request failed: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(n) for n in range(NUM_SESSIONS)))
+    elapsed = time.perf_counter() - start
+    return len(ttfts), errors, elapsed, ttfts
+
+async def main():
+    mock_server, base_url = start_mock_openai()
+    # Both the sync and async OpenAI clients read these when they are created.
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "load-test"
+
+    import legal_chat
+    import legal_chat_server
+    # Measure the full retrieval + completion path, not cached answers.
+    legal_chat.SEMANTIC_CACHE = False
+    # The mock's vectors must not end up in the real caches under the real model name.
+    cache_dir = tempfile.TemporaryDirectory()
+    legal_chat.EMBEDDING_CACHE_FILE = os.path.join(cache_dir.name, "embedding_cache.sqlite")
+    legal_chat.RESPONSE_CACHE_FILE = os.path.join(cache_dir.name, "response_cache.sqlite")
+
+    try:
+        server = await legal_chat_server.start_server(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            completed, errors, elapsed, ttfts = await run_load_test(port)
+        finally:
+            server.close()
+    finally:
+        mock_server.shutdown()
+        legal_chat.get_embedding_cache().close()
+        cache_dir.cleanup()
+
+    ttfts.sort()
+    print(f"Completed {completed} requests ({errors} errors) in {elapsed:.2f}s "
+          f"with {CONCURRENCY} concurrent connections")
+    print(f"Throughput: {completed / elapsed:.1f} requests/sec")
+    if ttfts:
+        print(f"Time to first token: p50 {statistics.median(ttfts) * 1000:.0f} ms, "
+              f"p95 {ttfts[int(len(ttfts) * 0.95) - 1] * 1000:.0f} ms "
+              f"(mock model first-token delay {MOCK_FIRST_TOKEN_SECONDS * 1000:.0f} ms)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,11 @@
 import os
-import json
 import numpy as np
 import faiss
 from openai import OpenAI
 import openai
+from embedding_cache import EmbeddingCache
+from vector_index import load_index
+from metadata_store import MetadataStore, convert_json_metadata
 
 
 client = OpenAI(
@@ -21,22 +23,32 @@ BASE_SYSTEM_PROMPT = (
 
 # RAG Configuration
 FAISS_INDEX_FILE = "./faiss_index.bin"
-METADATA_FILE = "./metadata.json"
+METADATA_FILE = "./metadata.bin"
+LEGACY_METADATA_FILE = "./metadata.json"
 TOP_K = 3
 EMBEDDING_MODEL = "text-embedding-3-small"
 MODEL = "gpt-4o"
+EMBEDDING_CACHE_FILE = "./embedding_cache.sqlite"
 
-faiss_index = faiss.read_index(FAISS_INDEX_FILE)
-with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-    metadata = json.load(f)
+# Applies the nprobe/efSearch settings saved next to approximate indexes
+faiss_index = load_index(FAISS_INDEX_FILE)
+if not os.path.exists(METADATA_FILE) and os.path.exists(LEGACY_METADATA_FILE):
+    convert_json_metadata(LEGACY_METADATA_FILE, METADATA_FILE)
+metadata = MetadataStore(METADATA_FILE)
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_FILE)
 
 def get_embedding(text: str) -> np.ndarray:
+    text = text[:8150]
+    cached = embedding_cache.get(EMBEDDING_MODEL, text)
+    if cached is not None:
+        return cached
     response = client.embeddings.create(
-        input=text[:8150],
+        input=text,
         model=EMBEDDING_MODEL
     )
-    embedding = response.data[0].embedding
-    return np.array(embedding, dtype=np.float32)
+    embedding = np.array(response.data[0].embedding, dtype=np.float32)
+    embedding_cache.put(EMBEDDING_MODEL, text, embedding)
+    return embedding
 
 def retrieve_context(query: str, top_k: int = TOP_K) -> str:
     query_emb = get_embedding(query)
@@ -47,10 +59,15 @@ def retrieve_context(query: str, top_k: int = TOP_K) -> str:
 
     retrieved = []
     for idx in indices[0]:
-        if idx < len(metadata):
+        # FAISS pads missing results with -1; removed documents leave None slots.
+        if 0 <= idx < len(metadata) and metadata[idx] is not None:
             doc = metadata[idx]
             citation = f"(Chapter {doc.get('chapter', 'Unknown')} Section {doc.get('section', 'Unknown')}, {doc.get('link', 'No link')})"
-            snippet = doc.get('full_text', '').replace("\n", " ")[:200]
+            # Chunked indexes store the matching chunk; older ones only the full section text.
+            if 'chunk_text' in doc:
+                snippet = doc['chunk_text'].replace("\n", " ")
+            else:
+                snippet = doc.get('full_text', '').replace("\n", " ")[:200]
             retrieved.append(f"{citation}: {snippet}")
 
     if retrieved:
@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import resource
+import pandas as pd
+
+# pyarrow reads Parquet files one record batch at a time; CSV files only need pandas.
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# The analysis scripts read their input a fixed number of rows at a time, and
+# only the columns they use (typically an id and comment_text or article_text),
+# so memory stays bounded however large a docket grows. Outputs are written a
+# batch at a time as well, instead of being collected into one DataFrame.
+BATCH_ROWS = 1000
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+def is_parquet(path: str) -> bool:
+    return path.lower().endswith(PARQUET_EXTENSIONS)
+
+def _parquet_batches(path: str, columns, batch_rows: int, dtype):
+    if pq is None:
+        raise ImportError("pyarrow is required for Parquet files: pip install pyarrow")
+    parquet_file = pq.ParquetFile(path)
+    for record_batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+        batch = record_batch.to_pandas()
+        yield batch.astype(dtype) if dtype is not None else batch
+
+def _numbered(batches, columns, max_rows):
+    start = 0
+    for batch in batches:
+        if max_rows is not None and start + len(batch) > max_rows:
+            batch = batch.iloc[:max_rows - start]
+        # Label rows by their position in the file, as a whole-file read would.
+        batch.index = pd.RangeIndex(start, start + len(batch))
+        start += len(batch)
+        # usecols ignores the order the columns were asked for in.
+        yield batch[columns] if columns is not None else batch
+        if max_rows is not None and start >= max_rows:
+            return
+
+def iter_batches(path: str, columns=None, batch_rows: int = BATCH_ROWS, max_rows=None, dtype=None):
+    """
+    Yield DataFrames of at most `batch_rows` rows of a CSV or Parquet file (by
+    extension), reading only `columns` (all of them if None). Row labels count
+    on across batches, so they match the index of a whole-file read. Stops
+    after `max_rows` rows if given.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+    if max_rows is not None and max_rows <= 0:
+        return
+    if is_parquet(path):
+        yield from _numbered(_parquet_batches(path, columns, batch_rows, dtype), columns, max_rows)
+    else:
+        with pd.read_csv(path, usecols=columns, chunksize=batch_rows, dtype=dtype) as reader:
+            yield from _numbered(reader, columns, max_rows)
+
+def iter_rows(path: str, columns, batch_rows: int = BATCH_ROWS, max_rows=None, dtype=None):
+    """
+    Yield a tuple of the `columns` values for each row, read `batch_rows` rows at a time.
+    A column of None yields the row label instead (see iter_batches).
+    """
+    for batch in iter_batches(path, [column for column in columns if column is not None],
+                              batch_rows, max_rows, dtype):
+        yield from zip(*(batch[column] if column is not None else batch.index for column in columns))
+
+def chunked(items, size: int = BATCH_ROWS):
+    """
+    Yield lists of up to `size` consecutive items of an iterable.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_batches(path: str, batches) -> int:
+    """
+    Write DataFrames to one CSV file as they arrive, with the header of the
+    first. Returns the number of rows written.
+    """
+    rows = 0
+    header = True
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for batch in batches:
+            batch.to_csv(f, header=header, index=False)
+            f.flush()
+            header = False
+            rows += len(batch)
+    return rows
+
+def peak_memory_mb() -> float:
+    """
+    Peak resident memory of this process so far, in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+if __name__ == '__main__':
+    # python record_batches.py FILE [COLUMN ...]
+    # Read a CSV or Parquet file batch by batch and report rows/sec and peak memory.
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} FILE [COLUMN ...]")
+        sys.exit(1)
+    path = sys.argv[1]
+    columns = sys.argv[2:] or None
+    start = time.perf_counter()
+    rows = batches = 0
+    for batch in iter_batches(path, columns):
+        rows += len(batch)
+        batches += 1
+    seconds = time.perf_counter() - start
+    print(f"{rows} rows in {batches} batch(es) of up to {BATCH_ROWS} from {os.path.basename(path)} "
+          f"in {seconds:.2f}s ({rows / seconds if seconds else 0:.0f} rows/s), peak memory {peak_memory_mb():.0f} MB")
@@ -0,0 +1,131 @@
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+# Default location and policy of the semantic response cache
+RESPONSE_CACHE_FILE = "./response_cache.sqlite"
+SIMILARITY_THRESHOLD = 0.95
+TTL_SECONDS = 7 * 24 * 3600
+MAX_ENTRIES = 10_000
+
+def make_scope(model: str, system_prompt: str, documents) -> str:
+    """
+    Build the key an answer is only reusable under: the same chat model, the same
+    system prompt and the same retrieved chunks, identified by their metadata
+    entries (filename, chunk index and a hash of the chunk text) rather than by
+    vector id, since ids are reused when an incremental build replaces a section.
+    """
+    prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:16]
+    keys = set()
+    for doc in documents:
+        text = doc.get('chunk_text', doc.get('full_text', ''))
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+        keys.add(f"{doc.get('filename', '')}#{doc.get('chunk_index', 0)}#{text_hash}")
+    return f"{model}|{prompt_hash}|{','.join(sorted(keys))}"
+
+class ResponseCache:
+    """
+    Semantic answer cache backed by a local SQLite file.
+    An answer is returned for a new query when a cached query under the same scope
+    (see make_scope) has cosine similarity of at least `threshold` with it.
+    Entries expire after `ttl_seconds`; beyond `max_entries` the least recently
+    used ones are evicted. Hit and miss counts are kept for the lifetime of the object.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_FILE, threshold=SIMILARITY_THRESHOLD,
+                 ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " id INTEGER PRIMARY KEY,"
+            " scope TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def _normalize(embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return embedding / (np.linalg.norm(embedding) or 1.0)
+
+    def lookup(self, embedding, scope: str):
+        """
+        Return the cached answer for the most similar unexpired query under this scope,
+        or None if none reaches the similarity threshold.
+        """
+        query = self._normalize(embedding)
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, embedding, answer FROM responses WHERE scope = ? AND created_at >= ?",
+                (scope, now - self.ttl_seconds)
+            ).fetchall()
+            best_id, best_answer, best_similarity = None, None, self.threshold
+            for row_id, blob, answer in rows:
+                similarity = float(np.dot(query, np.frombuffer(blob, dtype=np.float32)))
+                if similarity >= best_similarity:
+                    best_id, best_answer, best_similarity = row_id, answer, similarity
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute(
+                "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE id = ?", (now, best_id)
+            )
+            self.conn.commit()
+            return best_answer
+
+    def store(self, embedding, scope: str, answer: str):
+        """
+        Cache an answer, then drop expired entries and evict least recently used
+        ones beyond max_entries.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO responses (scope, embedding, answer, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (scope, self._normalize(embedding).tobytes(), answer, now, now)
+            )
+            self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.conn.execute(
+                "DELETE FROM responses WHERE id IN ("
+                " SELECT id FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,)
+            )
+            self.conn.commit()
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters, hit rate and the number of cached answers.
+        """
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from bulk_image_analysis import AdaptiveLimiter, parse_reset
+
+def test_parse_reset():
+    assert parse_reset("1s") == 1
+    assert parse_reset("6m0s") == 360
+    assert parse_reset("120ms") == pytest.approx(0.12)
+    assert parse_reset("1.5s") == 1.5
+    assert parse_reset("") is None
+    assert parse_reset("soon") is None
+
+def test_one_burst_of_429s_halves_the_limit_once():
+    async def run():
+        limiter = AdaptiveLimiter(max_concurrency=8)
+        epochs = [await limiter.acquire() for _ in range(8)]
+        for epoch in epochs:
+            await limiter.release()
+            await limiter.rate_limited(0, epoch)
+        assert limiter.limit == 4
+        # A request started after the decrease halves it again.
+        epoch = await limiter.acquire()
+        await limiter.release()
+        await limiter.rate_limited(0, epoch)
+        assert limiter.limit == 2
+        assert limiter.stats["rate_limited"] == 9
+        assert limiter.stats["lowest_limit"] == 2
+    asyncio.run(run())
+
+def test_successes_grow_the_limit_back():
+    async def run():
+        limiter = AdaptiveLimiter(max_concurrency=4)
+        await limiter.rate_limited(0, await limiter.acquire())
+        await limiter.release()
+        assert limiter.limit == 2
+        for _ in range(2):
+            await limiter.acquire()
+            await limiter.release()
+            await limiter.succeeded({})
+        assert limiter.limit == 3
+    asyncio.run(run())
+
+def test_low_remaining_requests_pause_new_requests():
+    async def run():
+        limiter = AdaptiveLimiter(max_concurrency=4)
+        await limiter.acquire()
+        await limiter.release()
+        await limiter.succeeded({"x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "200ms"})
+        assert limiter.stats["header_pauses"] == 1
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await limiter.acquire()
+        assert loop.time() - start >= 0.15
+    asyncio.run(run())
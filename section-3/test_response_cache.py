@@ -0,0 +1,40 @@
+import numpy as np
+from response_cache import ResponseCache, make_scope
+
+DOCUMENTS = [
+    {"filename": "Chapter186_Section15B.txt", "chunk_index": 0, "chunk_text": "Security deposits earn interest."},
+    {"filename": "Chapter186_Section15B.txt", "chunk_index": 1, "chunk_text": "Interest is paid yearly."},
+]
+
+def test_scope_ignores_order_but_not_content():
+    scope = make_scope("gpt-4o", "system", DOCUMENTS)
+    assert make_scope("gpt-4o", "system", DOCUMENTS[::-1]) == scope
+    edited = [DOCUMENTS[0], {**DOCUMENTS[1], "chunk_text": "Interest is paid monthly."}]
+    assert make_scope("gpt-4o", "system", edited) != scope
+    assert make_scope("gpt-4o-mini", "system", DOCUMENTS) != scope
+    assert make_scope("gpt-4o", "another system prompt", DOCUMENTS) != scope
+
+def test_lookup_by_similarity_within_scope(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), threshold=0.95)
+    cache.store([1.0, 0.0, 0.0], "scope", "The lessor pays interest.")
+    assert cache.lookup([0.99, 0.05, 0.0], "scope") == "The lessor pays interest."
+    assert cache.lookup([0.0, 1.0, 0.0], "scope") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "other scope") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3, "entries": 1}
+    cache.close()
+
+def test_expired_and_evicted_entries(tmp_path):
+    expired = ResponseCache(str(tmp_path / "expired.sqlite"), ttl_seconds=-1)
+    expired.store([1.0, 0.0], "scope", "stale")
+    assert expired.lookup([1.0, 0.0], "scope") is None
+    expired.close()
+
+    cache = ResponseCache(str(tmp_path / "bounded.sqlite"), max_entries=2)
+    for i, answer in enumerate(["first", "second", "third"]):
+        vector = np.zeros(3)
+        vector[i] = 1.0
+        cache.store(vector, "scope", answer)
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup([1.0, 0.0, 0.0], "scope") is None
+    assert cache.lookup([0.0, 0.0, 1.0], "scope") == "third"
+    cache.close()
@@ -0,0 +1,172 @@
+import os
+import json
+import numpy as np
+import faiss
+
+# Supported index types:
+#   "flat"     exact search (IndexFlatL2); best recall, linear query time
+#   "ivf_flat" inverted lists over full vectors; probes NPROBE of the clusters
+#   "ivf_pq"   inverted lists over product-quantized vectors; smallest memory footprint
+#   "hnsw"     graph index; fast queries, no training, no in-place deletion
+INDEX_TYPES = ["flat", "ivf_flat", "ivf_pq", "hnsw"]
+
+# Number of vectors sampled to train IVF centroids and PQ codebooks.
+TRAIN_SAMPLE_SIZE = 50_000
+
+# Default search-time settings, saved next to the index.
+IVF_NPROBE = 16
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Target number of PQ sub-quantizers (must divide the dimension).
+PQ_M = 64
+
+def ivf_nlist(num_vectors: int) -> int:
+    """
+    Pick the number of IVF clusters: about 4 * sqrt(n), but never so many
+    that a cluster gets fewer than 39 training points (FAISS's minimum).
+    """
+    return max(1, min(int(4 * np.sqrt(num_vectors)), num_vectors // 39))
+
+def pq_params(dimension: int, num_vectors: int):
+    """
+    Pick (m, nbits) for product quantization. m is the largest divisor of the
+    dimension up to PQ_M; nbits drops below 8 for small corpora so each
+    codebook still has enough training points.
+    """
+    m = max(d for d in range(1, min(PQ_M, dimension) + 1) if dimension % d == 0)
+    nbits = int(min(8, max(1, np.log2(max(2, num_vectors // 39)))))
+    return m, nbits
+
+def make_index(index_type: str, dimension: int, num_vectors: int):
+    """
+    Create an empty (untrained) FAISS index of the given type, wrapped in an
+    ID map so vectors can be added, removed and replaced by id.
+    The IVF and PQ sizes are chosen from the expected number of vectors.
+    """
+    if index_type == "flat":
+        description = "Flat"
+    elif index_type == "ivf_flat":
+        description = f"IVF{ivf_nlist(num_vectors)},Flat"
+    elif index_type == "ivf_pq":
+        m, nbits = pq_params(dimension, num_vectors)
+        description = f"IVF{ivf_nlist(num_vectors)},PQ{m}x{nbits}"
+    elif index_type == "hnsw":
+        description = f"HNSW{HNSW_M}"
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+    index = faiss.index_factory(dimension, description, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    return faiss.IndexIDMap2(index)
+
+def train_index(index, vectors, sample_size=TRAIN_SAMPLE_SIZE, seed=0):
+    """
+    Train the index on a random sample of the vectors (a no-op for flat and HNSW indexes).
+    """
+    if index.is_trained:
+        return
+    if len(vectors) > sample_size:
+        rng = np.random.default_rng(seed)
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    print(f"Training index on {len(vectors)} vectors")
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+
+def build_index(index_type: str, vectors, ids=None):
+    """
+    Create, train and fill an index of the given type in one step.
+    Uses ids 0..n-1 unless explicit ids are given.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if ids is None:
+        ids = np.arange(len(vectors), dtype=np.int64)
+    index = make_index(index_type, vectors.shape[1], len(vectors))
+    train_index(index, vectors)
+    index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    return index
+
+def index_type_of(index) -> str:
+    """
+    Return which of INDEX_TYPES an (ID-mapped) index is.
+    """
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def default_search_params(index) -> dict:
+    """
+    Return the search-time parameters to use with an index, based on its type.
+    """
+    index_type = index_type_of(index)
+    params = {"index_type": index_type}
+    if index_type in ("ivf_flat", "ivf_pq"):
+        params["nprobe"] = min(IVF_NPROBE, faiss.extract_index_ivf(index).nlist)
+    elif index_type == "hnsw":
+        params["efSearch"] = HNSW_EF_SEARCH
+    return params
+
+def set_search_params(index, params: dict):
+    """
+    Apply saved search-time parameters (nprobe, efSearch) to an index.
+    """
+    parameter_space = faiss.ParameterSpace()
+    for name in ("nprobe", "efSearch"):
+        if name in params:
+            parameter_space.set_index_parameter(index, name, params[name])
+
+def remove_vectors(index, ids):
+    """
+    Remove vectors from an ID-mapped index by id. HNSW graphs cannot delete
+    in place, so for them the index is rebuilt from the remaining vectors.
+    Returns the updated index (which may be a new object).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if index_type_of(index) != "hnsw":
+        index.remove_ids(ids)
+        return index
+    remaining = np.setdiff1d(faiss.vector_to_array(index.id_map), ids)
+    vectors = np.stack([index.reconstruct(int(i)) for i in remaining]) if len(remaining) else None
+    rebuilt = make_index("hnsw", index.d, len(remaining))
+    if vectors is not None:
+        rebuilt.add_with_ids(vectors, remaining)
+    return rebuilt
+
+def params_file_for(index_file: str) -> str:
+    """
+    Return the path of the search-parameter file stored next to an index file.
+    """
+    return os.path.splitext(index_file)[0] + "_params.json"
+
+def save_index(index, index_file: str, params=None):
+    """
+    Write an index to disk together with its search parameters.
+    """
+    faiss.write_index(index, index_file)
+    with open(params_file_for(index_file), 'w', encoding='utf-8') as f:
+        json.dump(params or default_search_params(index), f, indent=2)
+
+def load_index(index_file: str, mmap: bool = False):
+    """
+    Read an index from disk and apply the search parameters saved next to it, if any.
+    With mmap=True the index is memory-mapped read-only instead of read into RAM,
+    so opening it is nearly free; index types FAISS cannot map are read normally.
+    """
+    if mmap:
+        try:
+            index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = faiss.read_index(index_file)
+    else:
+        index = faiss.read_index(index_file)
+    params_file = params_file_for(index_file)
+    if os.path.exists(params_file):
+        with open(params_file, 'r', encoding='utf-8') as f:
+            set_search_params(index, json.load(f))
+    return index
@@ -0,0 +1,62 @@
+import sys
+import json
+import time
+import resource
+import subprocess
+from pdf2image import convert_from_path
+import ocr_engine
+from ocr_engine import correct_rotation, ocr_pdf, page_count
+import pytesseract
+
+# Compares the original approach (rasterize the whole PDF, then OSD + OCR each
+# page on one core) with ocr_engine's parallel page-range OCR, reporting
+# pages/sec and peak RSS. Each mode runs in a fresh process so their memory
+# peaks are measured separately.
+#
+#   python benchmark_ocr.py [PDF_FILE]
+PDF_FILE = "./tealbook.pdf"
+
+def serial_ocr(pdf_path):
+    pages = convert_from_path(pdf_path)
+    for page in pages:
+        page, _ = correct_rotation(page)
+        pytesseract.image_to_string(page)
+    return len(pages)
+
+def parallel_ocr(pdf_path):
+    return sum(1 for _ in ocr_pdf(pdf_path))
+
+def peak_rss_mb():
+    """
+    Peak RSS of this process and of its largest child (OCR workers, pdftoppm and
+    tesseract), in MB. ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    """
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    return own, children
+
+def run_mode(mode, pdf_path):
+    start = time.perf_counter()
+    pages = serial_ocr(pdf_path) if mode == 'serial' else parallel_ocr(pdf_path)
+    seconds = time.perf_counter() - start
+    own, children = peak_rss_mb()
+    print(json.dumps({'mode': mode, 'pages': pages, 'seconds': seconds, 'rss_mb': own, 'child_rss_mb': children}))
+
+def main():
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else PDF_FILE
+    print(f"{pdf_path}: {page_count(pdf_path)} pages, {ocr_engine.WORKERS} worker(s), "
+          f"{ocr_engine.PAGES_PER_TASK} pages per task at {ocr_engine.DPI} dpi\n")
+    print(f"{'Mode':<10}{'Seconds':>10}{'Pages/sec':>12}{'Peak RSS MB':>14}{'Child RSS MB':>15}")
+    for mode in ('serial', 'parallel'):
+        output = subprocess.run([sys.executable, __file__, '--mode', mode, pdf_path],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<10}{result['seconds']:>10.1f}{result['pages'] / result['seconds']:>12.2f}"
+              f"{result['rss_mb']:>14.0f}{result['child_rss_mb']:>15.0f}")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else PDF_FILE)
+    else:
+        main()
@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import asyncio
+import pandas as pd
+import openai
+from record_batches import chunked, write_batches
+from openai_support import backoff_delay, is_retryable
+
+# jsonschema validates tool-call arguments fully; without it a built-in check
+# covers the subset of JSON Schema our tool definitions use.
+try:
+    import jsonschema
+except ImportError:
+    jsonschema = None
+
+# Most extraction requests in flight at once
+MAX_CONCURRENCY = 8
+
+# Rows are taken from the input only as earlier ones finish, at most this many
+# rows per request slot ahead, so a lazily read input is never held in full.
+ROWS_AHEAD_PER_SLOT = 4
+
+# Retries for 429s, 5xx errors and dropped connections (see openai_support.py).
+MAX_RETRIES = 5
+
+# A row whose tool-call arguments fail validation is asked again this many times.
+INVALID_RETRIES = 1
+
+# Print progress after every this many finished rows
+REPORT_EVERY = 50
+
+_JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+    "null": type(None),
+}
+
+class ExtractionError(Exception):
+    """
+    The model's reply has no usable tool call for the row.
+    """
+
+def _check_value(value, schema: dict, path: str, errors: list):
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        # bool is a subclass of int, but JSON Schema keeps them apart.
+        if not any(isinstance(value, _JSON_TYPES[t]) and not (isinstance(value, bool) and t in ("integer", "number"))
+                   for t in types):
+            errors.append(f"{path}: expected {expected}, got {type(value).__name__}")
+            return
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: {value!r} is not one of {schema['enum']}")
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path}: missing required property {name!r}")
+        for name, item in value.items():
+            if name in properties:
+                _check_value(item, properties[name], f"{path}.{name}", errors)
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}: unexpected property {name!r}")
+    if isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            _check_value(item, schema["items"], f"{path}[{i}]", errors)
+
+def validate_arguments(arguments, schema: dict) -> list:
+    """
+    Check tool-call arguments against a tool's parameters schema.
+    Returns a list of error messages, empty if the arguments are valid.
+    """
+    if jsonschema is not None:
+        return [f"$.{'.'.join(map(str, error.path))}: {error.message}"
+                for error in jsonschema.Draft7Validator(schema).iter_errors(arguments)]
+    errors = []
+    _check_value(arguments, schema, "$", errors)
+    return errors
+
+def parse_tool_call(message, tool: dict) -> dict:
+    """
+    Return the validated arguments of the assistant message's call to `tool`.
+    Raises ExtractionError when there is no such call or its arguments are invalid.
+    """
+    name = tool["function"]["name"]
+    calls = [call for call in (message.tool_calls or []) if call.function.name == name]
+    if not calls:
+        raise ExtractionError(f"no call to {name}")
+    try:
+        arguments = json.loads(calls[0].function.arguments)
+    except json.JSONDecodeError as e:
+        raise ExtractionError(f"arguments are not valid JSON ({e})")
+    errors = validate_arguments(arguments, tool["function"]["parameters"])
+    if errors:
+        raise ExtractionError("; ".join(errors))
+    return arguments
+
+class Checkpoint:
+    """
+    Append-only JSONL file of finished rows, one {"id": ..., "result": {...}} per
+    line, flushed as each row completes so an interrupted run loses nothing it
+    finished. Row ids are compared as strings.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.results = {}
+        complete = True
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    complete = line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by a crash; that row is simply done again.
+                        continue
+                    self.results[str(record["id"])] = record["result"]
+        self.file = open(path, "a", encoding="utf-8")
+        if not complete:
+            # Start a fresh line after a cut-off one, so the next record stays readable.
+            self.file.write("\n")
+
+    def __contains__(self, row_id) -> bool:
+        return str(row_id) in self.results
+
+    def append(self, row_id, result: dict):
+        self.file.write(json.dumps({"id": row_id, "result": result}, ensure_ascii=False, default=str) + "\n")
+        self.file.flush()
+        self.results[str(row_id)] = result
+
+    def close(self):
+        self.file.close()
+
+async def extract_row(client, semaphore, content: str, tool: dict, system_prompt: str, model: str) -> dict:
+    """
+    Run one forced tool call for a row and return its validated arguments.
+    Retries transient API errors with backoff and re-asks on invalid arguments.
+    """
+    invalid = 0
+    attempt = 0
+    while True:
+        try:
+            async with semaphore:
+                completion = await client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": content}
+                    ],
+                    tools=[tool],
+                    tool_choice={"type": "function", "function": {"name": tool["function"]["name"]}}
+                )
+            return parse_tool_call(completion.choices[0].message, tool)
+        except ExtractionError:
+            invalid += 1
+            if invalid > INVALID_RETRIES:
+                raise
+        except Exception as e:
+            if not is_retryable(e) or attempt >= MAX_RETRIES:
+                raise
+            await asyncio.sleep(backoff_delay(e, attempt))
+            attempt += 1
+
+async def extract_rows(client, rows, tool: dict, system_prompt: str, model: str, checkpoint_path: str,
+                       max_concurrency: int = MAX_CONCURRENCY) -> dict:
+    """
+    Extract structured data from (row id, text) rows with `tool`, at most
+    `max_concurrency` requests at a time. `rows` may be any iterable, such as a
+    generator reading the input in batches; it is consumed as requests finish.
+    Each result is appended to the checkpoint file as it completes; rows already
+    in it are skipped. Returns a dict of counts.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # We handle retries ourselves, so switch off the client's built-in ones.
+    client = client.with_options(max_retries=0)
+    stats = {'skipped': 0, 'extracted': 0, 'invalid': 0, 'failed': 0}
+    start = time.perf_counter()
+
+    async def run(row_id, content):
+        try:
+            result = await extract_row(client, semaphore, content, tool, system_prompt, model)
+        except ExtractionError as e:
+            print(f"Row {row_id}: invalid tool call ({e})")
+            stats['invalid'] += 1
+            return
+        except Exception as e:
+            print(f"Row {row_id} failed: {e}")
+            stats['failed'] += 1
+            return
+        checkpoint.append(row_id, result)
+        stats['extracted'] += 1
+        if stats['extracted'] % REPORT_EVERY == 0:
+            rate = stats['extracted'] / (time.perf_counter() - start) * 60
+            print(f"{stats['extracted']} rows, {rate:.0f} rows/min")
+
+    tasks = set()
+    try:
+        for row_id, content in rows:
+            if row_id in checkpoint:
+                stats['skipped'] += 1
+                continue
+            tasks.add(asyncio.ensure_future(run(row_id, content)))
+            if len(tasks) >= max_concurrency * ROWS_AHEAD_PER_SLOT:
+                _, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        await asyncio.gather(*tasks)
+    finally:
+        checkpoint.close()
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_minute'] = stats['extracted'] / stats['seconds'] * 60 if stats['seconds'] else 0.0
+    return stats
+
+def iter_checkpoint(path: str):
+    """
+    Yield (row id, result) for each record in a checkpoint file, reading it line
+    by line. A row written more than once is yielded once.
+    """
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if str(record["id"]) not in seen:
+                seen.add(str(record["id"]))
+                yield record["id"], record["result"]
+
+def _frames(records, columns):
+    # Batches share the columns given, or those of the first batch.
+    for chunk in chunked(records):
+        frame = pd.DataFrame(chunk)
+        if columns is None:
+            columns = list(frame.columns)
+        yield frame.reindex(columns=columns)
+
+def checkpoint_to_csv(checkpoint_path: str, output_path: str, id_column: str = "id", clusters=None,
+                      fields=None) -> int:
+    """
+    Write every row in a checkpoint file to a CSV, one column per extracted field
+    (`fields`, e.g. the tool's properties; otherwise those of the first rows),
+    a batch of rows at a time. With `clusters`, an iterable of (row id,
+    representative row id) pairs, every row gets its representative's result
+    instead (see near_duplicates.py); only the representatives' results are held
+    in memory. Returns the number of rows written.
+    """
+    if clusters is None:
+        records = ({id_column: row_id, **result} for row_id, result in iter_checkpoint(checkpoint_path))
+        columns = [id_column] + list(fields) if fields is not None else None
+    else:
+        checkpoint = Checkpoint(checkpoint_path)
+        checkpoint.close()
+        records = ({id_column: row_id, "cluster_id": representative, **checkpoint.results[str(representative)]}
+                   for row_id, representative in clusters if str(representative) in checkpoint.results)
+        columns = [id_column, "cluster_id"] + list(fields) if fields is not None else None
+    return write_batches(output_path, _frames(records, columns))
@@ -1,11 +1,22 @@
-from openai import OpenAI
-import pandas as pd
-import json
+from openai import OpenAI, AsyncOpenAI
+import asyncio
+import sys
+from batch_jobs import (
+    collect_job, load_job, poll_job, run_job_locally, save_job,
+    stable_custom_ids, submit_job, tool_call_arguments, write_batch_files
+)
+from near_duplicates import CLUSTER_COLUMN, cluster_batches, compression_summary
+from record_batches import chunked, iter_batches, iter_rows
+from request_packing import format_packing_stats, run_packed, sum_packing_stats
+from extraction_runner import checkpoint_to_csv, extract_rows, validate_arguments, Checkpoint
 
-# Initialize OpenAI client
+# Initialize OpenAI clients (the async one runs the concurrent extraction)
 client = OpenAI(
     api_key=""  # Add your API key here
 )
+async_client = AsyncOpenAI(
+    api_key=client.api_key
+)
 
 # Define the function schema for structured output
 tools = [
@@ -35,30 +46,143 @@ You are a political analyst. For each article, extract the main topic, the polit
 
 # Load articles from CSV
 csv_path = "../section-4/articles.csv"
-df = pd.read_csv(csv_path).head(5)
+output_path = "./structured_articles.csv"
 
 article_column = "article_text"
+id_column = None    # Column with a unique row id, e.g. "comment_id" for the FCC comments; None uses the row index
+max_rows = None     # Only process the first max_rows rows, e.g. 5 to try a prompt out
+
+# The CSV (or a Parquet file) is read this many rows at a time, and only the id and
+# article columns, so memory does not grow with its size.
+batch_rows = 1000
+
+# Cluster near-identical rows (e.g. form letters in public comments) and extract only
+# the first row of each cluster; its result is copied to the rest (see near_duplicates.py).
+deduplicate = True
 
-results = []
+model = "gpt-4.1"
 
-for i, row in df.iterrows():
-    content = row[article_column]
+# Finished rows are appended here as they complete; rows already in it are skipped on a re-run.
+checkpoint_path = "./structured_articles_checkpoint.jsonl"
 
-    completion = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=[
+# Batch mode files: the JSONL request files and the job file recording the submitted batch ids
+batch_prefix = "./structured_articles_batch"
+job_file = "./structured_articles_batch_job.json"
+
+def request_body(content: str) -> dict:
+    return {
+        "model": model,
+        "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": content}
         ],
-       tools=tools,
-       tool_choice=tool_choice
-    )
-
-    output = completion.choices[0].message.tool_calls[0].function.arguments
-    parsed_output = json.loads(output)
-    results.append({"id": i, **parsed_output})
-
-# Save the structured results to a new CSV
-output_df = pd.DataFrame(results)
-output_df.to_csv("/Users/cai529/Github/dpi-681/section-5/structured_articles.csv", index=False)
-print("Saved structured results to structured_articles.csv")
+        "tools": tools,
+        "tool_choice": tool_choice
+    }
+
+def load_clusters():
+    """
+    Cluster the rows by near-duplicate text, reading only the id and article
+    columns. Returns a DataFrame of row ids and cluster ids, or None when
+    deduplicate is off.
+    """
+    if not deduplicate:
+        return None
+    batches = iter_batches(csv_path, [column for column in (id_column, article_column) if column],
+                           batch_rows, max_rows)
+    clusters = cluster_batches(batches, article_column, id_column)
+    print(compression_summary(clusters))
+    return clusters
+
+def iter_articles(clusters):
+    """
+    Yield (row id, article) for every row to send, one batch of rows read at a
+    time: with clusters, only the first row of each cluster.
+    """
+    representatives = None if clusters is None else set(clusters[CLUSTER_COLUMN])
+    for row_id, content in iter_rows(csv_path, [id_column, article_column], batch_rows, max_rows):
+        if representatives is None or row_id in representatives:
+            yield row_id, content
+
+def run_extraction(clusters):
+    stats = asyncio.run(extract_rows(async_client, iter_articles(clusters), tools[0], system_prompt, model,
+                                     checkpoint_path))
+    print(f"Extracted {stats['extracted']} row(s) in {stats['seconds']:.1f}s ({stats['rows_per_minute']:.0f} rows/min); "
+          f"{stats['invalid']} invalid, {stats['failed']} failed, {stats['skipped']} already done")
+    save_results(clusters)
+
+def save_results(clusters):
+    # Save the structured results to a new CSV, copying each representative's result to its cluster
+    pairs = None if clusters is None else clusters.itertuples(index=False)
+    count = checkpoint_to_csv(checkpoint_path, output_path, clusters=pairs,
+                              fields=tools[0]["function"]["parameters"]["properties"])
+    print(f"Saved {count} structured result(s) to {output_path}")
+
+def run_pack(clusters):
+    # Short articles are packed several to a request; results go to the same checkpoint as 'run'.
+    checkpoint = Checkpoint(checkpoint_path)
+    documents = ((row_id, content) for row_id, content in iter_articles(clusters) if row_id not in checkpoint)
+    stats = None
+    try:
+        # Each batch of rows is packed and sent on its own, so only one batch of text is held at a time.
+        for batch in chunked(documents, batch_rows):
+            stats = sum_packing_stats(stats, run_packed(client, batch, tools[0], system_prompt, model,
+                                                        validate=validate_arguments, on_result=checkpoint.append))
+    finally:
+        checkpoint.close()
+    if stats is not None:
+        print(format_packing_stats(stats))
+    save_results(clusters)
+
+def merge_batch_results(clusters, batch_results):
+    # Results come back in any order; match them to rows by custom_id and add them to the checkpoint.
+    row_ids = [row_id for row_id, _ in iter_articles(clusters)]
+    checkpoint = Checkpoint(checkpoint_path)
+    schema = tools[0]["function"]["parameters"]
+    for row_id, custom_id in zip(row_ids, stable_custom_ids("row", row_ids)):
+        if row_id in checkpoint:
+            continue
+        parsed_output = tool_call_arguments(batch_results.get(custom_id))
+        errors = validate_arguments(parsed_output, schema) if parsed_output is not None else ["no result"]
+        if errors:
+            print(f"Row {row_id}: {'; '.join(errors)}")
+            continue
+        checkpoint.append(row_id, parsed_output)
+    checkpoint.close()
+    save_results(clusters)
+
+if __name__ == '__main__':
+    # python function_call_example.py [run | pack | submit | status | collect | local]
+    #   run      concurrent requests, checkpointed as they finish (default)
+    #   pack     several short articles per request, sharing one cached prompt prefix
+    #   submit   write the requests as JSONL, submit them to the Batch API and exit
+    #   status   show the progress of the submitted job
+    #   collect  wait for the submitted job, then merge its results by custom_id
+    #   local    run the JSONL requests concurrently here instead of through the Batch API
+    mode = sys.argv[1] if len(sys.argv) > 1 else "run"
+    if mode not in ("run", "pack", "submit", "status", "collect", "local"):
+        print(f"Usage: {sys.argv[0]} [run | pack | submit | status | collect | local]")
+        sys.exit(1)
+
+    clusters = load_clusters()
+    if mode == "run":
+        run_extraction(clusters)
+    elif mode == "pack":
+        run_pack(clusters)
+    elif mode in ("submit", "local"):
+        custom_ids = stable_custom_ids("row", [row_id for row_id, _ in iter_articles(clusters)])
+        # Request bodies are built as the rows are read and written straight to the JSONL files.
+        requests = ((custom_id, request_body(content)) for custom_id, (_, content)
+                    in zip(custom_ids, iter_articles(clusters)))
+        paths = write_batch_files(requests, batch_prefix)
+        if mode == "submit":
+            submit_job(client, paths, job_file)
+            print(f"Run '{sys.argv[0]} collect' to merge the results once the batches finish")
+        else:
+            merge_batch_results(clusters, run_job_locally(client, paths))
+    else:
+        job = load_job(job_file)
+        finished = poll_job(client, job, wait=(mode == "collect"))
+        save_job(job, job_file)
+        if mode == "collect" and finished:
+            merge_batch_results(clusters, collect_job(client, job))
@@ -1,65 +1,305 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-import re
 
 # Base URL for constructing complete links
 base_url = "https://www.federalreserve.gov"
 
-# URL of the historical FOMC page for 2018 meetings
-url = "https://www.federalreserve.gov/monetarypolicy/fomchistorical2018.htm"
-
-# Send an HTTP GET request to the page
-response = requests.get(url)
-if response.status_code != 200:
-    raise Exception(f"Failed to fetch the page. Status code: {response.status_code}")
-
-# Parse the HTML content using BeautifulSoup
-soup = BeautifulSoup(response.content, "html.parser")
-
-# Locate all meeting panels by finding <h5> elements with the specific class.
-panels = soup.find_all("h5", class_="panel-heading panel-heading--shaded")
-
-if not panels:
-    raise Exception("No meeting panels found on the page.")
-
-for panel in panels:
-    # Get the text from the panel heading, e.g., "Jul/Aug Meeting - 2018" or "March 20-21 Meeting - 2018"
-    meeting_text = panel.get_text(strip=True)
-    print(f"Processing meeting: {meeting_text}")
-
-    # Extract the first segment (assumed to be the month or months).
-    # For example, for "Jul/Aug Meeting - 2018", it takes "Jul/Aug" and then splits by '/' to keep only "Jul"
-    raw_month = meeting_text.split()[0]
-    # If the month is expressed with a slash, use only the first part.
-    first_month = raw_month.split("/")[0]
-    # Sanitize the extracted month to remove any characters not allowed in filenames.
-    month = re.sub(r'[\\/:"*?<>|]+', '', first_month)
-
-    # The related links are in a sibling <div> with class "row divided-row".
-    container_div = panel.find_next_sibling("div", class_="row divided-row")
-    if not container_div:
-        print(f"No meeting details container found for: {meeting_text}")
-        continue
-
-    # Find the anchor with a href that contains "tealbooka" (case insensitive).
-    tealbook_a_link = container_div.find("a", href=lambda href: href and "tealbooka" in href.lower())
-    if not tealbook_a_link:
-        print(f"No Tealbook A link found for: {meeting_text}")
-        continue
-
-    # Build the complete URL for the PDF.
-    pdf_relative_url = tealbook_a_link['href']
-    pdf_url = base_url + pdf_relative_url
-
-    print(f"Downloading Tealbook A from: {pdf_url}")
-
-    # Download the PDF file
-    pdf_response = requests.get(pdf_url)
-    if pdf_response.status_code == 200:
-        # Save the file as "MONTH_TBA.pdf" (e.g., "Jul_TBA.pdf" or "March_TBA.pdf")
-        filename = f"{month}_TBA.pdf"
-        with open(filename, "wb") as f:
-            f.write(pdf_response.content)
-        print(f"Saved PDF as {filename}")
-    else:
-        print(f"Failed to download PDF from {pdf_url} (Status code: {pdf_response.status_code})")
+# Historical FOMC pages, one per year, e.g. fomchistorical2018.htm for the 2018 meetings.
+# Tealbooks replaced the Greenbook/Bluebook in mid-2010.
+historical_url = base_url + "/monetarypolicy/fomchistorical{year}.htm"
+
+# Year(s) downloaded when none are given on the command line.
+YEARS = [2018]
+
+# Where PDFs are saved. With one year files are named "MONTH_TBA.pdf" (e.g. "Jul_TBA.pdf");
+# with several, "MONTHYEAR_TBA.pdf" (e.g. "Jul2018_TBA.pdf") so meetings in different
+# years do not overwrite each other. When two meetings of a year start in the same
+# month, both names also get the date from the PDF's URL (e.g. "Jan_20200129_TBA.pdf").
+DOWNLOAD_DIR = "."
+
+# Size and SHA-256 of every downloaded PDF. Files listed here that are still intact
+# on disk are not downloaded again; complete PDFs already on disk without an entry
+# (e.g. from older versions of this script) are added to it instead of downloaded.
+MANIFEST_FILE = "tealbook_manifest.json"
+
+# Concurrent PDF downloads; the session keeps this many connections open.
+DOWNLOAD_WORKERS = 4
+CHUNK_SIZE = 64 * 1024
+
+# Retries for connection errors, timeouts, 429 and 5xx responses and bodies cut off
+# mid-download, with jittered exponential backoff.
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 1.0
+
+def make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=DOWNLOAD_WORKERS, pool_maxsize=DOWNLOAD_WORKERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def backoff_delay(attempt: int) -> float:
+    return BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+
+def get_with_retries(session, url, **kwargs):
+    """
+    GET a URL, retrying connection errors, timeouts, 429 and 5xx responses.
+    Returns the last response, whatever its status.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = session.get(url, timeout=60, **kwargs)
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            if attempt == MAX_RETRIES:
+                return response
+            response.close()
+        except requests.RequestException:
+            if attempt == MAX_RETRIES:
+                raise
+        time.sleep(backoff_delay(attempt))
+
+def find_tealbooks(session, year: int):
+    """
+    Return (month, PDF URL) for every meeting on a year's historical page with a Tealbook A.
+    """
+    url = historical_url.format(year=year)
+    response = get_with_retries(session, url)
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch the page {url}. Status code: {response.status_code}")
+
+    # Parse the HTML content using BeautifulSoup
+    soup = BeautifulSoup(response.content, "html.parser")
+
+    # Locate all meeting panels by finding <h5> elements with the specific class.
+    panels = soup.find_all("h5", class_="panel-heading panel-heading--shaded")
+
+    if not panels:
+        raise Exception(f"No meeting panels found on the page {url}.")
+
+    tealbooks = []
+    for panel in panels:
+        # Get the text from the panel heading, e.g., "Jul/Aug Meeting - 2018" or "March 20-21 Meeting - 2018"
+        meeting_text = panel.get_text(strip=True)
+
+        # Extract the first segment (assumed to be the month or months).
+        # For example, for "Jul/Aug Meeting - 2018", it takes "Jul/Aug" and then splits by '/' to keep only "Jul"
+        raw_month = meeting_text.split()[0]
+        # If the month is expressed with a slash, use only the first part.
+        first_month = raw_month.split("/")[0]
+        # Sanitize the extracted month to remove any characters not allowed in filenames.
+        month = re.sub(r'[\\/:"*?<>|]+', '', first_month)
+
+        # The related links are in a sibling <div> with class "row divided-row".
+        container_div = panel.find_next_sibling("div", class_="row divided-row")
+        if not container_div:
+            print(f"No meeting details container found for: {meeting_text}")
+            continue
+
+        # Find the anchor with a href that contains "tealbooka" (case insensitive).
+        tealbook_a_link = container_div.find("a", href=lambda href: href and "tealbooka" in href.lower())
+        if not tealbook_a_link:
+            print(f"No Tealbook A link found for: {meeting_text}")
+            continue
+
+        # Build the complete URL for the PDF.
+        tealbooks.append((month, base_url + tealbook_a_link['href']))
+    return tealbooks
+
+def tealbook_filenames(tealbooks, year=None):
+    """
+    Return (filename, PDF URL) for a year's (month, PDF URL) Tealbooks: "MONTH_TBA.pdf"
+    (e.g., "Jul_TBA.pdf"), with the year if given. Meetings of the year that share a
+    first month also get the date in their URL, or its file name, so they do not
+    overwrite each other. A URL listed twice is downloaded once.
+    """
+    unique = list(dict.fromkeys(tealbooks))
+    month_counts = Counter(month for month, _ in unique)
+    jobs = []
+    for month, pdf_url in unique:
+        name = f"{month}{year}" if year is not None else month
+        if month_counts[month] > 1:
+            stem = os.path.splitext(os.path.basename(pdf_url))[0]
+            date = re.search(r'\d{8}', stem)
+            name += "_" + (date.group(0) if date else stem)
+        jobs.append((f"{name}_TBA.pdf", pdf_url))
+    return jobs
+
+def load_manifest(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(manifest: dict, path: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def file_digest(path: str):
+    """
+    Return (size in bytes, SHA-256 hex digest) of a file.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+def is_intact(filepath: str, entry) -> bool:
+    """
+    Whether a file on disk still matches its manifest entry.
+    """
+    if not entry or not os.path.exists(filepath) or os.path.getsize(filepath) != entry['bytes']:
+        return False
+    return file_digest(filepath) == (entry['bytes'], entry['sha256'])
+
+def is_complete_pdf(filepath: str) -> bool:
+    """
+    Whether a file exists, starts with the PDF signature and ends with the %%EOF
+    marker, as a PDF saved by an earlier run (and not cut short) does.
+    """
+    if not os.path.exists(filepath) or os.path.getsize(filepath) < 5:
+        return False
+    with open(filepath, 'rb') as f:
+        if f.read(5) != b"%PDF-":
+            return False
+        f.seek(max(0, os.path.getsize(filepath) - 1024))
+        return b"%%EOF" in f.read()
+
+def download_pdf(session, pdf_url: str, filepath: str) -> dict:
+    """
+    Stream a PDF to disk in chunks, hashing it on the way, and check it against the
+    Content-Length and the PDF signature before moving it into place. A body cut
+    off or stalled mid-stream is downloaded again from the start.
+    Returns its manifest entry.
+    """
+    tmp_path = filepath + ".part"
+    for attempt in range(MAX_RETRIES + 1):
+        response = get_with_retries(session, pdf_url, stream=True)
+        try:
+            with response:
+                if response.status_code != 200:
+                    raise Exception(f"Status code: {response.status_code}")
+                expected = response.headers.get("Content-Length")
+                digest = hashlib.sha256()
+                size = 0
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+            break
+        except requests.RequestException:
+            if attempt == MAX_RETRIES:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            time.sleep(backoff_delay(attempt))
+    try:
+        # Content-Length is the encoded size; only compare it when the body was not compressed.
+        if expected is not None and not response.headers.get("Content-Encoding") and size != int(expected):
+            raise Exception(f"Incomplete download: {size} of {expected} bytes")
+        with open(tmp_path, 'rb') as f:
+            if f.read(5) != b"%PDF-":
+                raise Exception("Response is not a PDF")
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, filepath)
+    return {'url': pdf_url, 'bytes': size, 'sha256': digest.hexdigest()}
+
+def download_tealbooks(years, download_dir: str = DOWNLOAD_DIR, workers: int = DOWNLOAD_WORKERS):
+    """
+    Download the Tealbook A of every meeting in the given years, skipping PDFs
+    already downloaded intact. Returns a dict of counts.
+    """
+    os.makedirs(download_dir, exist_ok=True)
+    manifest_path = os.path.join(download_dir, MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+    manifest_lock = threading.Lock()
+    session = make_session()
+    stats = {'downloaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # The year pages are fetched concurrently too.
+        pages = {executor.submit(find_tealbooks, session, year): year for year in years}
+        jobs = []
+        for future in as_completed(pages):
+            year = pages[future]
+            try:
+                tealbooks = future.result()
+            except Exception as e:
+                print(f"Skipping {year}: {e}")
+                continue
+            jobs.extend(tealbook_filenames(tealbooks, year if len(years) > 1 else None))
+
+        def fetch(filename, pdf_url):
+            filepath = os.path.join(download_dir, filename)
+            entry = manifest.get(filename)
+            if entry and entry['url'] == pdf_url and is_intact(filepath, entry):
+                return filename, None, 'skipped'
+            if entry is None and is_complete_pdf(filepath):
+                size, sha256 = file_digest(filepath)
+                return filename, {'url': pdf_url, 'bytes': size, 'sha256': sha256}, 'adopted'
+            return filename, download_pdf(session, pdf_url, filepath), 'downloaded'
+
+        futures = {executor.submit(fetch, filename, pdf_url): pdf_url for filename, pdf_url in jobs}
+        for future in as_completed(futures):
+            try:
+                filename, entry, status = future.result()
+            except Exception as e:
+                print(f"Failed to download PDF from {futures[future]} ({e})")
+                stats['failed'] += 1
+                continue
+            if status != 'downloaded':
+                stats['skipped'] += 1
+                if entry is None:
+                    continue
+                print(f"Found {filename} already downloaded; added it to the manifest")
+            else:
+                print(f"Saved PDF as {filename} ({entry['bytes'] / 1e6:.1f} MB)")
+                stats['downloaded'] += 1
+                stats['bytes'] += entry['bytes']
+            with manifest_lock:
+                manifest[filename] = entry
+                save_manifest(manifest, manifest_path)
+
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def parse_years(args):
+    """
+    Parse years such as "2018" or ranges such as "2010-2019".
+    """
+    years = []
+    for arg in args:
+        first, _, last = arg.partition("-")
+        years.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(years))
+
+if __name__ == '__main__':
+    # python get_fomc.py [YEAR | FIRST-LAST ...]
+    try:
+        years = parse_years(sys.argv[1:]) or YEARS
+    except ValueError:
+        print(f"Usage: {sys.argv[0]} [YEAR | FIRST-LAST ...]")
+        sys.exit(1)
+    stats = download_tealbooks(years)
+    print(f"\n{stats['downloaded']} downloaded ({stats['bytes'] / 1e6:.1f} MB), {stats['skipped']} already present, "
+          f"{stats['failed']} failed in {stats['seconds']:.1f}s")
@@ -1,48 +1,71 @@
 import os
-import re
-from pdf2image import convert_from_path
-import pytesseract
+from collections import Counter
 from tqdm import tqdm
+from ocr_cache import OcrCache, file_hash
+from ocr_engine import DPI, extract_pdf, format_methods, page_count
 
 # Define folders: adjust these folder names as needed.
 pdf_folder = "./tbas"          # Folder containing Tealbook A PDF files (e.g., "Jul_TBA.pdf", "March_TBA.pdf")
 text_folder = "./text_files"     # Folder to store the output text files (one per page)
-os.makedirs(text_folder, exist_ok=True)
-
-# Iterate over PDF files in the pdf_folder that match the naming pattern.
-for pdf_file in os.listdir(pdf_folder):
-    if pdf_file.endswith("_TBA.pdf"):
-        # Extract the month from the filename.
-        # For example, if the PDF is named "Jul_TBA.pdf", the month will be "Jul"
-        month = pdf_file.split('_')[0]
-        pdf_path = os.path.join(pdf_folder, pdf_file)
-        print(f"Processing file '{pdf_path}' (Month: {month})")
-
-        # Convert the PDF into a list of page images.
-        pages = convert_from_path(pdf_path)
-        
-        # Process each page image with rotation correction and OCR.
-        for i, page in enumerate(tqdm(pages, desc=f"Processing pages for {month}")):
-            # Use pytesseract's orientation and script detection to check rotation.
-            osd_output = pytesseract.image_to_osd(page)
-            # Extract the rotation angle using regex.
-            match = re.search(r"Rotate: (\d+)", osd_output)
-            if match:
-                rotation_angle = int(match.group(1))
-                if rotation_angle != 0:
-                    print(f"Rotating page {i+1} by {rotation_angle} degrees (clockwise correction needed)")
-                    # Rotate by negative angle to correct the orientation.
-                    page = page.rotate(-rotation_angle, expand=True)
-            else:
-                print(f"Could not detect rotation angle for page {i+1}. Proceeding without rotation correction.")
-            
-            # Perform OCR on the (corrected) page image.
-            extracted_text = pytesseract.image_to_string(page)
-            
-            # Save the OCR'd text to a file named using the month and page number.
-            text_filename = f"{month}_page{i+1}.txt"
-            text_path = os.path.join(text_folder, text_filename)
-            with open(text_path, "w", encoding="utf-8") as f:
-                f.write(extracted_text)
-            
-            print(f"Saved text from page {i+1} to '{text_path}'")
+
+# Use a page's embedded text layer when it is good enough and OCR only the other
+# pages (see ocr_engine.py). Set to False to OCR every page.
+TEXT_LAYER_FIRST = True
+
+# Extracted pages are cached by PDF content hash, page and DPI, so re-runs only
+# extract new Tealbooks; PDFs already fully extracted are skipped without being opened.
+USE_OCR_CACHE = True
+
+def main():
+    os.makedirs(text_folder, exist_ok=True)
+    totals = Counter()
+    cache = OcrCache() if USE_OCR_CACHE else None
+    skipped = 0
+
+    # Iterate over PDF files in the pdf_folder that match the naming pattern.
+    for pdf_file in os.listdir(pdf_folder):
+        if pdf_file.endswith("_TBA.pdf"):
+            # Extract the month from the filename.
+            # For example, if the PDF is named "Jul_TBA.pdf", the month will be "Jul";
+            # for "Jan_20200129_TBA.pdf" (two January meetings) it is "Jan_20200129".
+            month = pdf_file[:-len("_TBA.pdf")]
+            pdf_path = os.path.join(pdf_folder, pdf_file)
+
+            pdf_hash = None
+            if cache is not None:
+                pdf_hash = file_hash(pdf_path)
+                # Text-layer pages only count when this run would have used them.
+                finished_pages = cache.finished_pages(pdf_hash, DPI,
+                                                      methods=('text', 'ocr') if TEXT_LAYER_FIRST else ('ocr',))
+                if finished_pages and all(
+                    os.path.exists(os.path.join(text_folder, f"{month}_page{page_number}.txt"))
+                    for page_number in range(1, finished_pages + 1)
+                ):
+                    skipped += 1
+                    continue
+
+            print(f"Processing file '{pdf_path}' (Month: {month})")
+
+            # Pages without a usable text layer are rasterized, rotation-corrected and OCR'd
+            # in parallel, and each page's text is saved as soon as it is ready.
+            methods = Counter()
+            with tqdm(total=page_count(pdf_path), desc=f"Processing pages for {month}") as progress:
+                for page_number, extracted_text, method in extract_pdf(pdf_path, text_layer_first=TEXT_LAYER_FIRST,
+                                                                       cache=cache, pdf_hash=pdf_hash):
+                    methods[method] += 1
+
+                    # Save the extracted text to a file named using the month and page number.
+                    text_filename = f"{month}_page{page_number}.txt"
+                    text_path = os.path.join(text_folder, text_filename)
+                    with open(text_path, "w", encoding="utf-8") as f:
+                        f.write(extracted_text)
+                    progress.update(1)
+            print(f"{month}: {format_methods(methods)}")
+            totals.update(methods)
+
+    print(f"All files: {format_methods(totals)}; {skipped} already processed file(s) skipped")
+    if cache is not None:
+        cache.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Default location of the on-disk OCR cache
+OCR_CACHE_FILE = "./ocr_cache.sqlite"
+
+def file_hash(path: str) -> str:
+    """
+    Return the SHA-256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class OcrCache:
+    """
+    Persistent cache of extracted page text backed by a local SQLite file.
+    Pages are keyed by (PDF content hash, page number, DPI), so a renamed or
+    copied PDF is still a hit and an edited one is not. A PDF whose pages have
+    all been extracted is recorded as done, letting callers skip it without
+    opening it. The cache may be shared between threads; access is serialized by a lock.
+    """
+
+    def __init__(self, path=OCR_CACHE_FILE):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " pdf_hash TEXT NOT NULL,"
+            " page INTEGER NOT NULL,"
+            " dpi INTEGER NOT NULL,"
+            " method TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (pdf_hash, page, dpi)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " pdf_hash TEXT NOT NULL,"
+            " dpi INTEGER NOT NULL,"
+            " pages INTEGER NOT NULL,"
+            " finished REAL NOT NULL,"
+            " PRIMARY KEY (pdf_hash, dpi)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def get_pages(self, pdf_hash: str, dpi: int, methods=None) -> dict:
+        """
+        Return {page number: (text, method)} for the cached pages of a PDF,
+        optionally only those extracted with one of `methods` ('text', 'ocr').
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT page, text, method FROM pages WHERE pdf_hash = ? AND dpi = ?", (pdf_hash, dpi)
+            ).fetchall()
+        return {page: (text, method) for page, text, method in rows if methods is None or method in methods}
+
+    def put_page(self, pdf_hash: str, page: int, dpi: int, text: str, method: str):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (pdf_hash, page, dpi, method, text, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (pdf_hash, page, dpi, method, text, time.time())
+            )
+            self.conn.commit()
+
+    def finished_pages(self, pdf_hash: str, dpi: int, methods=None):
+        """
+        Return the page count of a PDF every page of which has been extracted, or None.
+        With `methods`, every page must also have been extracted with one of them, so a
+        PDF finished from its text layer does not count as done for an OCR-only run.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT pages FROM documents WHERE pdf_hash = ? AND dpi = ?", (pdf_hash, dpi)
+            ).fetchone()
+            if row is not None and methods is not None:
+                matching = self.conn.execute(
+                    "SELECT COUNT(*) FROM pages WHERE pdf_hash = ? AND dpi = ? AND page <= ?"
+                    f" AND method IN ({', '.join('?' * len(methods))})",
+                    (pdf_hash, dpi, row[0], *methods)
+                ).fetchone()[0]
+                if matching < row[0]:
+                    row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def finish_document(self, pdf_hash: str, dpi: int, pages: int):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (pdf_hash, dpi, pages, finished) VALUES (?, ?, ?, ?)",
+                (pdf_hash, dpi, pages, time.time())
+            )
+            self.conn.commit()
+
+    def stats(self) -> dict:
+        """
+        Return document hit/miss counters and the number of cached pages and documents.
+        """
+        with self.lock:
+            pages = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            documents = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'pages': pages, 'documents': documents}
+
+    def close(self):
+        self.conn.close()
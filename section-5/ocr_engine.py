@@ -0,0 +1,197 @@
+import os
+import re
+import subprocess
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pdf2image import convert_from_path, pdfinfo_from_path
+import pytesseract
+from ocr_cache import file_hash
+
+# Resolution pages are rasterized at. pdf2image's default is 200.
+DPI = 200
+
+# Each task rasterizes and OCRs this many consecutive pages, so a worker never
+# holds more than PAGES_PER_TASK page images in memory.
+PAGES_PER_TASK = 4
+
+# Orientation detection runs on the page shrunk by this factor (200 dpi -> 100 dpi),
+# which is plenty to tell which way up the text is and several times cheaper than
+# full resolution. Pages OSD cannot read at the reduced size are retried at full size.
+OSD_REDUCE = 2
+
+# One worker process per CPU; tesseract is single-threaded per page below.
+WORKERS = os.cpu_count() or 1
+
+# A page's embedded text layer is used instead of OCR when it has at least
+# MIN_TEXT_CHARS non-whitespace characters, of which no more than MAX_GARBLED_RATIO
+# are garbled (replacement, private-use, control or unassigned characters, which
+# is what broken font encodings extract as).
+MIN_TEXT_CHARS = 200
+MAX_GARBLED_RATIO = 0.05
+
+def _init_worker():
+    # Tesseract's own OpenMP threads would compete with the other worker processes.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+def page_count(pdf_path: str) -> int:
+    return pdfinfo_from_path(pdf_path)["Pages"]
+
+def correct_rotation(page):
+    """
+    Detect the page orientation with tesseract's OSD and rotate the image upright.
+    Returns (image, rotation angle in degrees); pages OSD cannot read are left as they are.
+    """
+    osd_output = None
+    if OSD_REDUCE > 1:
+        small = page.reduce(OSD_REDUCE)
+        try:
+            osd_output = pytesseract.image_to_osd(small)
+        except pytesseract.TesseractError:
+            pass
+        small.close()
+    if osd_output is None:
+        try:
+            osd_output = pytesseract.image_to_osd(page)
+        except pytesseract.TesseractError:
+            # OSD needs a minimum amount of text, e.g. it fails on blank pages.
+            return page, 0
+    match = re.search(r"Rotate: (\d+)", osd_output)
+    rotation_angle = int(match.group(1)) if match else 0
+    if rotation_angle != 0:
+        # Rotate by negative angle to correct the orientation.
+        page = page.rotate(-rotation_angle, expand=True)
+    return page, rotation_angle
+
+def ocr_page_range(pdf_path: str, first_page: int, last_page: int, dpi: int = DPI):
+    """
+    Rasterize pages first_page..last_page (1-based, inclusive), correct their
+    rotation and OCR them. Returns a list of (page number, text, rotation angle).
+    """
+    pages = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+    results = []
+    for page_number, page in enumerate(pages, start=first_page):
+        page, rotation_angle = correct_rotation(page)
+        results.append((page_number, pytesseract.image_to_string(page), rotation_angle))
+        page.close()
+    return results
+
+def page_ranges(page_numbers, pages_per_task: int = PAGES_PER_TASK):
+    """
+    Group page numbers into runs of consecutive pages, at most pages_per_task long.
+    Returns a list of (first page, last page).
+    """
+    ranges = []
+    for page_number in sorted(page_numbers):
+        if ranges and ranges[-1][1] == page_number - 1 and page_number - ranges[-1][0] < pages_per_task:
+            ranges[-1] = (ranges[-1][0], page_number)
+        else:
+            ranges.append((page_number, page_number))
+    return ranges
+
+def ocr_pdf(pdf_path: str, pages=None, workers: int = WORKERS, pages_per_task: int = PAGES_PER_TASK, dpi: int = DPI):
+    """
+    OCR the given page numbers of a PDF (default all) on a pool of worker processes,
+    in bounded page ranges. Yields (page number, text, rotation angle) as pages
+    finish, which is not necessarily in page order.
+    """
+    if pages is None:
+        pages = range(1, page_count(pdf_path) + 1)
+    ranges = page_ranges(pages, pages_per_task)
+    if not ranges:
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), initializer=_init_worker) as executor:
+        futures = [executor.submit(ocr_page_range, pdf_path, first, last, dpi) for first, last in ranges]
+        for future in as_completed(futures):
+            yield from future.result()
+
+def ocr_pdf_text(pdf_path: str, **options) -> str:
+    """
+    OCR a whole PDF and return its text in page order.
+    """
+    texts = {page_number: text for page_number, text, _ in ocr_pdf(pdf_path, **options)}
+    return "".join(texts[page_number] for page_number in sorted(texts))
+
+def text_layer_pages(pdf_path: str):
+    """
+    Extract the embedded text layer of every page with poppler's pdftotext
+    (installed alongside pdftoppm, which pdf2image uses). Returns one string per
+    page; scanned pages come back empty or nearly so.
+    """
+    output = subprocess.run(["pdftotext", "-layout", "-enc", "UTF-8", pdf_path, "-"],
+                            capture_output=True, check=True).stdout.decode('utf-8', errors='replace')
+    # pdftotext ends every page with a form feed
+    pages = output.split("\f")
+    return pages[:-1] if pages and not pages[-1].strip() else pages
+
+def garbled_ratio(text: str) -> float:
+    characters = [c for c in text if not c.isspace()]
+    if not characters:
+        return 1.0
+    garbled = sum(1 for c in characters if c == "\ufffd" or unicodedata.category(c) in ('Co', 'Cc', 'Cn', 'Cs'))
+    return garbled / len(characters)
+
+def text_layer_usable(text: str) -> bool:
+    """
+    Whether a page's extracted text is good enough to skip OCR.
+    """
+    return (sum(1 for c in text if not c.isspace()) >= MIN_TEXT_CHARS
+            and garbled_ratio(text) <= MAX_GARBLED_RATIO)
+
+def extract_pdf(pdf_path: str, text_layer_first: bool = True, cache=None, pdf_hash=None, dpi: int = DPI, **options):
+    """
+    Extract the text of every page of a PDF, using the embedded text layer where
+    it passes text_layer_usable and OCR (see ocr_pdf) for the rest. With an
+    OcrCache, pages already extracted from the same PDF content at this DPI are
+    read from it, new pages are stored in it and the PDF is recorded as done at the end.
+    Yields (page number, text, method) with method 'cached', 'text' or 'ocr';
+    cached and text-layer pages come first, OCR'd pages as they finish.
+    """
+    num_pages = page_count(pdf_path)
+    remaining = list(range(1, num_pages + 1))
+    if cache is not None:
+        pdf_hash = pdf_hash or file_hash(pdf_path)
+        # Text-layer pages only count when the caller would have used them.
+        cached = cache.get_pages(pdf_hash, dpi, methods=('text', 'ocr') if text_layer_first else ('ocr',))
+        for page_number in sorted(cached):
+            if page_number <= num_pages:
+                yield page_number, cached[page_number][0], 'cached'
+        remaining = [page_number for page_number in remaining if page_number not in cached]
+
+    def extracted(page_number, text, method):
+        if cache is not None:
+            cache.put_page(pdf_hash, page_number, dpi, text, method)
+        return page_number, text, method
+
+    ocr_pages = remaining
+    if text_layer_first and remaining:
+        ocr_pages = []
+        texts = text_layer_pages(pdf_path)
+        for page_number in remaining:
+            text = texts[page_number - 1] if page_number <= len(texts) else ""
+            if text_layer_usable(text):
+                yield extracted(page_number, text, 'text')
+            else:
+                ocr_pages.append(page_number)
+    for page_number, text, _ in ocr_pdf(pdf_path, pages=ocr_pages, dpi=dpi, **options):
+        yield extracted(page_number, text, 'ocr')
+    if cache is not None:
+        cache.finish_document(pdf_hash, dpi, num_pages)
+
+def extract_pdf_text(pdf_path: str, **options):
+    """
+    Extract a whole PDF with extract_pdf and return (text in page order,
+    Counter of pages per method).
+    """
+    texts = {}
+    methods = Counter()
+    for page_number, text, method in extract_pdf(pdf_path, **options):
+        texts[page_number] = text
+        methods[method] += 1
+    return "\n".join(texts[page_number] for page_number in sorted(texts)), methods
+
+def format_methods(methods: Counter) -> str:
+    summary = f"{methods['text']} page(s) from the text layer, {methods['ocr']} OCR'd"
+    if methods['cached']:
+        summary += f", {methods['cached']} from the OCR cache"
+    return summary
@@ -0,0 +1,125 @@
+import json
+import time
+import random
+import base64
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import openai
+import numpy as np
+
+# Shared by the scripts that call the OpenAI API themselves (embedding_engine.py,
+# bulk_image_analysis.py, extraction_runner.py): which errors are worth retrying,
+# how long to back off, and a local fake endpoint for their exercise modes.
+
+# Backoff for 429s, 5xx errors and dropped connections.
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# Fake endpoint settings
+FAKE_DIMENSION = 1536
+FAKE_LATENCY_SECONDS = 0.05
+FAKE_FAILURE_RATE = 0.05
+
+def is_retryable(error) -> bool:
+    """
+    Rate limits, server errors, timeouts and dropped connections are worth retrying.
+    """
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+def backoff_delay(error, attempt: int, base: float = BACKOFF_BASE_SECONDS,
+                  max_delay: float = BACKOFF_MAX_SECONDS) -> float:
+    """
+    Seconds to wait before the next attempt.
+    Honors the server's Retry-After header when present, otherwise uses
+    exponential backoff with full jitter.
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get("retry-after")), max_delay)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(max_delay, base * 2 ** attempt))
+
+# -------------------------------
+# Exercise mode: a local fake embeddings endpoint
+# -------------------------------
+class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for POST /v1/embeddings.
+    Returns deterministic unit vectors derived from each input's hash, sleeps
+    to simulate network latency and fails a fraction of requests with 429 or
+    500 so that the retry path is exercised too. Subclasses fake more endpoints
+    by handling their paths in do_POST and deferring the rest to this one.
+    """
+    dimension = FAKE_DIMENSION
+    latency = FAKE_LATENCY_SECONDS
+    failure_rate = FAKE_FAILURE_RATE
+    request_count = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        with FakeEmbeddingsHandler.lock:
+            FakeEmbeddingsHandler.request_count += 1
+        inputs = request["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        time.sleep(self.latency)
+
+        roll = random.random()
+        if roll < self.failure_rate / 2:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                            headers={"retry-after": "0.1"})
+            return
+        if roll < self.failure_rate:
+            self._send_json(500, {"error": {"message": "Internal server error", "type": "server_error"}})
+            return
+
+        data = []
+        for i, text in enumerate(inputs):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            vector /= np.linalg.norm(vector)
+            if request.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        # Usage is only reported, never checked, so a word count stands in for tokens.
+        tokens = sum(len(text.split()) for text in inputs)
+        self._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": request["model"],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+def start_fake_server(handler=FakeEmbeddingsHandler):
+    """
+    Start the fake embeddings endpoint on a free local port in a background thread.
+    A subclass of FakeEmbeddingsHandler may be passed to fake more endpoints.
+    Returns the server and its base URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
@@ -1,17 +1,12 @@
-from pdf2image import convert_from_path
-import pytesseract
+from ocr_engine import extract_pdf_text, format_methods
 
-# Convert all pages of the PDF to images
-pages = convert_from_path('./tealbook.pdf')
-
-# Initialize an empty string to store OCR output
-extracted_text = ""
-
-# Perform OCR on each page image
-for page in pages:
-    extracted_text += pytesseract.image_to_string(page)
-
-# Print out all the extracted text
-print(extracted_text)
+# Pages with a usable embedded text layer are read directly; only the rest are
+# rasterized and OCR'd (see ocr_engine.py). Set to False to OCR every page.
+TEXT_LAYER_FIRST = True
 
+if __name__ == '__main__':
+    extracted_text, methods = extract_pdf_text('./tealbook.pdf', text_layer_first=TEXT_LAYER_FIRST)
 
+    # Print out all the extracted text
+    print(extracted_text)
+    print(f"\n{format_methods(methods)}")
@@ -1,27 +1,12 @@
-from pdf2image import convert_from_path
-import re
-import pytesseract
-from tqdm import tqdm
-
-pages = convert_from_path('./tealbook.pdf')
-
-extracted_text = ""
-
-for i, page in tqdm(enumerate(pages)):
-    osd_output = pytesseract.image_to_osd(page)
-    
-    # Extract the rotation angle using regex
-    match = re.search(r"Rotate: (\d+)", osd_output)
-    if match:
-        rotation_angle = int(match.group(1))
-        if rotation_angle != 0:
-            print(f"Rotating {rotation_angle} degrees (clockwise correction needed)")
-            pages[i] = page.rotate(-rotation_angle, expand=True)
-    else:
-        print("Could not detect rotation angle.")
-
-# Perform OCR on each (corrected) page image
-for page in pages:
-    extracted_text += pytesseract.image_to_string(page)
-
-print(extracted_text)
\ No newline at end of file
+from ocr_cache import OcrCache
+from ocr_engine import extract_pdf_text, format_methods
+
+# Each page's orientation is detected on a downscaled copy and corrected before
+# OCR; pages are processed in parallel, a few at a time, and OCR results are
+# cached so a re-run does not OCR the PDF again (see ocr_engine.py).
+if __name__ == '__main__':
+    cache = OcrCache()
+    extracted_text, methods = extract_pdf_text('./tealbook.pdf', text_layer_first=False, cache=cache)
+    cache.close()
+    print(extracted_text)
+    print(f"\n{format_methods(methods)}")
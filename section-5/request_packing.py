@@ -0,0 +1,269 @@
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# tiktoken gives exact token counts; without it we fall back to a conservative
+# characters-per-token estimate.
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+# Packing sends several short documents in one request: the system prompt and
+# tool schema are paid for once per pack instead of once per document, and since
+# every pack starts with the same system prompt and tools, the API's prompt cache
+# serves that prefix after the first request. Each pack asks for one call to a
+# multi-item tool returning a result per document id; documents missing from (or
+# invalid in) the reply are retried one by one with the single-item tool.
+PACK_MAX_TOKENS = 6000            # document tokens per packed request
+PACK_MAX_ITEMS = 20               # documents per packed request
+PACK_MAX_DOCUMENT_TOKENS = 1500   # longer documents are always sent on their own
+
+# Used to estimate token counts when tiktoken is not installed.
+CHARS_PER_TOKEN = 3
+
+# Packed requests in flight at once (after the first, which warms the prompt cache)
+PACK_WORKERS = 8
+
+def count_tokens(text: str) -> int:
+    """
+    Count (or, without tiktoken, estimate) the number of tokens in a text.
+    """
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def multi_item_tool(tool: dict) -> dict:
+    """
+    Wrap a single-item function tool into one that returns a list of results,
+    each the single-item arguments plus the "id" of the document it is for.
+    """
+    function = tool["function"]
+    parameters = function["parameters"]
+    item = dict(parameters)
+    item["properties"] = {"id": {"type": "string"}, **parameters.get("properties", {})}
+    item["required"] = ["id"] + [name for name in parameters.get("required", []) if name != "id"]
+    return {
+        "type": "function",
+        "function": {
+            "name": function["name"] + "_batch",
+            "description": f"Return one {function['name']} result for every document, identified by its id.",
+            "parameters": {
+                "type": "object",
+                "properties": {"results": {"type": "array", "items": item}},
+                "required": ["results"]
+            }
+        }
+    }
+
+def pack_documents(documents, max_tokens: int = PACK_MAX_TOKENS, max_items: int = PACK_MAX_ITEMS,
+                   max_document_tokens: int = PACK_MAX_DOCUMENT_TOKENS):
+    """
+    Greedily pack (id, text) documents into lists that stay within the token and
+    item budgets. Returns (packs, singles): documents longer than
+    max_document_tokens are returned in singles, to be sent on their own.
+    """
+    packs = []
+    singles = []
+    pack = []
+    pack_tokens = 0
+    for document_id, text in documents:
+        tokens = count_tokens(text)
+        if tokens > max_document_tokens:
+            singles.append((document_id, text))
+            continue
+        if pack and (len(pack) >= max_items or pack_tokens + tokens > max_tokens):
+            packs.append(pack)
+            pack = []
+            pack_tokens = 0
+        pack.append((document_id, text))
+        pack_tokens += tokens
+    if pack:
+        packs.append(pack)
+    return packs, singles
+
+def packed_user_message(pack, tool_name: str) -> str:
+    """
+    The user message for a pack: an instruction followed by each document in an
+    id-tagged block. Only this message differs between packed requests.
+    """
+    documents = "\n\n".join(f'<document id="{document_id}">\n{text}\n</document>' for document_id, text in pack)
+    return (f"Analyze each of the following {len(pack)} documents separately, as instructed. "
+            f"Call {tool_name} once, with exactly one result per document id.\n\n{documents}")
+
+def _required_fields_present(arguments, schema: dict) -> list:
+    if not isinstance(arguments, dict):
+        return ["result is not an object"]
+    return [f"missing {name!r}" for name in schema.get("required", []) if name not in arguments]
+
+def parse_packed_results(message, pack, tool: dict, validate=None) -> dict:
+    """
+    Return {document id: arguments} for every document in the pack that the
+    multi-item tool call answered validly. `validate(arguments, schema)` returns a
+    list of errors; by default only required fields are checked.
+    """
+    validate = validate or _required_fields_present
+    name = tool["function"]["name"] + "_batch"
+    calls = [call for call in (message.tool_calls or []) if call.function.name == name]
+    if not calls:
+        return {}
+    try:
+        results = json.loads(calls[0].function.arguments).get("results", [])
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+    ids = {str(document_id): document_id for document_id, _ in pack}
+    parsed = {}
+    for result in results if isinstance(results, list) else []:
+        if not isinstance(result, dict) or str(result.get("id")) not in ids:
+            continue
+        arguments = {key: value for key, value in result.items() if key != "id"}
+        if not validate(arguments, tool["function"]["parameters"]):
+            parsed.setdefault(ids[str(result["id"])], arguments)
+    return parsed
+
+def _usage(completion) -> dict:
+    usage = completion.usage
+    if usage is None:
+        return {}
+    details = usage.prompt_tokens_details
+    return {
+        'prompt_tokens': usage.prompt_tokens,
+        'completion_tokens': usage.completion_tokens,
+        'cached_tokens': (details.cached_tokens or 0) if details is not None else 0
+    }
+
+def run_packed(client, documents, tool: dict, system_prompt: str, model: str, pack: bool = True,
+               workers: int = PACK_WORKERS, validate=None, on_result=None) -> dict:
+    """
+    Run the single-item `tool` over (id, text) documents, packing short documents
+    into multi-item requests (or one request per document if `pack` is False).
+    Documents a pack does not answer validly are retried on their own.
+    `on_result(document id, arguments)` is called on this thread as each document
+    finishes. Returns a dict of counts, including tokens per document and documents per minute.
+    """
+    validate = validate or _required_fields_present
+    batch_tool = multi_item_tool(tool)
+    # Requests with the same key and prefix are routed to the same prompt cache.
+    cache_key = hashlib.sha256((model + system_prompt + json.dumps(tool, sort_keys=True)).encode("utf-8")).hexdigest()[:32]
+    stats = {'documents': len(documents), 'done': 0, 'failed': 0, 'requests': 0, 'packed_requests': 0,
+             'fallbacks': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+    stats_lock = threading.Lock()
+
+    def count_usage(completion):
+        with stats_lock:
+            stats['requests'] += 1
+            for key, value in _usage(completion).items():
+                stats[key] += value
+
+    def run_single(document_id, text):
+        completion = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": text}],
+            tools=[tool],
+            tool_choice={"type": "function", "function": {"name": tool["function"]["name"]}},
+            prompt_cache_key=cache_key + "-single"
+        )
+        count_usage(completion)
+        calls = [call for call in (completion.choices[0].message.tool_calls or [])
+                 if call.function.name == tool["function"]["name"]]
+        if not calls:
+            raise ValueError("no tool call in the reply")
+        arguments = json.loads(calls[0].function.arguments)
+        errors = validate(arguments, tool["function"]["parameters"])
+        if errors:
+            raise ValueError("; ".join(errors))
+        return {document_id: arguments}
+
+    def run_pack(items):
+        completion = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": packed_user_message(items, batch_tool["function"]["name"])}
+            ],
+            tools=[batch_tool],
+            tool_choice={"type": "function", "function": {"name": batch_tool["function"]["name"]}},
+            prompt_cache_key=cache_key
+        )
+        count_usage(completion)
+        with stats_lock:
+            stats['packed_requests'] += 1
+        return parse_packed_results(completion.choices[0].message, items, tool, validate)
+
+    if pack:
+        packs, singles = pack_documents(documents)
+    else:
+        packs, singles = [], list(documents)
+    start = time.perf_counter()
+
+    def finish(results):
+        for document_id, arguments in results.items():
+            stats['done'] += 1
+            if on_result is not None:
+                on_result(document_id, arguments)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        retry = []
+
+        def run_all(function, jobs, first_alone=False):
+            # The first request of a kind runs alone, so the rest can hit its cached prefix.
+            if first_alone and jobs:
+                jobs = list(jobs)
+                yield jobs[0], _call(function, jobs[0])
+                jobs = jobs[1:]
+            futures = {executor.submit(_call, function, job): job for job in jobs}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+        for items, (results, error) in run_all(run_pack, packs, first_alone=True):
+            if error is not None:
+                print(f"Packed request for {len(items)} document(s) failed: {error}")
+                results = {}
+            finish(results)
+            retry.extend((document_id, text) for document_id, text in items if document_id not in results)
+
+        with stats_lock:
+            stats['fallbacks'] = len(retry)
+        for (document_id, _), (results, error) in run_all(lambda item: run_single(*item), singles + retry):
+            if error is not None:
+                print(f"Document {document_id} failed: {error}")
+                stats['failed'] += 1
+                continue
+            finish(results)
+
+    stats['seconds'] = time.perf_counter() - start
+    return _with_rates(stats)
+
+def _with_rates(stats: dict) -> dict:
+    stats['tokens_per_document'] = ((stats['prompt_tokens'] + stats['completion_tokens']) / stats['done']
+                                    if stats['done'] else 0.0)
+    stats['documents_per_minute'] = stats['done'] / stats['seconds'] * 60 if stats['seconds'] else 0.0
+    return stats
+
+def sum_packing_stats(total, stats: dict) -> dict:
+    """
+    Add the counts of one run_packed call to a running total (None to start one).
+    """
+    if total is None:
+        return dict(stats)
+    total = {key: total[key] + stats[key] for key in total
+             if key not in ('tokens_per_document', 'documents_per_minute')}
+    return _with_rates(total)
+
+def _call(function, job):
+    """
+    Run function(job), returning (result, None) or (None, the exception).
+    """
+    try:
+        return function(job), None
+    except Exception as e:
+        return None, e
+
+def format_packing_stats(stats: dict) -> str:
+    return (f"{stats['done']}/{stats['documents']} document(s) in {stats['requests']} request(s) "
+            f"({stats['packed_requests']} packed, {stats['fallbacks']} per-document fallback(s), {stats['failed']} failed); "
+            f"{stats['tokens_per_document']:.0f} tokens/document, {stats['cached_tokens']} cached prompt tokens, "
+            f"{stats['documents_per_minute']:.0f} documents/min")
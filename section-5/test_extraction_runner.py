@@ -0,0 +1,78 @@
+import json
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+from extraction_runner import (
+    Checkpoint, ExtractionError, checkpoint_to_csv, parse_tool_call, validate_arguments
+)
+
+TOOL = {
+    "type": "function",
+    "function": {
+        "name": "record_comment",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "stance": {"type": "string", "enum": ["support", "oppose", "neutral"]},
+                "topics": {"type": "array", "items": {"type": "string"}},
+                "mentions_cost": {"type": "boolean"},
+            },
+            "required": ["stance", "mentions_cost"],
+        },
+    },
+}
+SCHEMA = TOOL["function"]["parameters"]
+
+def _message(name, arguments):
+    call = SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+    return SimpleNamespace(tool_calls=[call])
+
+def test_validate_arguments():
+    assert validate_arguments({"stance": "oppose", "topics": ["cost"], "mentions_cost": True}, SCHEMA) == []
+    assert validate_arguments({"stance": "maybe", "mentions_cost": True}, SCHEMA)
+    assert validate_arguments({"stance": "oppose"}, SCHEMA)
+    assert validate_arguments({"stance": "oppose", "topics": [1], "mentions_cost": True}, SCHEMA)
+    assert validate_arguments({"stance": "oppose", "mentions_cost": 1}, SCHEMA)
+
+def test_parse_tool_call():
+    arguments = {"stance": "support", "mentions_cost": False}
+    assert parse_tool_call(_message("record_comment", json.dumps(arguments)), TOOL) == arguments
+    with pytest.raises(ExtractionError):
+        parse_tool_call(_message("other_tool", json.dumps(arguments)), TOOL)
+    with pytest.raises(ExtractionError):
+        parse_tool_call(_message("record_comment", '{"stance": '), TOOL)
+    with pytest.raises(ExtractionError):
+        parse_tool_call(SimpleNamespace(tool_calls=None), TOOL)
+
+def test_checkpoint_resumes_after_a_cut_off_line(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.append(1, {"stance": "oppose"})
+    checkpoint.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": 2, "resu')
+    checkpoint = Checkpoint(path)
+    assert 1 in checkpoint and "1" in checkpoint and 2 not in checkpoint
+    checkpoint.append(2, {"stance": "support"})
+    checkpoint.close()
+    assert Checkpoint(path).results == {"1": {"stance": "oppose"}, "2": {"stance": "support"}}
+
+def test_checkpoint_to_csv(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.append("a", {"stance": "oppose", "mentions_cost": True})
+    checkpoint.append("c", {"stance": "neutral"})
+    checkpoint.close()
+    output = str(tmp_path / "results.csv")
+
+    assert checkpoint_to_csv(path, output, fields=SCHEMA["properties"]) == 2
+    df = pd.read_csv(output)
+    assert list(df.columns) == ["id", "stance", "topics", "mentions_cost"]
+    assert list(df["stance"]) == ["oppose", "neutral"]
+
+    clusters = [("a", "a"), ("b", "a"), ("c", "c"), ("d", "missing")]
+    assert checkpoint_to_csv(path, output, clusters=clusters, fields=SCHEMA["properties"]) == 3
+    df = pd.read_csv(output)
+    assert list(df["id"]) == ["a", "b", "c"]
+    assert list(df["cluster_id"]) == ["a", "a", "c"]
+    assert list(df["stance"]) == ["oppose", "oppose", "neutral"]
@@ -0,0 +1,44 @@
+import pytest
+from get_fomc import file_digest, is_complete_pdf, is_intact, parse_years, tealbook_filenames
+
+URL = "https://www.federalreserve.gov/monetarypolicy/files/FOMC{}tealbooka20{}.pdf"
+
+def test_tealbook_filenames():
+    tealbooks = [
+        ("Jan", URL.format("20200129", "200122")),
+        ("Jan", URL.format("20200315", "200312")),
+        ("Apr", URL.format("20200429", "200422")),
+        ("Apr", URL.format("20200429", "200422")),
+    ]
+    assert tealbook_filenames(tealbooks) == [
+        ("Jan_20200129_TBA.pdf", tealbooks[0][1]),
+        ("Jan_20200315_TBA.pdf", tealbooks[1][1]),
+        ("Apr_TBA.pdf", tealbooks[2][1]),
+    ]
+    assert tealbook_filenames(tealbooks[2:3], 2020) == [("Apr2020_TBA.pdf", tealbooks[2][1])]
+
+def test_is_complete_pdf(tmp_path):
+    complete, truncated, html = tmp_path / "a.pdf", tmp_path / "b.pdf", tmp_path / "c.pdf"
+    complete.write_bytes(b"%PDF-1.7\n" + b"x" * 4096 + b"\n%%EOF\n")
+    truncated.write_bytes(b"%PDF-1.7\n" + b"x" * 4096)
+    html.write_bytes(b"<html>Not found</html>\n%%EOF\n")
+    assert is_complete_pdf(str(complete))
+    assert not is_complete_pdf(str(truncated))
+    assert not is_complete_pdf(str(html))
+    assert not is_complete_pdf(str(tmp_path / "missing.pdf"))
+
+def test_is_intact(tmp_path):
+    path = tmp_path / "Jul_TBA.pdf"
+    path.write_bytes(b"%PDF-1.7 contents %%EOF")
+    size, sha256 = file_digest(str(path))
+    entry = {"url": "https://example.org/a.pdf", "bytes": size, "sha256": sha256}
+    assert is_intact(str(path), entry)
+    path.write_bytes(b"%PDF-1.7 contentz %%EOF")
+    assert not is_intact(str(path), entry)
+    assert not is_intact(str(path), None)
+
+def test_parse_years():
+    assert parse_years(["2018"]) == [2018]
+    assert parse_years(["2019-2020", "2018", "2020"]) == [2018, 2019, 2020]
+    with pytest.raises(ValueError):
+        parse_years(["twenty"])
@@ -0,0 +1,43 @@
+import os
+import pytest
+
+pytest.importorskip("pdf2image")
+pytest.importorskip("pytesseract")
+import make_text_files
+
+def fake_extract_pdf(pdf_path, text_layer_first=True, cache=None, pdf_hash=None):
+    name = os.path.basename(pdf_path)
+    for page_number in (1, 2):
+        text = f"{name} page {page_number}"
+        if cache is not None:
+            cache.put_page(pdf_hash, page_number, make_text_files.DPI, text, "text")
+        yield page_number, text, "text"
+    if cache is not None:
+        cache.finish_document(pdf_hash, make_text_files.DPI, 2)
+
+def test_same_month_meetings_do_not_overwrite_each_other(tmp_path, monkeypatch, capsys):
+    pdf_folder, text_folder = tmp_path / "tbas", tmp_path / "text_files"
+    pdf_folder.mkdir()
+    for name in ("Jan_20200129_TBA.pdf", "Jan_20200315_TBA.pdf"):
+        (pdf_folder / name).write_bytes(b"%PDF-1.7 " + name.encode())
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(make_text_files, "pdf_folder", str(pdf_folder))
+    monkeypatch.setattr(make_text_files, "text_folder", str(text_folder))
+    monkeypatch.setattr(make_text_files, "extract_pdf", fake_extract_pdf)
+    monkeypatch.setattr(make_text_files, "page_count", lambda pdf_path: 2)
+
+    make_text_files.main()
+    assert sorted(os.listdir(text_folder)) == [
+        "Jan_20200129_page1.txt", "Jan_20200129_page2.txt",
+        "Jan_20200315_page1.txt", "Jan_20200315_page2.txt",
+    ]
+    assert (text_folder / "Jan_20200315_page2.txt").read_text() == "Jan_20200315_TBA.pdf page 2"
+    assert "0 already processed" in capsys.readouterr().out
+
+    # A re-run skips both PDFs; once one of them loses a page file, only that one is redone.
+    make_text_files.main()
+    assert "2 already processed" in capsys.readouterr().out
+    os.remove(text_folder / "Jan_20200129_page1.txt")
+    make_text_files.main()
+    assert "1 already processed" in capsys.readouterr().out
+    assert (text_folder / "Jan_20200129_page1.txt").exists()
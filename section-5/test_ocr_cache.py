@@ -0,0 +1,30 @@
+from ocr_cache import OcrCache, file_hash
+
+def test_file_hash_follows_content(tmp_path):
+    first, copy, edited = tmp_path / "a.pdf", tmp_path / "b.pdf", tmp_path / "c.pdf"
+    first.write_bytes(b"%PDF-1.4 one")
+    copy.write_bytes(b"%PDF-1.4 one")
+    edited.write_bytes(b"%PDF-1.4 two")
+    assert file_hash(str(first)) == file_hash(str(copy)) != file_hash(str(edited))
+
+def test_pages_are_keyed_by_dpi_and_filtered_by_method(tmp_path):
+    cache = OcrCache(str(tmp_path / "ocr.sqlite"))
+    cache.put_page("hash", 1, 300, "text layer", "text")
+    cache.put_page("hash", 2, 300, "ocr text", "ocr")
+    assert cache.get_pages("hash", 300) == {1: ("text layer", "text"), 2: ("ocr text", "ocr")}
+    assert cache.get_pages("hash", 300, methods=("ocr",)) == {2: ("ocr text", "ocr")}
+    assert cache.get_pages("hash", 200) == {}
+    cache.close()
+
+def test_finished_pages_respects_the_requested_methods(tmp_path):
+    cache = OcrCache(str(tmp_path / "ocr.sqlite"))
+    assert cache.finished_pages("hash", 300) is None
+    cache.put_page("hash", 1, 300, "text layer", "text")
+    cache.put_page("hash", 2, 300, "ocr text", "ocr")
+    cache.finish_document("hash", 300, 2)
+    assert cache.finished_pages("hash", 300) == 2
+    assert cache.finished_pages("hash", 300, ("text", "ocr")) == 2
+    # Page 1 came from the text layer, so an OCR-only run must redo it.
+    assert cache.finished_pages("hash", 300, ("ocr",)) is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "pages": 2, "documents": 1}
+    cache.close()